@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Benchmark Xcode Assistant on synthetic corpora
+
+`bench.py run` times file discovery, analysis, reporting and batch fixing
+on a generated corpus and writes the results as JSON.  Every repetition
+runs in a fresh process so peak memory and import costs are measured per
+run.  `bench.py compare BASELINE CANDIDATE` exits non-zero when the
+candidate regressed.  `bench.py rules` exits non-zero when scanning a
+file gets slower with the number of registered rules.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import random
+import statistics
+import tempfile
+import subprocess
+import importlib.util
+from datetime import datetime, timezone
+from pathlib import Path
+
+from generate_corpus import SIZES, corpus_size, generate_corpus
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_TOOL = BENCH_DIR.parent / 'xcode_assistant.py'
+DEFAULT_CORPUS_DIR = BENCH_DIR / 'corpus'
+DEFAULT_RESULTS_DIR = BENCH_DIR / 'results'
+
+# Bump when the layout of the results file changes
+RESULTS_VERSION = 1
+
+STAGES = ('discovery', 'analysis', 'report', 'fix')
+
+# A change must exceed this many times the runs' relative spread to count
+NOISE_FACTOR = 3
+# Scales the median absolute deviation to estimate a standard deviation
+MAD_SCALE = 1.4826
+
+# Numbers of synthetic rules added to the built-in ones by `bench.py rules`
+RULE_COUNTS = (100, 300, 1000)
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process and its children in KiB"""
+    import resource
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def load_tool(path):
+    """Import an xcode_assistant.py by path, so other versions can be benchmarked"""
+    # Newer versions import xcode_assistant_actions.py from the same directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    spec = importlib.util.spec_from_file_location('xcode_assistant', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def measure(tool, corpus, jobs, fix):
+    """Run every stage once in this process and return the timings"""
+    started = time.perf_counter()
+    xcode_assistant = load_tool(tool)
+    stages = {'import': {'seconds': time.perf_counter() - started}}
+
+    def stage(name, function):
+        started = time.perf_counter()
+        result = function()
+        stages[name] = {'seconds': time.perf_counter() - started, 'peak_rss_kb': peak_rss_kb()}
+        return result
+
+    assistant = xcode_assistant.XcodeAssistant(corpus, jobs=jobs)
+    files = stage('discovery', assistant.find_swift_files)
+    stages['discovery']['files'] = len(files)
+
+    issues = stage('analysis', lambda: assistant.analyze_project(files))
+    stages['analysis']['files'] = len(files)
+    stages['analysis']['issues'] = len(issues)
+
+    report = stage('report', assistant.generate_report)
+    stages['report']['issues'] = len(issues)
+    stages['report']['bytes'] = len(report)
+
+    if fix:
+        # Fixes rewrite files, so they run on a scratch copy of the corpus
+        with tempfile.TemporaryDirectory(prefix='xcode_assistant_bench_') as scratch:
+            copy = os.path.join(scratch, 'corpus')
+            shutil.copytree(corpus, copy)
+            fixer = xcode_assistant.XcodeAssistant(copy, jobs=jobs)
+            fixer.analyze_project()
+
+            def fix_all():
+                fixes = [fix for fix in fixer.suggest_fixes() if isinstance(fix, dict) and 'replacement' in fix]
+                return fixes, fixer.apply_fixes(fixes)
+
+            fixes, results = stage('fix', fix_all)
+            stages['fix']['fixes'] = len(fixes)
+            stages['fix']['applied'] = sum(result.startswith('Applied') for result in results)
+            stages['fix']['files'] = len({fix['file'] for fix in fixes})
+
+    return {'stages': stages, 'peak_rss_kb': peak_rss_kb()}
+
+def time_startup(tool):
+    """Return the wall time of starting the tool and printing its help"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, str(tool), '--help'], stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+def run_benchmark(args):
+    """Generate the corpus if needed, run the repetitions and write the results"""
+    corpus = Path(args.corpus_dir) / f"{args.size}-seed{args.seed}"
+    print(f"Preparing corpus of {args.size} files in {corpus}...", file=sys.stderr)
+    manifest = generate_corpus(corpus, args.size, args.seed)
+
+    runs = []
+    startup = []
+    for repetition in range(args.repeat):
+        command = [sys.executable, __file__, 'measure', str(corpus), '--tool', str(args.tool), '--jobs', str(args.jobs)]
+        if args.skip_fix:
+            command.append('--skip-fix')
+        output = subprocess.run(command, stdout=subprocess.PIPE, check=True, text=True).stdout
+        run = json.loads(output)
+        runs.append(run)
+        startup.append(time_startup(args.tool))
+
+        timings = ', '.join(f"{name} {run['stages'][name]['seconds']:.3f}s" for name in STAGES if name in run['stages'])
+        print(f"Run {repetition + 1}/{args.repeat}: {timings}, peak {run['peak_rss_kb'] / 1024:.1f} MiB",
+              file=sys.stderr)
+
+    results = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'tool': str(args.tool),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'jobs': args.jobs, 'repeat': args.repeat, 'fix': not args.skip_fix},
+        'corpus': manifest,
+        'startup_seconds': startup,
+        'runs': runs,
+    }
+
+    output = Path(args.output) if args.output else (
+        DEFAULT_RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.size}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+def synthetic_rules(tool, count, seed=0):
+    """Return count deprecated API rules for made-up calls, which never occur in a corpus"""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    rules = []
+    for index in range(count):
+        api = ''.join(rng.choice(letters) for _ in range(rng.randint(6, 12))) + '('
+        rules.append(tool.Rule(id=f'synthetic_{index}', check='deprecated_apis', issue_type='deprecated_api',
+                               pattern=re.compile(re.escape(api)), message='Potential deprecated API usage: {match}',
+                               suggestion='Consider a newer API instead', prefix=api, span=len(api)))
+    return rules
+
+def best_time(function, repeat):
+    """Return the lowest wall time of repeat calls of function"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def rule_scaling(args):
+    """Time the prefilter and a full rule run on one file as rules are added, and exit 1 if they scale
+
+    The file is the corpus's files joined up to --kib KiB.  Every
+    synthetic rule is absent from it, so the prefilter has to read all of
+    it and the rules actually run are the built-in ones: with a scan that
+    does not depend on the number of rules, the times stay flat.
+    """
+    tool = load_tool(args.tool)
+    corpus = Path(args.corpus_dir) / f"{SIZES['1k']}-seed{args.seed}"
+    generate_corpus(corpus, SIZES['1k'], args.seed)
+    content = b''
+    for path in sorted(corpus.rglob('*.swift')):
+        content += path.read_bytes()
+        if len(content) >= args.kib * 1024:
+            break
+    extra = synthetic_rules(tool, max(args.counts), args.seed)
+    
+    print(f"Scanning {len(content) / 1024:.0f} KiB with {len(tool.RULES)} built-in rules plus:", file=sys.stderr)
+    print(f"{'rules':>8} {'prefilter':>10} {'run_rules':>10}")
+    times = []
+    for count in args.counts:
+        rules = tuple(tool.RULES) + tuple(extra[:count])
+        assistant = tool.XcodeAssistant(BENCH_DIR, rules=rules)
+        prefilter = best_time(lambda: assistant.engine.active_rules(content), args.repeat)
+        scan = best_time(lambda: assistant.run_rules(content, 'bench.swift'), args.repeat)
+        times.append(scan)
+        print(f"{count:>8} {prefilter:>9.4f}s {scan:>9.4f}s")
+    
+    growth = times[-1] / times[0]
+    if growth > args.max_ratio:
+        print(f"\nFailed: {max(args.counts)} rules take {growth:.1f} times as long as {min(args.counts)} "
+              f"(allowed: {args.max_ratio})")
+        sys.exit(1)
+    print(f"\n{max(args.counts)} rules take {growth:.1f} times as long as {min(args.counts)}")
+
+def rule_counts(value):
+    """Parse a comma-separated list of rule counts"""
+    try:
+        counts = sorted(int(count) for count in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated numbers, got {value!r}") from None
+    if len(counts) < 2 or counts[0] < 1:
+        raise argparse.ArgumentTypeError("expected at least two positive counts")
+    return counts
+
+def metric_samples(results):
+    """Return {metric: (per-run values, higher_is_better)} for a results file"""
+    files = results['corpus']['settings']['files']
+    metrics = {}
+    for name in STAGES:
+        seconds = [run['stages'][name]['seconds'] for run in results['runs'] if name in run['stages']]
+        if seconds:
+            metrics[f"{name} files/sec"] = ([files / max(value, 1e-9) for value in seconds], True)
+    metrics['peak memory KiB'] = ([run['peak_rss_kb'] for run in results['runs']], False)
+    metrics['startup seconds'] = (results['startup_seconds'], False)
+    return metrics
+
+def relative_spread(values):
+    """Return the robust relative standard deviation (scaled MAD over median) of values"""
+    median = statistics.median(values)
+    if len(values) < 2 or median == 0:
+        return 0.0
+    mad = statistics.median(abs(value - median) for value in values)
+    return MAD_SCALE * mad / abs(median)
+
+def compare_results(baseline, candidate, thresholds):
+    """Compare the medians of every metric, returning one row per metric
+
+    A metric regresses when its median moved the wrong way by more than
+    its threshold percentage and by more than NOISE_FACTOR times the
+    larger relative spread of the two sets of runs, so noisy stages need
+    a bigger change before they fail the comparison.
+    """
+    rows = []
+    baseline_metrics = metric_samples(baseline)
+    candidate_metrics = metric_samples(candidate)
+    for metric, (before, higher_is_better) in baseline_metrics.items():
+        if metric not in candidate_metrics:
+            continue
+        after = candidate_metrics[metric][0]
+        before_median = statistics.median(before)
+        after_median = statistics.median(after)
+        change = (after_median - before_median) / before_median * 100 if before_median else 0.0
+        worse = -change if higher_is_better else change
+        
+        kind = 'memory' if 'memory' in metric else 'startup' if 'startup' in metric else 'throughput'
+        allowed = max(thresholds[kind], NOISE_FACTOR * max(relative_spread(before), relative_spread(after)) * 100)
+        if worse > allowed:
+            status = 'REGRESSION'
+        elif -worse > allowed:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append({'metric': metric, 'baseline': before_median, 'candidate': after_median,
+                     'change': change, 'allowed': allowed, 'status': status})
+    return rows
+
+def compare_benchmarks(args):
+    """Print the comparison of two results files and exit 1 on any regression"""
+    results = []
+    for path in (args.baseline, args.candidate):
+        try:
+            with open(path, 'r') as f:
+                results.append(json.load(f))
+        except (OSError, ValueError) as e:
+            sys.exit(f"bench.py compare: error: cannot read {path}: {e}")
+    baseline, candidate = results
+    
+    if baseline['corpus']['settings'] != candidate['corpus']['settings'] or baseline['settings'] != candidate['settings']:
+        message = "the results were measured on different corpora or settings"
+        if not args.force:
+            sys.exit(f"bench.py compare: error: {message} (use --force to compare anyway)")
+        print(f"Warning: {message}", file=sys.stderr)
+    
+    thresholds = {
+        'throughput': args.threshold,
+        'memory': args.threshold if args.memory_threshold is None else args.memory_threshold,
+        'startup': args.threshold if args.startup_threshold is None else args.startup_threshold,
+    }
+    rows = compare_results(baseline, candidate, thresholds)
+    
+    print(f"{'metric':<24} {'baseline':>12} {'candidate':>12} {'change':>9} {'allowed':>9}  status")
+    for row in rows:
+        print(f"{row['metric']:<24} {row['baseline']:>12.4g} {row['candidate']:>12.4g} "
+              f"{row['change']:>+8.1f}% {row['allowed']:>8.1f}%  {row['status']}")
+    
+    regressions = [row['metric'] for row in rows if row['status'] == 'REGRESSION']
+    if regressions:
+        print(f"\nRegressed: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Xcode Assistant on synthetic Swift corpora')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='Run the benchmark and write a results file')
+    run.add_argument('--size', type=corpus_size, default=SIZES['1k'],
+                     help=f"Corpus size: a number of files or one of {', '.join(SIZES)} (default: 1k)")
+    run.add_argument('--seed', type=int, default=0, help='Corpus random seed (default: 0)')
+    run.add_argument('--repeat', type=int, default=5, help='Number of runs (default: 5)')
+    run.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                     help='Worker processes for analysis; 0 uses one per core (default: 1)')
+    run.add_argument('--skip-fix', action='store_true', help='Do not time batch fixing')
+    run.add_argument('--tool', type=Path, default=DEFAULT_TOOL, help='xcode_assistant.py to benchmark')
+    run.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='Where generated corpora are kept')
+    run.add_argument('--output', '-o', help='Results file (default: a new file in benchmarks/results/)')
+
+    compare = subparsers.add_parser('compare', help='Compare two results files and fail on regressions')
+    compare.add_argument('baseline', help='Results file of the reference version')
+    compare.add_argument('candidate', help='Results file of the version under test')
+    compare.add_argument('--threshold', type=float, default=5.0, metavar='PCT',
+                         help='Allowed regression in percent (default: 5)')
+    compare.add_argument('--memory-threshold', type=float, metavar='PCT',
+                         help='Allowed peak memory regression in percent (default: --threshold)')
+    compare.add_argument('--startup-threshold', type=float, metavar='PCT',
+                         help='Allowed startup time regression in percent (default: --threshold)')
+    compare.add_argument('--force', action='store_true',
+                         help='Compare even if the corpus or settings differ')
+
+    rules = subparsers.add_parser('rules', help='Fail when scanning gets slower with the number of rules')
+    rules.add_argument('--counts', type=rule_counts, default=list(RULE_COUNTS),
+                       help=f"Synthetic rules to add, comma-separated (default: {','.join(map(str, RULE_COUNTS))})")
+    rules.add_argument('--kib', type=int, default=1024, help='Size of the scanned file in KiB (default: 1024)')
+    rules.add_argument('--seed', type=int, default=0, help='Corpus and rule random seed (default: 0)')
+    rules.add_argument('--repeat', type=int, default=3, help='Timings per count, keeping the fastest (default: 3)')
+    rules.add_argument('--max-ratio', type=float, default=3.0,
+                       help='Allowed slowdown from the fewest to the most rules (default: 3)')
+    rules.add_argument('--tool', type=Path, default=DEFAULT_TOOL, help='xcode_assistant.py to benchmark')
+    rules.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='Where generated corpora are kept')
+
+    # Internal: one repetition, run in a child process by `run`
+    measure_parser = subparsers.add_parser('measure')
+    measure_parser.add_argument('corpus')
+    measure_parser.add_argument('--tool', type=Path, default=DEFAULT_TOOL)
+    measure_parser.add_argument('--jobs', type=int, default=1)
+    measure_parser.add_argument('--skip-fix', action='store_true')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run_benchmark(args)
+    elif args.command == 'compare':
+        compare_benchmarks(args)
+    elif args.command == 'rules':
+        rule_scaling(args)
+    elif args.command == 'measure':
+        json.dump(measure(args.tool, args.corpus, args.jobs, not args.skip_fix), sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Generate deterministic synthetic Swift corpora for benchmarking Xcode Assistant
+"""
+
+import json
+import random
+import argparse
+from pathlib import Path
+from string import Template
+
+# Named corpus sizes
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+# Files per generated module directory
+FILES_PER_MODULE = 100
+
+# Bump when the templates change so stale corpora are regenerated
+GENERATOR_VERSION = 1
+
+DEFAULT_DENSITIES = {
+    # Chance that a SwiftUI stack uses VStack(spacing:) and that a Text interpolates a conditional
+    'vstack': 0.3,
+    # Chance that an AVFoundation call site uses the deprecated synchronous API
+    'deprecated': 0.2,
+    # Chance that a class used from a Task lacks Sendable conformance
+    'class': 0.5,
+}
+
+# Modeled on MDB/ContentView.swift
+CONTENT_VIEW = Template('''\
+//
+//  ${name}.swift
+//  Bench
+//
+
+import SwiftUI
+import UniformTypeIdentifiers
+import AVFoundation
+
+struct ${name}: View {
+    @State private var files: [URL] = []
+    @State private var isProcessing = false
+    @State private var processingStatus = ""
+    @State private var showFilePicker = false
+    @State private var matches: [String] = []
+
+    var body: some View {
+        NavigationView {
+            VStack {
+                Spacer().frame(height: 20)
+                Text("${title}")
+                    .font(.largeTitle)
+                    .fontWeight(.bold)
+
+${sections}
+            }
+            .padding()
+        }
+    }
+
+    private func removeFiles(at offsets: IndexSet) {
+        files.remove(atOffsets: offsets)
+    }
+}
+''')
+
+CONTENT_SECTION = Template('''\
+                // ${label} Section
+                ${stack} {
+                    HStack {
+                        Text("${label}")
+                            .font(.headline)
+                        Spacer()
+                        Button("Select Files") {
+                            showFilePicker = true
+                        }
+                        .buttonStyle(.bordered)
+                    }
+
+                    if files.isEmpty {
+                        Text("No files selected")
+                            .foregroundColor(.secondary)
+                            .padding()
+                    } else {
+                        List {
+                            ForEach(files, id: \\.self) { url in
+                                Text(url.lastPathComponent)
+                            }
+                            .onDelete(perform: removeFiles)
+                        }
+                        .frame(height: ${height})
+                    }
+                    ${status}
+                }
+                .padding(.horizontal)
+
+''')
+
+# Modeled on MDB/MetadataExtractor.swift
+METADATA_EXTRACTOR = Template('''\
+//
+//  ${name}.swift
+//  Bench
+//
+
+import Foundation
+import AVFoundation
+import Vision
+
+struct ${name}Metadata {
+    var filename: String
+    var duration: Double?
+    var frameRate: Float?
+    var resolution: String?
+}
+
+@available(macOS 13.0, *)
+${declaration} {
+    // Extract metadata from video files
+    func extractMetadata(from url: URL, completion: @escaping (Result<${name}Metadata, Error>) -> Void) {
+        let asset = ${asset}
+
+        var metadata = ${name}Metadata(filename: url.lastPathComponent)
+
+        // Use async/await with Task for modern API
+        Task {
+            do {
+${steps}
+                DispatchQueue.main.async {
+                    completion(.success(metadata))
+                }
+            } catch {
+                DispatchQueue.main.async {
+                    completion(.failure(error))
+                }
+            }
+        }
+    }
+
+    // Extract the first frame for text recognition
+    private func firstFrame(of asset: AVAsset) async throws -> CGImage {
+        let generator = AVAssetImageGenerator(asset: asset)
+        generator.appliesPreferredTrackTransform = true
+        let time = CMTime(seconds: 1, preferredTimescale: 60)
+        ${frame}
+        return image
+    }
+}
+''')
+
+# (deprecated, modern) variants of each extraction step
+METADATA_STEPS = [
+    ('''\
+                // Get duration
+                let duration = asset.duration
+                metadata.duration = CMTimeGetSeconds(duration)
+''', '''\
+                // Get duration
+                let duration = try await asset.load(.duration)
+                metadata.duration = CMTimeGetSeconds(duration)
+'''),
+    ('''\
+                // Get video tracks
+                let videoTracks = asset.tracks(withMediaType: .video)
+''', '''\
+                // Get video tracks
+                let videoTracks = try await asset.loadTracks(withMediaType: .video)
+'''),
+    ('''\
+                if let videoTrack = videoTracks.first {
+                    metadata.frameRate = videoTrack.nominalFrameRate
+                    let size = videoTrack.naturalSize
+                    metadata.resolution = "\\(Int(size.width))x\\(Int(size.height))"
+                }
+''', '''\
+                if let videoTrack = videoTracks.first {
+                    let frameRate = try await videoTrack.load(.minFrameDuration)
+                    metadata.frameRate = Float(1 / CMTimeGetSeconds(frameRate))
+                    let size = try await videoTrack.load(.preferredTransform)
+                    metadata.resolution = "\\(Int(size.tx))x\\(Int(size.ty))"
+                }
+'''),
+]
+
+# Modeled on MDB/ExportManager.swift
+EXPORT_MANAGER = Template('''\
+//
+//  ${name}.swift
+//  Bench
+//
+
+import Foundation
+import UniformTypeIdentifiers
+
+${declaration} {
+    enum ExportError: Error {
+        case exportFailed
+        case noMatches
+    }
+
+    // Export matches as a detailed report
+    static func exportReport(matches: [(monitor: BenchClip, dit: BenchClip)], completion: @escaping (Result<URL, Error>) -> Void) {
+        guard !matches.isEmpty else {
+            completion(.failure(ExportError.noMatches))
+            return
+        }
+
+        var reportContent = "${title}\\n\\n"
+        for (index, match) in matches.enumerated() {
+            reportContent += "Match #\\(index + 1)\\n"
+${entries}
+        }
+
+        let outputURL = FileManager.default.temporaryDirectory.appendingPathComponent("${name}.txt")
+        do {
+            try reportContent.write(to: outputURL, atomically: true, encoding: .utf8)
+            Task {
+                let worker = ${name}()
+                await worker.archive(outputURL)
+            }
+            completion(.success(outputURL))
+        } catch {
+            completion(.failure(error))
+        }
+    }
+
+    func archive(_ url: URL) async {
+        let make = ${initializer}
+        _ = make(url)
+    }
+}
+''')
+
+EXPORT_ENTRY = Template('''\
+            if let duration = match.${side}.${duration} {
+                reportContent += "${label} Duration: \\(duration) seconds\\n"
+            }
+''')
+
+def corpus_size(value):
+    """Parse a corpus size: a named size such as 10k or a file count"""
+    if value in SIZES:
+        return SIZES[value]
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {value!r}, expected one of {', '.join(SIZES)} or a number")
+    if count <= 0:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return count
+
+def generate_file(index, seed, densities, planted):
+    """Return the (relative path, Swift source) of one corpus file
+
+    Each file depends only on its index and the seed, so the first 1000
+    files of the 100k corpus are the 1k corpus.  planted counts the
+    issue-triggering patterns that were used.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    kind = index % 3
+    module = f"Module{index // FILES_PER_MODULE:04d}"
+
+    def chance(name):
+        hit = rng.random() < densities[name]
+        if hit:
+            planted[name] += 1
+        return hit
+
+    if kind == 0:
+        name = f"ContentView{index:06d}"
+        sections = []
+        for section in range(rng.randint(2, 6)):
+            stack = f"VStack(spacing: {rng.choice((8, 12, 16, 20))})" if chance('vstack') else 'VStack(alignment: .leading)'
+            if chance('vstack'):
+                status = 'Text("Status: \\(isProcessing ? "Processing" : "Idle")")'
+            else:
+                status = 'Text(processingStatus)'
+            sections.append(CONTENT_SECTION.substitute(label=f"Files {section + 1}", stack=stack,
+                                                       height=rng.choice((120, 150, 200)), status=status))
+        source = CONTENT_VIEW.substitute(name=name, title=f"Metadata Bridge {index}", sections=''.join(sections))
+
+    elif kind == 1:
+        name = f"MetadataExtractor{index:06d}"
+        if chance('class'):
+            declaration = f"class {name}"
+        else:
+            declaration = f"final class {name}: @unchecked Sendable"
+        asset = 'AVAsset(url: url)' if chance('deprecated') else 'AVURLAsset(url: url)'
+        steps = ''.join(deprecated if chance('deprecated') else modern for deprecated, modern in METADATA_STEPS)
+        if chance('deprecated'):
+            frame = 'let image = try generator.copyCGImage(at: time, actualTime: nil)'
+        else:
+            frame = 'let (image, _) = try await generator.image(at: time)'
+        source = METADATA_EXTRACTOR.substitute(name=name, declaration=declaration, asset=asset,
+                                               steps=steps, frame=frame)
+
+    else:
+        name = f"ExportManager{index:06d}"
+        if chance('class'):
+            declaration = f"class {name}"
+        else:
+            declaration = f"final class {name}: @unchecked Sendable"
+        entries = []
+        for side, label in (('monitor', 'Monitor'), ('dit', 'DIT')):
+            # `.duration {` is flagged like the deprecated AVAsset property, as in ExportManager.swift
+            duration = 'duration' if chance('deprecated') else 'durationSeconds'
+            entries.append(EXPORT_ENTRY.substitute(side=side, duration=duration, label=label))
+        initializer = 'AVURLAsset.init(url:)' if chance('deprecated') else '{ AVURLAsset(url: $0) }'
+        source = EXPORT_MANAGER.substitute(name=name, declaration=declaration, title=f"Report {index}",
+                                           entries=''.join(entries), initializer=initializer)
+
+    return f"{module}/{name}.swift", source
+
+def generate_corpus(directory, size, seed=0, densities=None):
+    """Write a corpus of size files to directory and return its manifest
+
+    The manifest is stored as corpus.json; an existing corpus with the same
+    manifest is reused instead of being written again.
+    """
+    densities = dict(DEFAULT_DENSITIES, **(densities or {}))
+    directory = Path(directory)
+    settings = {'generator_version': GENERATOR_VERSION, 'files': size, 'seed': seed, 'densities': densities}
+    manifest_path = directory / 'corpus.json'
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('settings') == settings:
+            return manifest
+    except (OSError, ValueError):
+        pass
+
+    planted = {name: 0 for name in densities}
+    lines = 0
+    total_bytes = 0
+    for index in range(size):
+        relative, source = generate_file(index, seed, densities, planted)
+        path = directory / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(source)
+        lines += source.count('\n')
+        total_bytes += len(source.encode())
+
+    manifest = {'settings': settings, 'lines': lines, 'bytes': total_bytes, 'planted': planted}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Swift corpus for benchmarks')
+    parser.add_argument('directory', help='Directory to write the corpus to')
+    parser.add_argument('--size', type=corpus_size, default=SIZES['1k'],
+                        help=f"Number of files, or one of {', '.join(SIZES)} (default: 1k)")
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    for name, default in DEFAULT_DENSITIES.items():
+        parser.add_argument(f'--{name}-density', type=float, default=default, metavar='P',
+                            help=f'Probability of each {name} pattern (default: {default})')
+    args = parser.parse_args()
+
+    densities = {name: getattr(args, f'{name}_density') for name in DEFAULT_DENSITIES}
+    manifest = generate_corpus(args.directory, args.size, args.seed, densities)
+    print(f"Corpus of {args.size} files, {manifest['lines']} lines in {args.directory}")
+    print(f"Planted patterns: {json.dumps(manifest['planted'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Check that every rule of Xcode Assistant matches in linear time
+
+Each registered rule is scanned over adversarial inputs built from the
+literal parts of its pattern and from common Swift tokens: one token
+repeated, random mixtures of all tokens, and mixtures that leave one
+token out, which produce the near-misses that make backtracking regexes
+blow up.  Every input is timed at sizes growing fourfold, small enough
+to stay in the CPU caches so that only the matching itself is measured.
+A rule whose scan time grows faster than size ** --max-exponent from the
+smallest to the largest size, or which does not finish within --timeout,
+fails the run with exit status 1.  So does a rule whose declared prefix,
+literals or span do not hold for its pattern, which the analyzer's rule
+engine trusts without parsing the regex.
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import subprocess
+from pathlib import Path
+
+from bench import DEFAULT_TOOL, load_tool
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Tokens mixed into the inputs besides the literals of the pattern itself
+SWIFT_TOKENS = (b'\\(', b'(', b')', b'"', b'?', b':', b'.', b',', b'{', b'}', b' ', b'\n',
+                b'a', b'_', b'0', 'é'.encode(), b'//', b'/*', b'*/')
+
+_REPEATS = {getattr(sre_parse, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+            if hasattr(sre_parse, name)}
+
+# Size of the smallest input, in bytes, and the factor between successive sizes
+START_SIZE = 1024
+GROWTH = 4
+# A size that takes longer than this per scan is the last one timed
+MAX_SCAN_SECONDS = 1.0
+# Timings of an input that looks super-linear are taken again this many times, keeping the
+# lowest growth, so that a noisy timing does not fail the run
+CONFIRMATIONS = 2
+
+def literal_runs(pattern):
+    """Return the runs of literal bytes in a bytes pattern, in pattern order"""
+    runs = []
+
+    def walk(items):
+        run = b''
+        for op, value in items:
+            if op == sre_parse.LITERAL:
+                run += bytes((value,))
+                continue
+            if run:
+                runs.append(run)
+                run = b''
+            if op == sre_parse.SUBPATTERN:
+                walk(value[-1])
+            elif op == sre_parse.BRANCH:
+                for branch in value[1]:
+                    walk(branch)
+            elif op in _REPEATS:
+                walk(value[2])
+        if run:
+            runs.append(run)
+
+    walk(sre_parse.parse(pattern.pattern, pattern.flags))
+    return runs
+
+def _leading_literal(parsed):
+    """Return the literal bytes every match of a parsed pattern starts with"""
+    prefix = b''
+    for op, value in parsed:
+        if op != sre_parse.LITERAL:
+            break
+        prefix += bytes((value,))
+    return prefix
+
+def _required_runs(parsed):
+    """Return the longest literal run each branch of a parsed pattern always matches, or None
+
+    A pattern that is not a top-level alternation has a single branch.
+    """
+    def longest_run(items):
+        best, run = b'', b''
+        for op, value in items:
+            if op == sre_parse.LITERAL:
+                run += bytes((value,))
+                continue
+            best = max(best, run, key=len)
+            run = b''
+            if op == sre_parse.SUBPATTERN and not value[1] & re.IGNORECASE:
+                # A group at this level is always matched, so its literals are required too
+                best = max(best, longest_run(value[-1]), key=len)
+        return max(best, run, key=len)
+
+    items = list(parsed)
+    if len(items) == 1 and items[0][0] == sre_parse.BRANCH:
+        return [longest_run(list(branch)) for branch in items[0][1][1]]
+    return [longest_run(items)]
+
+def _match_span(parsed):
+    """Return how many bytes past its start a match of a parsed pattern may examine, or None if unbounded"""
+    lookahead = 0
+    asserts = False
+
+    def walk(items):
+        nonlocal lookahead, asserts
+        for op, value in items:
+            if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                direction, items = value
+                if direction > 0:
+                    lookahead += items.getwidth()[1]
+            elif op == sre_parse.AT:
+                asserts = True
+            elif op == sre_parse.SUBPATTERN:
+                walk(value[-1])
+            elif op == sre_parse.BRANCH:
+                for branch in value[1]:
+                    walk(branch)
+            elif op in _REPEATS:
+                walk(value[2])
+
+    walk(parsed)
+    width = parsed.getwidth()[1]
+    if width >= sre_parse.MAXREPEAT:
+        return None
+    # \b and $ at the end of a match look at the byte after it
+    return width + lookahead + asserts
+
+def declaration_errors(tool, rule):
+    """Return what is wrong with the prefix, literals and span a rule declares for its pattern"""
+    pattern = tool._bytes_pattern(rule.pattern)
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    errors = []
+    prefix = (rule.prefix or '').encode()
+    if prefix and (pattern.flags & re.IGNORECASE or not _leading_literal(parsed).startswith(prefix)):
+        errors.append(f"prefix {rule.prefix!r} does not start every match")
+    if rule.literals:
+        runs = _required_runs(parsed)
+        if not all(any(literal.encode() in run for literal in rule.literals) for run in runs):
+            errors.append(f"some matches contain none of the literals {rule.literals!r}")
+    if rule.matcher is None and rule.span is not None:
+        span = _match_span(parsed)
+        if span is None or span > rule.span:
+            errors.append(f"span {rule.span} is shorter than a match may reach ({span or 'unbounded'})")
+    return errors
+
+def input_families(runs):
+    """Return {name: generate(size, rng)} for the adversarial input bodies of a pattern"""
+    tokens = list(dict.fromkeys(runs + list(SWIFT_TOKENS)))
+
+    def repeat(piece):
+        return lambda size, rng: piece * (size // len(piece) + 1)
+
+    def mixture(choices):
+        def generate(size, rng):
+            pieces = []
+            length = 0
+            while length < size:
+                piece = rng.choice(choices)
+                pieces.append(piece)
+                length += len(piece)
+            return b''.join(pieces)
+        return generate
+
+    families = {}
+    if len(runs) > 1:
+        families['all literals but the last, repeated'] = repeat(b''.join(runs[:-1]))
+    for token in tokens:
+        families[f'{token!r} repeated'] = repeat(token)
+    families['random tokens'] = mixture(tokens)
+    for token in tokens:
+        families[f'random tokens without {token!r}'] = mixture([other for other in tokens if other != token])
+    return families
+
+def time_scan(engine, data, repeat, min_time):
+    """Return the best time per scan of data with engine, repeating each timing until it takes min_time"""
+    best = float('inf')
+    for _ in range(repeat):
+        scans = 0
+        started = time.perf_counter()
+        while True:
+            for _ in engine.scan(data):
+                pass
+            scans += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / scans)
+    return best
+
+def measure_rule(tool, rule, args):
+    """Time one rule on every input family, returning one result per family"""
+    engine = tool.engine_for((rule,))
+    runs = literal_runs(tool._bytes_pattern(rule.pattern))
+    # The first literal starts the body so the pattern engages with it, and all of them
+    # follow it so the prefilter lets the rule run
+    prefix = runs[0] if runs else b''
+    suffix = b'\n' + b''.join(runs)
+
+    results = []
+    for family, generate in input_families(runs).items():
+        def build(size):
+            return prefix + generate(size, random.Random(args.seed))[:size] + suffix
+
+        size = START_SIZE
+        first = seconds = time_scan(engine, build(size), args.repeat, args.min_time)
+        while size * GROWTH <= args.max_size and seconds < MAX_SCAN_SECONDS:
+            size *= GROWTH
+            seconds = time_scan(engine, build(size), args.repeat, args.min_time)
+        exponent = math.log(seconds / first, size / START_SIZE) if size > START_SIZE else None
+        for _ in range(CONFIRMATIONS if exponent is not None and exponent > args.max_exponent else 0):
+            first = time_scan(engine, build(START_SIZE), args.repeat, args.min_time)
+            larger = time_scan(engine, build(size), args.repeat, args.min_time)
+            exponent = min(exponent, math.log(larger / first, size / START_SIZE))
+        results.append({'family': family, 'size': size, 'seconds': seconds, 'exponent': exponent})
+    return results
+
+def audit(args):
+    """Measure every rule in a child process of its own, print the results and exit 1 on a failure"""
+    tool = load_tool(args.tool)
+    rules = [rule.id for rule in tool.RULES if not args.rule or rule.id in args.rule]
+    unknown = set(args.rule or ()) - set(rules)
+    if unknown:
+        sys.exit(f"redos.py: error: unknown rule {', '.join(sorted(unknown))}")
+
+    failures = []
+    for rule in tool.RULES:
+        if rule.id in rules:
+            for error in declaration_errors(tool, rule):
+                print(f"{rule.id}: {error}  FAIL")
+                failures.append(rule.id)
+
+    print(f"{'rule':<32} {'exponent':>8} {'MiB/s':>9}  worst input")
+    for rule_id in rules:
+        command = [sys.executable, __file__, '--tool', str(args.tool), '--seed', str(args.seed), '--repeat', str(args.repeat),
+                   '--min-time', str(args.min_time), '--max-size', str(args.max_size), 'measure', rule_id]
+        try:
+            output = subprocess.run(command, stdout=subprocess.PIPE, check=True, text=True,
+                                    timeout=args.timeout).stdout
+        except subprocess.TimeoutExpired:
+            print(f"{rule_id:<32} {'-':>8} {'-':>9}  timed out after {args.timeout:g} s  FAIL")
+            failures.append(rule_id)
+            continue
+        results = json.loads(output)
+
+        measured = [result for result in results if result['exponent'] is not None]
+        worst = max(measured or results, key=lambda result: (result['exponent'] or 0, result['seconds']))
+        exponent = f"{worst['exponent']:.2f}" if worst['exponent'] is not None else '-'
+        throughput = worst['size'] / max(worst['seconds'], 1e-9) / (1 << 20)
+        failed = worst['exponent'] is not None and worst['exponent'] > args.max_exponent
+        print(f"{rule_id:<32} {exponent:>8} {throughput:>9.1f}  {worst['family']}{'  FAIL' if failed else ''}")
+        if args.verbose:
+            for result in results:
+                exponent = f"{result['exponent']:.2f}" if result['exponent'] is not None else '-'
+                print(f"    {exponent:>8} {result['seconds'] * 1000:>9.2f} ms  {result['size']:>8} bytes  "
+                      f"{result['family']}")
+        if failed:
+            failures.append(rule_id)
+
+    if failures:
+        print(f"\nFailed: {', '.join(dict.fromkeys(failures))}")
+        sys.exit(1)
+    print(f"\nAll {len(rules)} rules scale linearly")
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail when a rule pattern takes super-linear time on adversarial input')
+    parser.add_argument('--rule', action='append', metavar='ID', help='Only check this rule (repeatable)')
+    parser.add_argument('--tool', type=Path, default=DEFAULT_TOOL, help='xcode_assistant.py to check')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the inputs (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timings per input; the best is used (default: 3)')
+    parser.add_argument('--min-time', type=float, default=0.005, metavar='SECONDS',
+                        help='Minimum duration of each timing (default: 0.005)')
+    parser.add_argument('--max-size', type=int, default=1 << 16, metavar='BYTES',
+                        help='Largest input (default: 65536)')
+    parser.add_argument('--max-exponent', type=float, default=1.5,
+                        help='Allowed growth of the scan time as a power of the input size (default: 1.5)')
+    parser.add_argument('--timeout', type=float, default=60.0, metavar='SECONDS',
+                        help='Time allowed per rule (default: 60)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Print the result of every input')
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Internal: one rule, run in a child process by the audit so it can be stopped
+    measure_parser = subparsers.add_parser('measure')
+    measure_parser.add_argument('rule_id')
+
+    args = parser.parse_args()
+    if args.command == 'measure':
+        tool = load_tool(args.tool)
+        rule = next(rule for rule in tool.RULES if rule.id == args.rule_id)
+        json.dump(measure_rule(tool, rule, args), sys.stdout)
+    else:
+        audit(args)
+
+if __name__ == "__main__":
+    main()
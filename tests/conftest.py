@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The analyzer is a script at the repository root rather than an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The benchmark scripts import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
@@ -0,0 +1,482 @@
+import io
+import os
+import re
+import json
+import time
+import random
+import string
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import bench
+import redos
+import xcode_assistant
+from xcode_assistant import (RULES, AnalysisServer, FileContext, LanguageServer, LineIndex, Profiler, Rule, RuleEngine,
+                             WatchedIssues, XcodeAssistant, diff_issues, parse_pbxproj, tokenize_swift,
+                             _normalize_newlines)
+from xcode_assistant_client import DaemonClient
+
+REPO = Path(__file__).resolve().parent.parent
+
+SAMPLE = b'''import SwiftUI
+import AVFoundation
+
+class Player {
+    let asset = AVAsset(url: url)
+    func load() {
+        Task {
+            let seconds = asset.duration
+            let tracks = asset.tracks(withMediaType: .video)
+            let size = tracks[0].naturalSize
+            let rate = tracks[0].nominalFrameRate
+        }
+    }
+}
+
+struct ContentView: View {
+    var body: some View {
+        VStack(spacing: 12) {
+            Text("Count: \\(flag ? 1 : 2)")
+            // VStack(spacing: 4) in a comment
+            Text("VStack(spacing: 8) in a string")
+        }
+    }
+}
+
+final class Cache: @unchecked Sendable {
+    func warm() async { let image = try gen.copyCGImage(at: time, actualTime: nil) }
+}
+'''
+
+def test_line_index_maps_offsets_to_lines_and_columns():
+    text = 'let a = 1\n\nlet café = "é"\n'
+    expected = [(text.count('\n', 0, offset) + 1, offset - text.rfind('\n', 0, offset)) for offset in range(len(text) + 1)]
+    assert [LineIndex(text).position(offset) for offset in range(len(text) + 1)] == expected
+    # Offsets into the UTF-8 bytes still give columns in characters
+    content = LineIndex(text.encode())
+    assert [content.position(len(text[:offset].encode())) for offset in range(len(text) + 1)] == expected
+
+def test_engine_matches_finditer_per_pattern():
+    # Rules with a matcher finish their matches in code, so only plain patterns compare with finditer
+    rules = [rule for rule in RULES if rule.matcher is None]
+    engine = RuleEngine([rule.pattern for rule in rules], [False] * len(rules),
+                        [rule.literals for rule in rules], prefixes=[rule.prefix or '' for rule in rules],
+                        spans=[rule.span for rule in rules])
+    content = SAMPLE * 3
+    expected = sorted((index, match.start(), match.end())
+                      for index, rule in enumerate(rules)
+                      for match in re.finditer(rule.pattern.pattern.encode(), content))
+    found = sorted((index, match.start(), match.end()) for index, match in engine.scan(content))
+    assert expected
+    assert found == expected
+
+def _synthetic_rules(count):
+    rng = random.Random(0)
+    apis = [''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(6, 12))) + '(' for _ in range(count)]
+    return [Rule(id=f'synthetic_{index}', check='deprecated_apis', issue_type='deprecated_api',
+                 pattern=re.compile(re.escape(api)), message='{match}', suggestion='', prefix=api, span=len(api))
+            for index, api in enumerate(apis)]
+
+def _best_time(function):
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def test_scan_time_does_not_grow_with_rule_count():
+    # Mostly code no rule matches, so that the time goes to finding where rules may match
+    content = SAMPLE + b'    let value = compute(input, offset: 42) // plain code\n' * 5000
+    synthetic = _synthetic_rules(1000)
+    times = []
+    for count in (100, 1000):
+        assistant = XcodeAssistant(REPO, rules=tuple(RULES) + tuple(synthetic[:count]))
+        assert assistant.run_rules(content, 'f.swift') == XcodeAssistant(REPO).run_rules(content, 'f.swift')
+        times.append(_best_time(lambda: assistant.run_rules(content, 'f.swift')))
+    # Ten times the rules: a scan per rule would take about ten times as long
+    assert times[1] < 3 * times[0]
+
+@pytest.mark.parametrize('window', [None, 5, 16])
+def test_prefilter_finds_overlapping_and_nested_literals(window):
+    literals = ['foo', 'foobar', 'bar', 'oba', 'o']
+    engine = RuleEngine([re.escape(literal) for literal in literals], literals=[(literal,) for literal in literals],
+                        prefixes=literals)
+    rng = random.Random(0)
+    for _ in range(500):
+        content = ''.join(rng.choice(['f', 'o', 'b', 'a', 'r', 'x', 'foo', 'bar']) for _ in range(rng.randint(0, 12)))
+        expected = tuple(index for index, literal in enumerate(literals) if literal in content)
+        assert engine.active_rules(content.encode(), window) == expected, content
+
+@pytest.mark.parametrize('window', [64, 333, 4096])
+@pytest.mark.parametrize('newline', [b'\n', b'\r\n'])
+def test_streamed_file_matches_whole_file(monkeypatch, window, newline):
+    assistant = XcodeAssistant(REPO)
+    content = SAMPLE * 20
+    expected = assistant.run_rules(content, 'f.swift')
+
+    monkeypatch.setattr(xcode_assistant, 'STREAM_MIN_SIZE', 1)
+    monkeypatch.setattr(xcode_assistant, 'STREAM_WINDOW', window)
+    streamed = _normalize_newlines(content.replace(b'\n', newline))
+    assert FileContext(streamed, 'f.swift').window == window
+    assert assistant.run_rules(streamed, 'f.swift') == expected
+
+def test_mapped_file_reports_columns_in_characters(tmp_path):
+    line = 'let café = "naïve"; let seconds = asset.duration \n'
+    comment = b'// \xff is not UTF-8\n'
+    padding = comment * (xcode_assistant.MMAP_MIN_SIZE // len(comment) + 1)
+    path = tmp_path / 'Large.swift'
+    path.write_bytes(padding + line.encode())
+    assert isinstance(xcode_assistant._map_file(path), xcode_assistant.mmap.mmap)
+    issues = XcodeAssistant(tmp_path).analyze_file(str(path))
+    assert [(issue['line'], issue['column'], issue['message']) for issue in issues] == [
+        (padding.count(b'\n') + 1, line.index('.duration') + 1, 'Potential deprecated API usage: .duration ')]
+
+def test_truncated_pbxproj_raises_value_error():
+    text = (REPO / 'MDB.xcodeproj' / 'project.pbxproj').read_text()
+    assert parse_pbxproj(text)['objects']
+    for end in range(0, len(text), 97):
+        try:
+            parse_pbxproj(text[:end])
+        except ValueError:
+            pass
+
+def test_truncated_pbxproj_error_message():
+    with pytest.raises(ValueError, match='Unexpected end'):
+        parse_pbxproj('// !$*UTF8*$!\n{ archiveVersion = 1; objects = {')
+    with pytest.raises(ValueError):
+        parse_pbxproj('archiveVersion')
+
+def _sendable_issues(content):
+    return XcodeAssistant(REPO).run_rules(content, 'f.swift', check='sendable_conformance')
+
+def test_async_call_before_for_in_is_not_an_async_closure():
+    content = b'''class Worker {
+    func run() {
+        let block = {
+            DispatchQueue.main.async(execute: work)
+            for item in items { print(item) }
+        }
+    }
+}
+'''
+    assert _sendable_issues(content) == []
+
+def test_async_closure_signature_is_an_async_closure():
+    content = b'''class Worker {
+    func run() {
+        let block = { [weak self] () async throws -> Int in
+            try await self?.fetch()
+        }
+    }
+}
+'''
+    assert [issue['line'] for issue in _sendable_issues(content)] == [1]
+
+def _literals(content):
+    return [content[start:end] for kind, start, end in tokenize_swift(content) if kind != 'code']
+
+def test_quote_in_regex_literal_does_not_open_a_string():
+    assert _literals(b'let r = /a"b/\nlet s = "x"\n') == [b'/a"b/', b'"x"']
+    assert _literals(b'let r = #/a/b"c/#\n') == [b'#/a/b"c/#']
+    assert _literals(b'let r = #/\n  "q\n/#\n') == [b'#/\n  "q\n/#']
+
+def test_division_is_not_a_regex_literal():
+    assert _literals(b'let q = a / b / c // "half"\nlet s = x/y/z\n') == [b'// "half"']
+
+def test_string_after_regex_literal_is_not_code():
+    content = b'let r = /"/; let s = "class Worker { }"\nfunc run() { Task { Worker() } }\n'
+    assert _sendable_issues(content) == []
+
+def test_cache_follows_extension_files(tmp_path):
+    (tmp_path / 'Worker.swift').write_text('class Worker {\n    func run() { Task { } }\n}\n')
+    extension = tmp_path / 'Worker+Sendable.swift'
+
+    def sendable_lines():
+        issues = XcodeAssistant(tmp_path, use_cache=True).analyze_project()
+        return [(Path(issue['file']).name, issue['line']) for issue in issues if issue['rule'] == 'class_sendable']
+
+    assert sendable_lines() == [('Worker.swift', 1)]
+    extension.write_text('extension Worker: @unchecked Sendable {}\n')
+    assert sendable_lines() == []
+    extension.unlink()
+    assert sendable_lines() == [('Worker.swift', 1)]
+
+def test_cache_directory_is_ignored_by_git(tmp_path):
+    (tmp_path / 'View.swift').write_bytes(SAMPLE)
+    first = XcodeAssistant(tmp_path, use_cache=True).analyze_project()
+    directory = tmp_path / xcode_assistant.CACHE_DIR_NAME
+    assert (directory / '.gitignore').read_text() == '*\n'
+    assert (directory / xcode_assistant.AnalysisCache.FILE_NAME).exists()
+    assert XcodeAssistant(tmp_path, use_cache=True).analyze_project() == first
+
+def test_watch_updates_only_what_a_save_changes(tmp_path):
+    (tmp_path / 'Worker.swift').write_text('class Worker {\n    func run() { Task { } }\n}\n')
+    other = tmp_path / 'Other.swift'
+    other.write_text('let x = 1\n')
+    assistant = XcodeAssistant(tmp_path)
+    paths = assistant.find_swift_files()
+    assistant.analyzed_keys = {assistant._key(path) for path in paths}
+    watched = WatchedIssues(assistant)
+    watched.update(dict(zip(paths, assistant.analyze_files(paths))))
+
+    def save(text):
+        other.write_text(text)
+        added, resolved = diff_issues(*assistant._update_watched(watched, [str(other)], set(), {}))
+        assert watched.issues() == XcodeAssistant(tmp_path).analyze_project(paths)
+        return [(Path(issue['file']).name, issue['line']) for issue in added + resolved]
+
+    assert save('extension Worker: @unchecked Sendable {}\n') == [('Worker.swift', 1)]
+    assert save('extension Worker: @unchecked Sendable {}\nlet d = asset.duration \n') == [('Other.swift', 2)]
+    assert save('let d = asset.duration \n') == [('Worker.swift', 1)]
+
+def _write_project(project, count):
+    for i in range(count):
+        module = project / f'Module{i % 3}'
+        module.mkdir(exist_ok=True)
+        (module / f'View{i}.swift').write_bytes(SAMPLE.replace(b'Player', b'Player%d' % i))
+    (project / 'Worker.swift').write_text('class Worker { }\n')
+    (project / 'Run.swift').write_text('func run() { Task { Worker() } }\n')
+
+def test_parallel_analysis_matches_serial_analysis(tmp_path):
+    _write_project(tmp_path, xcode_assistant.PARALLEL_MIN_FILES + 6)
+    serial = XcodeAssistant(tmp_path).analyze_project()
+    assert XcodeAssistant(tmp_path, jobs=2).analyze_project() == serial
+    assert any('used by async code in Run.swift' in issue['message'] for issue in serial)
+
+def test_ndjson_report_matches_json_report(tmp_path):
+    _write_project(tmp_path, 5)
+    assistant = XcodeAssistant(tmp_path)
+    assistant.analyze_project()
+    report = json.loads(assistant.generate_report())
+    out = io.StringIO()
+    assert XcodeAssistant(tmp_path).stream_report(out) == len(report)
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == report
+    assert assistant.generate_report('ndjson') == out.getvalue()
+
+def test_batch_fixes_use_the_analyzed_offsets(tmp_path):
+    path = tmp_path / 'View.swift'
+    path.write_text('a\nb\nc\nd\n')
+    fix = {'file': str(path), 'message': ''}
+    results = XcodeAssistant(tmp_path).apply_fixes([
+        dict(fix, line=2, original='b', replacement='b1\nb2\nb3'),
+        dict(fix, line=4, original='d', replacement='D'),
+        dict(fix, line=2, original='b', replacement='B'),
+        dict(fix, line=3, original='changed', replacement='C'),
+    ])
+    assert [result.split(':')[-1].strip() for result in results] == [
+        f'Applied fix to {path} line 2', f'Applied fix to {path} line 4', 'overlaps another fix',
+        'line changed since analysis']
+    assert path.read_text() == 'a\nb1\nb2\nb3\nc\nD\n'
+
+def test_session_rejects_fixes_to_changed_files(tmp_path):
+    path = tmp_path / 'Player.swift'
+    path.write_text('let seconds = asset.duration \n')
+    assistant = XcodeAssistant(tmp_path, use_cache=True)
+    assistant.analyze_project()
+    assistant.save_session()
+    fix = assistant.suggest_fixes(0)
+    assert fix['replacement'] == 'let seconds = try await asset.load(.duration)'
+
+    path.write_text('let x = 1\nlet seconds = asset.duration \n')
+    resumed = XcodeAssistant(tmp_path, use_cache=True)
+    assert resumed.load_session()
+    assert resumed.suggest_fixes(0) == f'{path} changed since it was analyzed, analyze the project again to fix it'
+    assert resumed.apply_fixes([fix]) == [f'Skipped fix for {path} line 1: file changed since analysis']
+    assert path.read_text() == 'let x = 1\nlet seconds = asset.duration \n'
+
+def _git(project, *args):
+    subprocess.run(['git', '-C', str(project), '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   check=True, capture_output=True)
+
+def test_changed_since_finds_committed_staged_and_untracked_files(tmp_path):
+    for name in ('Old.swift', 'Edited.swift', 'Committed.swift'):
+        (tmp_path / name).write_text('let x = 1\n')
+    _git(tmp_path, 'init', '-q')
+    _git(tmp_path, 'add', '.')
+    _git(tmp_path, 'commit', '-qm', 'base')
+    (tmp_path / 'Committed.swift').write_text('let x = 2\n')
+    _git(tmp_path, 'commit', '-qam', 'change')
+    (tmp_path / 'Edited.swift').write_text('let x = 2\n')
+    (tmp_path / 'New.swift').write_text('let x = 1\n')
+    (tmp_path / 'notes.txt').write_text('not Swift\n')
+
+    def changed(ref=None):
+        return [Path(path).name for path in XcodeAssistant(tmp_path).find_changed_swift_files(ref)]
+
+    assert changed() == ['Edited.swift', 'New.swift']
+    assert changed('HEAD~1') == ['Committed.swift', 'Edited.swift', 'New.swift']
+
+def test_daemon_reuses_its_analysis_until_a_file_changes(tmp_path):
+    path = tmp_path / 'Player.swift'
+    path.write_text('let seconds = asset.duration \n')
+    # Creating the cache directory would count as a change to the tree
+    expected = XcodeAssistant(tmp_path, use_cache=True).analyze_project()
+    server = AnalysisServer(str(tmp_path / 'daemon.sock'), XcodeAssistant(tmp_path, use_cache=True))
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    try:
+        client = DaemonClient(str(tmp_path / 'daemon.sock'))
+        assert client.analyze_project() == expected
+        analyzed = server.analyzed
+        assert client.analyze_project() == expected
+        assert server.analyzed is analyzed
+        path.write_text('let x = 1\n')
+        assert client.analyze_project() == []
+        with pytest.raises(RuntimeError, match='unknown command'):
+            client.request('frobnicate')
+        client.stop()
+    finally:
+        thread.join(10)
+        server.close()
+    assert not (tmp_path / 'daemon.sock').exists()
+
+def test_profile_times_stages_files_and_rules(tmp_path):
+    _write_project(tmp_path, 3)
+    profiler = Profiler()
+    issues = XcodeAssistant(tmp_path, profiler=profiler).analyze_project()
+    assert issues == XcodeAssistant(tmp_path).analyze_project()
+    out = io.StringIO()
+    profiler.report(out)
+    assert 'Slowest rules' in out.getvalue()
+    assert {'discovery', 'scan', 'project rules'} <= set(profiler.stages)
+    assert len(profiler.files) == 5
+    profiler.write_trace(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+
+def test_rule_out_of_time_is_reported_and_stopped():
+    slow = Rule(id='slow', check='deprecated_apis', issue_type='deprecated_api', pattern=re.compile(r'(a+)+b'),
+                message='{match}', suggestion='', prefix='a')
+    content = b'let seconds = asset.duration \n' + b'a' * 40 + b'\n'
+    started = time.perf_counter()
+    issues = XcodeAssistant(REPO, rules=tuple(RULES) + (slow,), rule_timeout=0.05).run_rules(content, 'f.swift')
+    assert time.perf_counter() - started < 5
+    assert [(issue['rule'], issue['line']) for issue in issues] == [('asset_duration', 1), ('analysis_timeout', 2)]
+    assert issues[1]['stopped_rule'] == 'slow'
+
+def _lsp_frame(payload):
+    body = json.dumps({'jsonrpc': '2.0', **payload}).encode()
+    return f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+def _lsp_unframe(data):
+    messages = []
+    while data:
+        header, _, rest = data.partition(b'\r\n\r\n')
+        length = int(header.split(b':')[1])
+        messages.append(json.loads(rest[:length]))
+        data = rest[length:]
+    return messages
+
+def _serve_lsp(project, messages, use_cache=False):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b''.join(map(_lsp_frame, messages)))
+    os.close(write_fd)
+    output = io.BytesIO()
+    try:
+        code = LanguageServer(read_fd, output, str(project), use_cache=use_cache).serve()
+    finally:
+        os.close(read_fd)
+    return code, _lsp_unframe(output.getvalue())
+
+def test_lsp_diagnoses_the_buffer_and_offers_quick_fixes(tmp_path):
+    path = tmp_path / 'Player.swift'
+    path.write_text('let x = 1\n')
+    uri = path.as_uri()
+    code, replies = _serve_lsp(tmp_path, [
+        {'id': 1, 'method': 'initialize', 'params': {}},
+        {'method': 'initialized', 'params': {}},
+        {'method': 'textDocument/didOpen', 'params': {'textDocument': {
+            'uri': uri, 'languageId': 'swift', 'version': 1, 'text': 'let seconds = asset.duration \n'}}},
+        # Replace "asset.duration " by an AVAsset initializer
+        {'method': 'textDocument/didChange', 'params': {'textDocument': {'uri': uri, 'version': 2}, 'contentChanges': [
+            {'range': {'start': {'line': 0, 'character': 14}, 'end': {'line': 0, 'character': 29}},
+             'text': 'AVAsset(url: url)'}]}},
+        {'id': 2, 'method': 'textDocument/codeAction', 'params': {'textDocument': {'uri': uri}, 'range': {
+            'start': {'line': 0, 'character': 0}, 'end': {'line': 0, 'character': 0}}, 'context': {'diagnostics': []}}},
+        {'id': 3, 'method': 'shutdown'},
+        {'method': 'exit'},
+    ])
+    assert code == 0
+    published = [reply['params'] for reply in replies if reply.get('method') == 'textDocument/publishDiagnostics']
+    assert [diagnostic['code'] for diagnostic in published[0]['diagnostics']] == ['asset_duration']
+    assert published[0]['diagnostics'][0]['range']['start'] == {'line': 0, 'character': 19}
+    actions = next(reply['result'] for reply in replies if reply.get('id') == 2)
+    assert [action['edit']['changes'][uri][0]['newText'] for action in actions] == ['let seconds = AVURLAsset(url: url)\n']
+    # The buffer is analyzed, never the file on disk
+    assert path.read_text() == 'let x = 1\n'
+
+def test_lsp_follows_conformances_across_files(tmp_path):
+    path = tmp_path / 'Worker.swift'
+    path.write_text('class Worker { }\n')
+    (tmp_path / 'Run.swift').write_text('func run() { Task { Worker() } }\n')
+    XcodeAssistant(tmp_path, use_cache=True).analyze_project()
+    server = LanguageServer(None, io.BytesIO(), str(tmp_path))
+    server.initialize({})
+    server.did_open({'textDocument': {'uri': path.as_uri(), 'text': 'class Worker { }\n', 'version': 1}})
+    document = server.documents[path.as_uri()]
+    assert [issue['message'] for issue in document.issues] == [
+        'Class Worker might need Sendable conformance for use in async contexts (used by async code in Run.swift)']
+
+    document.text = 'class Worker { }\nextension Worker: @unchecked Sendable {}\n'
+    assert server.analyze(document) == []
+    document.text = 'class Worker { }\n'
+    assert len(server.analyze(document)) == 1
+    # The index is updated in place rather than rebuilt for every edit
+    assert server.assistant.symbols.by_name == XcodeAssistant(tmp_path, use_cache=True).symbols.by_name
+
+def _discovered(project, **options):
+    return sorted(os.path.relpath(path, project) for path in XcodeAssistant(project, **options).find_swift_files())
+
+def test_discovery_honors_ignore_files_and_skipped_directories(tmp_path):
+    for relative in ('App.swift', 'Pods/Lib.swift', 'Build.xcodeproj/Gen.swift', 'Generated/Gen.swift',
+                     'Module/View.swift', 'Module/Local.swift', 'Module/Keep.swift'):
+        (tmp_path / relative).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative).write_text('let x = 1\n')
+    (tmp_path / '.gitignore').write_text('Generated/\n')
+    (tmp_path / 'Module' / '.xcodeassistantignore').write_text('*.swift\n!Keep.swift\n')
+    assert _discovered(tmp_path) == ['App.swift', 'Module/Keep.swift']
+
+def test_include_and_exclude_globs(tmp_path):
+    for relative in ('MetadataTop.swift', 'ModuleA/MetadataView.swift', 'ModuleA/Deep/MetadataStore.swift',
+                     'ModuleA/View.swift', 'ModuleB/View.swift'):
+        (tmp_path / relative).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative).write_text('let x = 1\n')
+    # Without a slash a glob matches at any depth, as in .gitignore
+    assert _discovered(tmp_path, exclude=['*Metadata*.swift']) == ['ModuleA/View.swift', 'ModuleB/View.swift']
+    assert _discovered(tmp_path, include=['View.swift']) == ['ModuleA/View.swift', 'ModuleB/View.swift']
+    # With one it is anchored to the project
+    assert _discovered(tmp_path, exclude=['/Metadata*.swift', 'ModuleA/**']) == ['ModuleB/View.swift']
+    assert _discovered(tmp_path, include=['ModuleA/*.swift'], exclude=['**/Metadata*']) == ['ModuleA/View.swift']
+
+def test_rule_declarations_hold_for_their_patterns():
+    assert {rule.id: redos.declaration_errors(xcode_assistant, rule) for rule in RULES} == {
+        rule.id: [] for rule in RULES}
+
+def test_text_interpolation_rule_matches_in_linear_time():
+    rule = next(rule for rule in RULES if rule.id == 'text_conditional_interpolation')
+    args = argparse.Namespace(seed=0, repeat=3, min_time=0.002, max_size=1 << 14, max_exponent=1.5)
+    assert all(result['exponent'] <= args.max_exponent for result in redos.measure_rule(xcode_assistant, rule, args))
+
+def _results(seconds, files=1000):
+    return {'corpus': {'settings': {'files': files}}, 'startup_seconds': [0.1, 0.1, 0.1],
+            'runs': [{'stages': {'analysis': {'seconds': value}}, 'peak_rss_kb': 1000} for value in seconds]}
+
+def test_compare_fails_only_on_changes_beyond_threshold_and_noise():
+    thresholds = {'throughput': 5.0, 'memory': 5.0, 'startup': 5.0}
+    steady = _results([1.0, 1.0, 1.01])
+
+    def status(candidate):
+        rows = bench.compare_results(steady, candidate, thresholds)
+        return next(row['status'] for row in rows if row['metric'] == 'analysis files/sec')
+
+    assert status(_results([1.02, 1.01, 1.02])) == 'ok'
+    assert status(_results([1.2, 1.21, 1.2])) == 'REGRESSION'
+    assert status(_results([0.8, 0.8, 0.81])) == 'improved'
+    # A slowdown within the spread of noisy runs is not a regression
+    assert status(_results([1.2, 0.7, 1.6])) == 'ok'
@@ -4,184 +4,3402 @@ Xcode Assistant - A tool to help find and fix common Swift issues
 """
 
 import os
+import io
 import re
 import sys
 import json
-import subprocess
+import mmap
+import time
+import signal
+import select
+import socket
+import socketserver
+import struct
 import argparse
+import shutil
+import hashlib
+import tempfile
+import threading
+from bisect import bisect_right
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from itertools import accumulate, chain, islice
 from pathlib import Path
+from xcode_assistant_actions import add_action_arguments, default_socket_path, format_report, ndjson_line, run_actions
+
+class LineIndex:
+    """Map offsets in a file to 1-based line and column numbers
+
+    content is either text or the file's UTF-8 bytes.  For bytes, offsets
+    are byte offsets while columns still count characters: only the start
+    of the line asked about is decoded.
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+    @cached_property
+    def line_starts(self):
+        """Offsets at which each line starts, built on first use: most files have no issues"""
+        content = self.content
+        newline = '\n' if isinstance(content, str) else b'\n'
+        if isinstance(content, (str, bytes)):
+            # Summing line lengths runs in C, unlike a loop over the matches of the newlines
+            return list(accumulate(map((1).__add__, map(len, content.split(newline)[:-1])), initial=0))
+        line_starts = [0]
+        line_starts.extend(m.end() for m in re.finditer(newline, content))
+        return line_starts
+
+    def line_of(self, offset):
+        """Return the 1-based line number containing offset"""
+        return bisect_right(self.line_starts, offset)
+
+    def position(self, offset):
+        """Return the 1-based (line, column) pair for offset"""
+        line = bisect_right(self.line_starts, offset)
+        start = self.line_starts[line - 1]
+        if isinstance(self.content, str):
+            return line, offset - start + 1
+        return line, len(_decode(self.content[start:offset])) + 1
+
+class LineCursor:
+    """Map offsets to line and column numbers like LineIndex, without indexing every line
+
+    Used for streamed files: newlines are counted from the last offset
+    asked about, so memory stays constant when offsets are asked about in
+    increasing order, as the rule scan does.  The count at the start of
+    every window is kept, which makes going back cheap too.
+    """
+
+    def __init__(self, content, window=None):
+        self.content = content
+        self.window = window or STREAM_WINDOW
+        # (offset, line, line start) at the start of each window counted so far
+        self._checkpoints = [(0, 1, 0)]
+        self._offset = 0
+        self._line = 1
+        self._line_start = 0
+
+    def _seek(self, offset):
+        """Count lines up to offset"""
+        offset = min(offset, len(self.content))
+        if offset < self._offset:
+            i = bisect_right(self._checkpoints, (offset, float('inf'))) - 1
+            self._offset, self._line, self._line_start = self._checkpoints[i]
+        while self._offset < offset:
+            end = min(offset, (self._offset // self.window + 1) * self.window)
+            chunk = self.content[self._offset:end]
+            count = chunk.count(b'\n')
+            if count:
+                self._line += count
+                self._line_start = self._offset + chunk.rfind(b'\n') + 1
+            self._offset = end
+            if end % self.window == 0 and end > self._checkpoints[-1][0]:
+                self._checkpoints.append((end, self._line, self._line_start))
+
+    def line_of(self, offset):
+        """Return the 1-based line number containing offset"""
+        self._seek(offset)
+        return self._line
+
+    def position(self, offset):
+        """Return the 1-based (line, column) pair for offset"""
+        self._seek(offset)
+        return self._line, len(_decode(self.content[self._line_start:offset])) + 1
+
+def _decode(data):
+    """Decode UTF-8 bytes from a source file, replacing invalid sequences"""
+    return data.decode('utf-8', 'replace')
+
+# Files at least this large are memory-mapped instead of read
+MMAP_MIN_SIZE = 1 << 16
+
+def _map_file(file_path):
+    """Return the raw bytes of a file, as a read-only memory map when it is large
+
+    The map is released when the returned object is garbage collected.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            try:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+        return f.read()
+
+# Files at least this large are streamed: scanned in windows of STREAM_WINDOW bytes, so the
+# memory used does not grow with the file.  A match is cut off after STREAM_MAX_OVERLAP bytes
+STREAM_MIN_SIZE = 1 << 25
+STREAM_WINDOW = 1 << 20
+STREAM_MAX_OVERLAP = 1 << 16
+
+def _release_pages(data, start, end):
+    """Let the OS drop the pages of a memory map between start and end, which are read again if needed"""
+    if not isinstance(data, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+        return
+    start -= start % mmap.PAGESIZE
+    if end > start:
+        data.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+def _normalize_newlines(data):
+    """Translate CRLF and CR line breaks to LF as text mode does, copying the data only if it has any
+    
+    A streamed file is translated window by window into a temporary file
+    and mapped from there instead of being copied into memory.
+    """
+    if len(data) < STREAM_MIN_SIZE:
+        if data.find(b'\r') == -1:
+            return data
+        return data[:].replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    
+    for start in range(0, len(data), STREAM_WINDOW):
+        found = data.find(b'\r', start, start + STREAM_WINDOW) != -1
+        _release_pages(data, start, start + STREAM_WINDOW)
+        if found:
+            break
+    else:
+        return data
+    with tempfile.TemporaryFile() as spool:
+        carry = b''
+        for start in range(0, len(data), STREAM_WINDOW):
+            chunk = carry + data[start:start + STREAM_WINDOW]
+            # A CR at the end of a window may be the first half of a CRLF
+            carry = b'\r' if chunk.endswith(b'\r') and start + STREAM_WINDOW < len(data) else b''
+            spool.write(chunk[:len(chunk) - len(carry)].replace(b'\r\n', b'\n').replace(b'\r', b'\n'))
+            _release_pages(data, start, start + STREAM_WINDOW)
+        spool.flush()
+        return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _sha256(data):
+    """Return the SHA-256 hex digest of a file's bytes, a window at a time when it is streamed"""
+    if len(data) < STREAM_MIN_SIZE:
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    for start in range(0, len(data), STREAM_WINDOW):
+        digest.update(data[start:start + STREAM_WINDOW])
+        _release_pages(data, start, start + STREAM_WINDOW)
+    return digest.hexdigest()
+
+def _read_source_bytes(file_path):
+    """Return a Swift file's contents as the bytes the rules are matched against"""
+    return _normalize_newlines(_map_file(file_path))
+
+# Word characters of UTF-8 text: non-ASCII bytes are taken to belong to Unicode letters
+_WORD_BYTES = rb'\w\x80-\xff'
+_WORD_ESCAPES = {
+    rb'\w': b'[' + _WORD_BYTES + b']',
+    rb'\W': b'[^' + _WORD_BYTES + b']',
+    rb'\b': rb'(?:(?<=[%s])(?![%s])|(?<![%s])(?=[%s]))' % ((_WORD_BYTES,) * 4),
+    rb'\B': rb'(?:(?<=[%s])(?=[%s])|(?<![%s])(?![%s]))' % ((_WORD_BYTES,) * 4),
+}
+
+# The same as a set of byte values, to test single bytes without a regex
+_WORD_BYTE_SET = frozenset(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz' + bytes(range(0x80, 0x100)))
+
+def _word_regex(pattern, flags=0):
+    """Compile a bytes pattern with \\w, \\W, \\b and \\B extended to non-ASCII bytes
+    
+    Bytes patterns only know ASCII word characters, which would split
+    identifiers such as Café; this keeps them whole as text patterns do.
+    """
+    pieces = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        token = pattern[i:i + 2] if pattern[i:i + 1] == b'\\' else pattern[i:i + 1]
+        piece = token
+        if in_class:
+            if token == rb'\w':
+                piece = _WORD_BYTES
+            # A ] right after [ or [^ is a literal
+            elif token == b']' and pattern[i - 1:i] != b'[' and pattern[i - 2:i] != b'[^':
+                in_class = False
+        elif token in _WORD_ESCAPES:
+            piece = _WORD_ESCAPES[token]
+        elif token == b'[':
+            in_class = True
+        pieces.append(piece)
+        i += len(token)
+    return re.compile(b''.join(pieces), flags)
+
+def _word_regexes(pattern, flags=0):
+    """Compile a bytes pattern as is, exact and faster for ASCII content, and through _word_regex"""
+    return re.compile(pattern, flags), _word_regex(pattern, flags)
+
+# Characters that may change the lexer state in code, and in code inside a string interpolation.
+# Plain character classes keep the search fast; the event itself is decoded in Python.
+_CODE_EVENT = re.compile(rb'[/#"]')
+_INTERPOLATION_EVENT = re.compile(rb'[/#"()\n]')
+_BLOCK_COMMENT_EVENT = re.compile(rb'/\*|\*/')
+
+@lru_cache(maxsize=None)
+def _string_event(hashes, multiline):
+    """Return the regex finding escapes, interpolations and the end of a string body"""
+    escape = b'\\\\' + b'#' * hashes
+    close = (b'"""' if multiline else b'"') + b'#' * hashes
+    # Not even an escaped line break continues a single-line string
+    escaped = b'.' if multiline else rb'[^\n]'
+    pattern = b'(?P<interpolation>' + escape + b'\\()|' + escape + escaped + b'|(?P<close>' + close + b')'
+    if not multiline:
+        pattern += rb'|(?P<newline>\n)'
+    return re.compile(pattern, re.DOTALL)
+
+def _scan_string(content, pos, hashes, multiline):
+    """Scan a string body from pos; returns (end, interpolated)
+
+    end is just past the closing delimiter, or just past the '\\(' opening an
+    interpolation when interpolated is True.  Unterminated single-line
+    strings end at the newline.
+    """
+    event_pattern = _string_event(hashes, multiline)
+    while True:
+        event = event_pattern.search(content, pos)
+        if event is None:
+            return len(content), False
+        if event.lastgroup == 'interpolation':
+            return event.end(), True
+        if event.lastgroup == 'close':
+            return event.end(), False
+        if event.lastgroup == 'newline':
+            return event.start(), False
+        pos = event.end()
+
+# A '/' that opens a bare regex literal: in prefix position, after a line break, a space or an opening
+# bracket or separator and before anything but whitespace, as Swift decides whether an operator is prefix
+_REGEX_START = re.compile(rb'(?:^|(?<=[ \t\r([{,:;]))/(?![ \t\r\n/*])', re.MULTILINE)
+# The rest of a bare regex literal, which ends on its line: escapes and character classes may hold '/'
+_REGEX_BODY = re.compile(rb'(?:\\[^\n]|\[(?:\\[^\n]|[^\]\\\n])*\]|[^/\\\[\n])*/')
+
+def _scan_regex(content, start, hashes):
+    """Return the end of the regex literal whose delimiter starts at start, or None if there is none
+    
+    start is at the '/' of a bare /.../ literal, or at the first '#' of a
+    #/.../# one.  A bare literal must be in prefix position and end on its
+    line; an extended one only spans lines when a line break follows its
+    opening delimiter.
+    """
+    if not hashes:
+        if _REGEX_START.match(content, start) is None:
+            return None
+        body = _REGEX_BODY.match(content, start + 1)
+        return body.end() if body is not None else None
+    body_start = start + hashes + 1
+    close = b'/' + b'#' * hashes
+    if content[body_start:body_start + 1] in (b'\n', b'\r'):
+        end = content.find(close, body_start)
+    else:
+        line_end = content.find(b'\n', body_start)
+        end = content.find(close, body_start, len(content) if line_end == -1 else line_end)
+    return end + len(close) if end != -1 else None
+
+def tokenize_swift(content):
+    """Yield (kind, start, end) tokens covering the bytes of content, where kind is 'code', 'comment' or 'string'
+
+    Handles nested block comments, multi-line and raw strings, and string
+    interpolation: the code inside '\\( )' is yielded as 'code', and the
+    string resumes after the closing parenthesis.  Regex literals, /.../
+    and #/.../#, are yielded as 'string' (see _scan_regex).  Only block
+    comments, multi-line strings and extended regex literals opened at the
+    end of a line carry on past the end of a line.  Tokens are
+    produced lazily, so callers can stop early.
+    """
+    pos = 0
+    code_start = 0
+    length = len(content)
+    # Open interpolations, innermost last: [hashes, multiline, parenthesis depth]
+    stack = []
+    while True:
+        event = (_INTERPOLATION_EVENT if stack else _CODE_EVENT).search(content, pos)
+        if event is None:
+            break
+        start = event.start()
+        char = event.group(0)
+        
+        if char == b'\n':
+            # Interpolations in a single-line string end with its line, like the string itself
+            while stack and not stack[-1][1]:
+                stack.pop()
+            pos = start + 1
+            continue
+        
+        if char == b'(':
+            stack[-1][2] += 1
+            pos = start + 1
+            continue
+        
+        if char == b')':
+            pos = start + 1
+            if stack[-1][2]:
+                stack[-1][2] -= 1
+                continue
+            # The interpolation is over and its string resumes
+            hashes, multiline, _ = stack.pop()
+            if pos > code_start:
+                yield 'code', code_start, pos
+            string_start = body_start = pos
+        
+        elif char == b'/':
+            following = content[start + 1:start + 2]
+            if following == b'/':
+                if start > code_start:
+                    yield 'code', code_start, start
+                end = content.find(b'\n', start + 2)
+                end = length if end == -1 else end
+                yield 'comment', start, end
+                pos = code_start = end
+            elif following == b'*':
+                if start > code_start:
+                    yield 'code', code_start, start
+                depth = 1
+                end = start + 2
+                while depth:
+                    marker = _BLOCK_COMMENT_EVENT.search(content, end)
+                    if marker is None:
+                        end = length
+                        break
+                    depth += 1 if marker.group(0) == b'/*' else -1
+                    end = marker.end()
+                yield 'comment', start, end
+                pos = code_start = end
+            else:
+                end = _scan_regex(content, start, 0)
+                if end is not None:
+                    if start > code_start:
+                        yield 'code', code_start, start
+                    yield 'string', start, end
+                    code_start = end
+                pos = end or start + 1
+            continue
+        
+        else:
+            # A string starts with optional '#'s for raw strings, then " or """
+            quote = start
+            while content[quote:quote + 1] == b'#':
+                quote += 1
+            if content[quote:quote + 1] == b'/':
+                end = _scan_regex(content, start, quote - start)
+                if end is not None:
+                    if start > code_start:
+                        yield 'code', code_start, start
+                    yield 'string', start, end
+                    pos = code_start = end
+                    continue
+            if content[quote:quote + 1] != b'"':
+                pos = quote
+                continue
+            if start > code_start:
+                yield 'code', code_start, start
+            hashes = quote - start
+            multiline = content[quote:quote + 3] == b'"""'
+            string_start = start
+            body_start = quote + (3 if multiline else 1)
+        
+        end, interpolated = _scan_string(content, body_start, hashes, multiline)
+        if end > string_start:
+            yield 'string', string_start, end
+        if interpolated:
+            stack.append([hashes, multiline, 0])
+        pos = code_start = end
+    
+    if code_start < len(content):
+        yield 'code', code_start, len(content)
+
+# A string without interpolations that ends on its line, as tokenize_swift() reads it
+_PLAIN_STRING = re.compile(rb'"[^"\\\n]*(?:\\[^(\n][^"\\\n]*)*"')
+
+# Maps every byte but line breaks, which masking keeps so lines stay aligned, to a space
+_BLANK = bytes(10 if byte == 10 else 32 for byte in range(256))
+
+class CodeMap:
+    """The comment and string literal spans of a file
+
+    The file is tokenized once, incrementally: tokens are only pulled from
+    tokenize_swift() as far as the offsets asked about, so files where no
+    rule pattern matches are never tokenized at all.  In a file without
+    block comments, multi-line strings or extended regex literals no span
+    crosses a line break, so only the lines asked about are read, and only
+    when they contain a character that can start a literal; comments and
+    plain strings are then found with find(), and the tokenizer is left
+    the rest of lines with interpolated or raw strings or regex literals.
+    """
+
+    def __init__(self, content):
+        self.starts = []
+        self.ends = []
+        self._content = content
+        self._tokens = tokenize_swift(content)
+        self._scanned = 0
+        self._length = len(content)
+        # Spans per line read, keyed by the line's start, when lines can be read on their own.
+        # Streamed files are not searched whole for the delimiters.
+        self._lines = None
+        if (self._length < STREAM_MIN_SIZE and content.find(b'/*') == -1
+                and content.find(b'"""') == -1 and content.find(b'#/') == -1):
+            self._lines = {}
+
+    def _advance(self, offset):
+        """Tokenize until the token containing offset has been seen"""
+        if self._scanned > offset:
+            return
+        starts = self.starts
+        ends = self.ends
+        scanned = self._scanned
+        for kind, start, end in self._tokens:
+            scanned = end
+            if kind != 'code':
+                if ends and ends[-1] == start:
+                    # Merge adjacent comments and strings into one span
+                    ends[-1] = end
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            if end > offset:
+                break
+        self._scanned = scanned
+
+    def _line_spans(self, line_start):
+        """Return the (starts, ends) of the spans on the line starting at line_start"""
+        spans = self._lines.get(line_start)
+        if spans is None:
+            line_end = self._content.find(b'\n', line_start)
+            spans = self._lines[line_start] = self._find_spans(line_start,
+                                                               self._length if line_end == -1 else line_end)
+        return spans
+
+    def _find_spans(self, start, end):
+        """Return the (starts, ends) of the spans on the lines from start to end, which are line boundaries
+        
+        Comments and plain strings are found with find(); from any other
+        string to the end of its line, the line is left to tokenize_swift().
+        """
+        content = self._content
+        starts = []
+        ends = []
+        quote = content.find(b'"', start, end)
+        comment = content.find(b'//', start, end)
+        regex = self._find_regex_start(start, end)
+        while quote != -1 or comment != -1 or regex != -1:
+            event = min(offset for offset in (quote, comment, regex) if offset != -1)
+            if event == comment:
+                position = content.find(b'\n', comment, end)
+                position = end if position == -1 else position
+                starts.append(comment)
+                ends.append(position)
+            else:
+                plain = _PLAIN_STRING.match(content, quote, end) if event == quote else None
+                if plain is not None and content[quote - 1:quote] != b'#':
+                    position = plain.end()
+                    starts.append(quote)
+                    ends.append(position)
+                else:
+                    # A raw string starts at its first '#'
+                    first = event
+                    while first > start and content[first - 1:first] == b'#' and (not ends or first > ends[-1]):
+                        first -= 1
+                    position = content.find(b'\n', event, end)
+                    position = end if position == -1 else position
+                    for kind, token_start, token_end in tokenize_swift(content[first:position]):
+                        if kind != 'code':
+                            starts.append(first + token_start)
+                            ends.append(first + token_end)
+            if quote != -1 and quote < position:
+                quote = content.find(b'"', position, end)
+            if comment != -1 and comment < position:
+                comment = content.find(b'//', position, end)
+            if regex != -1 and regex < position:
+                regex = self._find_regex_start(position, end)
+        return starts, ends
+    
+    def _find_regex_start(self, start, end):
+        """Return the offset of the first '/' from start to end that may open a bare regex literal, or -1"""
+        content = self._content
+        slash = content.find(b'/', start, end)
+        # Checked one slash at a time: searching for the regex itself would examine every byte
+        while slash != -1 and _REGEX_START.match(content, slash) is None:
+            slash = content.find(b'/', slash + 1, end)
+        return slash
+
+    def skip(self, offset):
+        """Return the end of the comment or string containing offset, or None if offset is code"""
+        if self._lines is not None:
+            line_start = self._content.rfind(b'\n', 0, offset) + 1
+            # A literal containing offset starts on its line, at offset at the latest
+            if _CODE_EVENT.search(self._content, line_start, offset + 1) is None:
+                return None
+            starts, ends = self._line_spans(line_start)
+        else:
+            self._advance(offset)
+            starts, ends = self.starts, self.ends
+        i = bisect_right(starts, offset) - 1
+        if i >= 0 and offset < ends[i]:
+            return ends[i]
+        return None
+
+    def is_code(self, offset):
+        """Check if offset is outside comments and string literals"""
+        return self.skip(offset) is None
+
+    def forget(self, offset):
+        """Drop the spans that end by offset, once nothing before it will be asked about"""
+        i = bisect_right(self.ends, offset)
+        del self.starts[:i]
+        del self.ends[:i]
+
+    def masked(self, start=0, end=None):
+        """Return the content (or the part from start to end) with comments and string literals blanked out
+
+        Offsets are unchanged: every blanked byte is replaced by a space.
+        """
+        end = self._length if end is None else end
+        if self._lines is not None:
+            # Spans are found from the start of the line of start
+            line_end = self._content.find(b'\n', end)
+            starts, ends = self._find_spans(self._content.rfind(b'\n', 0, start) + 1,
+                                            self._length if line_end == -1 else line_end)
+        else:
+            self._advance(end)
+            starts, ends = self.starts, self.ends
+        pieces = []
+        position = start
+        for i in range(bisect_right(ends, start), len(starts)):
+            if starts[i] >= end:
+                break
+            span_start = max(starts[i], start)
+            span_end = min(ends[i], end)
+            pieces.append(self._content[position:span_start])
+            pieces.append(self._content[span_start:span_end].translate(_BLANK))
+            position = span_end
+        pieces.append(self._content[position:end])
+        return b''.join(pieces)
+
+class FileContext:
+    """Per-file state shared by the rules while one file is analyzed
+
+    content holds the file's UTF-8 bytes; text is encoded on the way in.
+    Files of STREAM_MIN_SIZE bytes or more are streamed: window is then
+    the size of the windows they are scanned in, and lines are counted
+    by a LineCursor instead of a LineIndex.
+    """
+
+    def __init__(self, content, file_path, line_index=None, code_map=None):
+        if isinstance(content, str):
+            content = content.encode('utf-8', 'surrogateescape')
+        self.content = content
+        self.file_path = file_path
+        self.window = STREAM_WINDOW if len(content) >= STREAM_MIN_SIZE else None
+        if line_index is None:
+            line_index = LineCursor(content, self.window) if self.window else LineIndex(content)
+        self.line_index = line_index
+        self.code_map = code_map if code_map is not None else CodeMap(content)
+
+    @cached_property
+    def may_run_async(self):
+        """Check if the file contains Task, .task or async, without which it has no async region
+        
+        Streamed files are assumed to, rather than searched whole.
+        """
+        return self.window is not None or any(self.content.find(keyword) != -1 for keyword in _ASYNC_KEYWORDS)
+
+    @cached_property
+    def scopes(self):
+        """The file's ScopeTree, built on first use"""
+        if self.window is None:
+            return ScopeTree(self.code_map.masked())
+        # Lexed again with a CodeMap of its own, as the rule scan may still be using the shared one
+        code_map = CodeMap(self.content)
+        tree = ScopeTree()
+        length = len(self.content)
+        for start in range(0, length, self.window):
+            end = min(start + self.window, length)
+            tree.feed(code_map.masked(start, end), final=end == length)
+            code_map.forget(end)
+            _release_pages(self.content, start, end)
+        return tree
+
+_SCOPE_EVENT = re.compile(rb'[{};]')
+_BRACE = re.compile(rb'[{}]')
+
+# The scope regexes are (ASCII, UTF-8) pairs from _word_regexes, indexed by whether the text is UTF-8
+
+# A type declaration at the end of the code before its opening brace
+_TYPE_DECLARATION = _word_regexes(rb'''
+    \b(?P<kind>class|struct|enum|actor|extension|protocol)\s+
+    (?!(?:func|var|let|subscript|init|deinit|override|final|static|private|fileprivate|internal|public|open)\b)
+    (?P<name>[A-Za-z_][\w.]*)\s*
+    (?:<[^{]*?>)?\s*
+    (?::\s*(?P<conformances>[^{]*?))?\s*
+    (?:\bwhere\b[^{]*)?$
+''', re.VERBOSE)
+
+# Headers of braces whose body runs asynchronously: Task {}, .task {} and async functions
+_ASYNC_HEADER = _word_regexes(rb'''
+    (?:\bTask(?:\.detached)?|\.task)\s*(?:\((?:[^()]|\([^()]*\))*\))?\s*$
+  | (?:\)|\bget)\s*async\b[^{]*$
+''', re.VERBOSE)
+
+# The signature of a closure declared async, e.g. { [weak self] () async throws in, right after
+# its opening brace and on one line, so a call such as queue.async(execute:) is not one
+_ASYNC_CLOSURE = _word_regexes(rb'''
+    \s*(?:@\w+[ \t]*)*
+    (?:\[[^\]\n]*\][ \t]*)?
+    (?:\((?:[^()\n]|\([^()\n]*\))*\)|\w+(?:[ \t]*,[ \t]*\w+)*)?[ \t]*
+    \basync\b(?:[ \t]*(?:re)?throws\b(?:[ \t]*\([^()\n]*\))?)?
+    (?:[ \t]*->[^{}\n;=]+?)?[ \t]*\bin\b
+''', re.VERBOSE)
+
+_TYPE_NAME = _word_regexes(rb'\b[A-Z]\w*')
+
+class TypeScope:
+    """A type declaration, from its keyword to the opening brace of its body"""
+
+    __slots__ = ('kind', 'name', 'conformances', 'keyword', 'start', 'contains_async')
+
+    def __init__(self, kind, name, conformances, keyword, start, contains_async=None):
+        self.kind = kind
+        self.name = name
+        self.conformances = conformances
+        self.keyword = keyword
+        self.start = start
+        # Whether an async region opens inside the body, None until ScopeTree.has_async_region() checks
+        self.contains_async = contains_async
+
+    @property
+    def is_sendable(self):
+        """Check if the declaration's own conformance list includes Sendable"""
+        return _lists_sendable(self.conformances)
+
+def _conformances(declaration):
+    """Return the conformance list of a _TYPE_DECLARATION match, decoded"""
+    conformances = _decode(declaration.group('conformances') or b'')
+    return [c.strip() for c in conformances.split(',') if c.strip()]
+
+def _lists_sendable(conformances):
+    """Check if a conformance list includes Sendable, with or without attributes such as @unchecked"""
+    return any(c.split()[-1] == 'Sendable' for c in conformances if c.split())
+
+# How much of a streamed file ScopeTree.feed() keeps buffered: the text before a brace
+# examined as its header, and how far an async closure signature is looked for after it
+SCOPE_CONTEXT_LIMIT = 1 << 16
+
+# How many class and extension declarations, and async use sites, a chunked ScopeTree records
+STREAMED_SYMBOL_LIMIT = 1 << 14
+
+# Keywords of every declaration or async header: _TYPE_DECLARATION's kinds, Task/.task and async
+_HEADER_KEYWORDS = (b'class', b'struct', b'enum', b'actor', b'extension', b'protocol', b'Task', b'.task', b'async')
+
+class ScopeTree:
+    """Type declarations and async regions of a file
+
+    Works on the masked bytes from CodeMap.masked(), so braces and
+    keywords inside comments and strings are ignored.  Names and
+    conformances are decoded to text.  Async regions are
+    the bodies of Task {}/.task {} closures, async functions and closures
+    whose signature is marked async.
+
+    Given whole, the masked bytes are examined sparsely: only braces
+    whose header contains one of _HEADER_KEYWORDS, or that an async
+    keyword follows, are looked at, and braces are only walked through
+    inside async regions and the declarations has_async_region() is asked
+    about.  They can instead be fed in consecutive chunks, walking every
+    brace once, so that a very large file is never held in memory at
+    once; a chunked tree only keeps the last SCOPE_CONTEXT_LIMIT bytes
+    before a brace, the scopes still open, and the first
+    STREAMED_SYMBOL_LIMIT class and extension declarations and async use
+    sites.
+    """
+
+    def __init__(self, masked=None):
+        self.declarations = {}
+        # Offsets of the opening braces of async regions, in file order; a chunked tree
+        # instead marks the declarations containing them as it goes
+        self.async_regions = []
+        # (name, offset) of every capitalized identifier inside an async region, in file order
+        self.async_uses = []
+        self._masked = None
+        self._stack = []
+        self._open_async = 0
+        self._buffer = b''
+        self._base = 0
+        # Offsets of the next brace to handle, the start of its header and
+        # the text not yet searched for async uses
+        self._next = 0
+        self._boundary = 0
+        self._uses_from = 0
+        if masked is not None:
+            self._build(masked)
+
+    def _build(self, masked):
+        """Find the declarations and async regions of a whole file from the braces that may open them"""
+        self._masked = masked
+        utf8 = self._utf8 = not masked.isascii()
+        
+        # Braces whose header contains a keyword, the first scope event after each occurrence, with the
+        # first declaration kind and Task/.task in the header.  Their regexes can be searched from there,
+        # but the async of an async function may follow get or ) directly.
+        declaration_keywords = {}
+        task_keywords = {}
+        async_headers = set()
+        for keyword in _HEADER_KEYWORDS:
+            # The regexes only match the others where a word starts
+            word_start = keyword not in (b'.task', b'async')
+            firsts = task_keywords if keyword in (b'Task', b'.task') else declaration_keywords
+            found = masked.find(keyword)
+            while found != -1:
+                if word_start and found and masked[found - 1] in _WORD_BYTE_SET:
+                    found = masked.find(keyword, found + 1)
+                    continue
+                event = _SCOPE_EVENT.search(masked, found)
+                if event is None:
+                    break
+                brace = event.start()
+                if event.group(0) == b'{':
+                    if keyword == b'async':
+                        async_headers.add(brace)
+                    elif found < firsts.get(brace, brace):
+                        firsts[brace] = found
+                # Every occurrence before the event belongs to the same header
+                found = masked.find(keyword, event.end())
+        
+        # Braces that may open an async closure: the last brace before each async, when it opens
+        closures = set()
+        found = masked.find(b'async')
+        searched = 0
+        brace = -1
+        while found != -1:
+            if found and masked[found - 1] in _WORD_BYTE_SET:
+                found = masked.find(b'async', found + 1)
+                continue
+            brace = max(brace, masked.rfind(b'{', searched, found), masked.rfind(b'}', searched, found))
+            if brace != -1 and masked[brace:brace + 1] == b'{':
+                closures.add(brace)
+            searched = found
+            found = masked.find(b'async', found + 1)
+        
+        previous = -1
+        for i in sorted(declaration_keywords.keys() | task_keywords.keys() | async_headers | closures):
+            declaration = is_async = None
+            if i in declaration_keywords:
+                declaration = _TYPE_DECLARATION[utf8].search(masked, declaration_keywords[i], i)
+            if not declaration and i in task_keywords:
+                is_async = _ASYNC_HEADER[utf8].search(masked, task_keywords[i], i)
+            if not declaration and not is_async and i in async_headers:
+                # The header starts after the last scope event, which is no earlier than the previous candidate
+                boundary = max(masked.rfind(b'{', previous + 1, i), masked.rfind(b'}', previous + 1, i),
+                               masked.rfind(b';', previous + 1, i), previous) + 1
+                is_async = _ASYNC_HEADER[utf8].search(masked, boundary, i)
+            previous = i
+            if declaration:
+                node = TypeScope(_decode(declaration.group('kind')), _decode(declaration.group('name')),
+                                 _conformances(declaration), declaration.start(), i)
+                self.declarations[node.keyword] = node
+            elif is_async or (i in closures and _ASYNC_CLOSURE[utf8].match(masked, i + 1)):
+                self.async_regions.append(i)
+        
+        # Regions nested in one already searched add no uses
+        end = -1
+        for start in self.async_regions:
+            if start > end:
+                end = self._closing_brace(start)
+                self._find_async_uses(masked, 0, start + 1, end, utf8)
+
+    def _closing_brace(self, opening):
+        """Return the offset of the brace closing the one at opening, or the end of a whole file"""
+        return self._walk_braces(opening, len(self._masked))
+
+    def _encloses(self, opening, offset):
+        """Check if offset is inside the body opened by the brace at opening, in a whole file"""
+        return self._walk_braces(opening, offset) == offset
+
+    def _walk_braces(self, opening, end):
+        """Return the offset of the brace closing the one at opening, or end if it is not closed before"""
+        masked = self._masked
+        depth = 1
+        # Two find() calls per brace run faster than a regex over the body
+        next_opening = masked.find(b'{', opening + 1, end)
+        closing = masked.find(b'}', opening + 1, end)
+        while closing != -1:
+            if next_opening != -1 and next_opening < closing:
+                depth += 1
+                next_opening = masked.find(b'{', next_opening + 1, end)
+                continue
+            depth -= 1
+            if not depth:
+                return closing
+            closing = masked.find(b'}', closing + 1, end)
+        return end
+
+    def feed(self, masked, final=False):
+        """Process the next chunk of masked bytes; final marks the end of the file"""
+        buffer = self._buffer + masked if self._buffer else masked
+        base = self._base
+        end = base + len(buffer)
+        # Plain bytes regexes are exact, and faster, while the text is ASCII
+        utf8 = not buffer.isascii()
+        stack = self._stack
+        # Locals rather than attributes while looping, as there is an event per brace
+        boundary = self._boundary
+        uses_from = self._uses_from
+        open_async = self._open_async
+        resume = end
+        
+        for event in _SCOPE_EVENT.finditer(buffer, self._next - base):
+            i = event.start()
+            pos = base + i
+            char = event.group(0)
+            if char == b'{':
+                header = buffer[max(boundary - base, 0):i]
+                declaration = _TYPE_DECLARATION[utf8].search(header)
+                # Substring tests rule out most headers faster than the regexes can
+                is_async = (not declaration
+                            and (b'Task' in header or b'.task' in header or b'async' in header)
+                            and _ASYNC_HEADER[utf8].search(header))
+                if not declaration and not is_async:
+                    # An async closure signature runs up to the next brace, which may be in a later chunk
+                    brace = _BRACE.search(buffer, i + 1)
+                    if brace is None and not final and len(buffer) - i < SCOPE_CONTEXT_LIMIT:
+                        resume = pos
+                        break
+                    signature_end = brace.start() if brace is not None else len(buffer)
+                    is_async = (buffer.find(b'async', i + 1, signature_end) != -1
+                                and _ASYNC_CLOSURE[utf8].match(buffer, i + 1))
+            
+            if open_async and len(self.async_uses) < STREAMED_SYMBOL_LIMIT:
+                self._find_async_uses(buffer, base, uses_from, pos, utf8)
+            uses_from = boundary = pos + 1
+            
+            if char == b';':
+                continue
+            if char == b'}':
+                if stack and stack.pop() is True:
+                    open_async -= 1
+                continue
+            
+            node = None
+            # Nothing reads other declarations, such as structs, once they are closed
+            if (declaration and declaration.group('kind') in (b'class', b'extension')
+                    and len(self.declarations) < STREAMED_SYMBOL_LIMIT):
+                node = TypeScope(_decode(declaration.group('kind')), _decode(declaration.group('name')),
+                                 _conformances(declaration), pos - len(header) + declaration.start(), pos, False)
+                self.declarations[node.keyword] = node
+            elif is_async:
+                # True marks an async region on the stack; the declarations it is in now contain one
+                node = True
+                open_async += 1
+                for enclosing in reversed(stack):
+                    if isinstance(enclosing, TypeScope):
+                        if enclosing.contains_async:
+                            break
+                        enclosing.contains_async = True
+            stack.append(node)
+        
+        self._next = resume
+        self._boundary = boundary
+        self._open_async = open_async
+        if open_async:
+            # Text after a brace left for the next chunk is searched once that brace has been handled
+            uses_from = self._find_async_uses(buffer, base, uses_from, resume, utf8,
+                                              complete=final or resume < end)
+        self._uses_from = uses_from
+        del self.async_uses[STREAMED_SYMBOL_LIMIT:]
+        
+        if final:
+            self._buffer = b''
+            return
+        
+        # Keep only what later chunks still need, with a byte of lookbehind for \b
+        self._boundary = max(self._boundary, end - SCOPE_CONTEXT_LIMIT)
+        self._uses_from = max(self._uses_from, end - SCOPE_CONTEXT_LIMIT)
+        keep = max(min(self._boundary, self._uses_from - 1, self._next), base)
+        self._buffer = buffer[keep - base:]
+        self._base = keep
+
+    def _find_async_uses(self, buffer, base, start, end, utf8, complete=True):
+        """Record the type names between offsets start and end, returning where the search should resume
+        
+        Unless complete, a name running into the end of the buffer may go
+        on in the next chunk and is left for then.
+        """
+        for match in _TYPE_NAME[utf8].finditer(buffer, start - base, end - base):
+            if not complete and match.end() == end - base:
+                return base + match.start()
+            self.async_uses.append((_decode(match.group(0)), base + match.start()))
+        return end
+
+    def declaration_at(self, offset):
+        """Return the type declaration whose keyword starts at offset"""
+        return self.declarations.get(offset)
+
+    def has_async_region(self, declaration):
+        """Check if an async region opens inside the body of declaration"""
+        if declaration.contains_async is None:
+            # Only the first region after the opening brace can tell: later ones are no more inside
+            i = bisect_right(self.async_regions, declaration.start)
+            declaration.contains_async = (i < len(self.async_regions)
+                                          and self._encloses(declaration.start, self.async_regions[i]))
+        return declaration.contains_async
+
+    @cached_property
+    def async_type_names(self):
+        """Capitalized identifiers referenced inside async regions"""
+        return {name for name, _ in self.async_uses}
+
+# Substrings without which a file has no async region, and no class, extension or async region
+_ASYNC_KEYWORDS = (b'Task', b'.task', b'async')
+_SYMBOL_KEYWORDS = (b'class', b'extension') + _ASYNC_KEYWORDS
+
+def empty_symbols():
+    """Return the symbol summary of a file with nothing to index"""
+    return {'declarations': [], 'extensions': [], 'async_uses': {}}
+
+def summarize_symbols(context):
+    """Return the classes, extensions and async use sites of one file for the SymbolIndex
+    
+    Only what the project-wide class_sendable rule reads is kept: other
+    type declarations are left out.
+    """
+    summary = empty_symbols()
+    # Streamed files skip this check, which could read the whole file at once
+    if context.window is None and all(context.content.find(keyword) == -1 for keyword in _SYMBOL_KEYWORDS):
+        return summary
+    
+    scopes = context.scopes
+    for declaration in scopes.declarations.values():
+        if declaration.kind not in ('class', 'extension'):
+            continue
+        line, column = context.line_index.position(declaration.keyword)
+        if declaration.kind == 'extension':
+            summary['extensions'].append([declaration.name, line, column, declaration.conformances])
+        else:
+            summary['declarations'].append([declaration.kind, declaration.name, line, column,
+                                            declaration.conformances])
+    
+    for name, offset in scopes.async_uses:
+        lines = summary['async_uses'].setdefault(name, [])
+        line = context.line_index.line_of(offset)
+        if not lines or lines[-1] != line:
+            lines.append(line)
+    return summary
+
+def summary_names(summary):
+    """Return the type names a file's symbol summary declares, extends or uses in async code"""
+    if summary is None:
+        return set()
+    names = {declaration[1] for declaration in summary['declarations']}
+    names.update(extension[0] for extension in summary['extensions'])
+    names.update(summary['async_uses'])
+    return names
+
+class SymbolIndex:
+    """Project-wide map of type names to declarations, extensions and async use sites
+
+    Holds one summary per file (see summarize_symbols), keyed by the path
+    relative to the project.  Summaries are persisted with each file's
+    entry in the analysis cache, so a run only re-summarizes changed files
+    and project-wide rules query this index instead of rescanning sources.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self._by_name = None
+        # Whether symbols.json is out of date
+        self.dirty = False
+
+    def update(self, key, summary, changed=True):
+        """Replace the summary of one file; changed is False when symbols.json already has it
+        
+        Once built, by_name is updated in place for the names of the old and
+        new summary, so an edit costs as much as the file has symbols.
+        """
+        if self._by_name is not None:
+            self._unindex(key)
+            self._index(key, summary)
+        self.files[key] = summary
+        self.dirty = self.dirty or changed
+
+    def remove(self, key):
+        """Forget a deleted file"""
+        if key in self.files:
+            if self._by_name is not None:
+                self._unindex(key)
+            del self.files[key]
+            self.dirty = True
+
+    @property
+    def by_name(self):
+        """Map type name -> {'declarations', 'extensions', 'async_uses'} lists of (file key, ...)"""
+        if self._by_name is None:
+            self._by_name = {}
+            for key, summary in self.files.items():
+                self._index(key, summary)
+        return self._by_name
+
+    def _index(self, key, summary):
+        """Add the symbols of one file's summary to by_name"""
+        for kind, name, line, column, conformances in summary['declarations']:
+            self._symbol(name)['declarations'].append((key, kind, line, column, conformances))
+        for name, line, column, conformances in summary['extensions']:
+            self._symbol(name)['extensions'].append((key, line, column, conformances))
+        for name, lines in summary['async_uses'].items():
+            self._symbol(name)['async_uses'].append((key, lines))
+
+    def _unindex(self, key):
+        """Remove the symbols of the summary held for key from by_name"""
+        for name in summary_names(self.files.get(key)):
+            symbol = self._by_name.get(name)
+            if symbol is None:
+                continue
+            for entries in symbol.values():
+                entries[:] = [entry for entry in entries if entry[0] != key]
+            if not any(symbol.values()):
+                del self._by_name[name]
+
+    def _symbol(self, name):
+        return self._by_name.setdefault(name, {'declarations': [], 'extensions': [], 'async_uses': []})
+
+    def conforms_to(self, name, protocol):
+        """Check if a type declares conformance to protocol, directly or in any extension"""
+        symbol = self.by_name.get(name)
+        if symbol is None:
+            return False
+        lists = [d[4] for d in symbol['declarations']] + [e[3] for e in symbol['extensions']]
+        return any(c.split() and c.split()[-1] == protocol for conformances in lists for c in conformances)
+
+    def save(self, directory):
+        """Write the index, grouped by type name, to symbols.json for other tools, if it changed"""
+        directory = Path(directory)
+        if not self.dirty and (directory / 'symbols.json').exists():
+            return
+        make_cache_directory(directory)
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+            # json.dump() would encode in Python; dumps() uses the C encoder
+            f.write(json.dumps(self.by_name, separators=(',', ':')))
+        os.replace(f.name, directory / 'symbols.json')
+        self.dirty = False
+
+class AnalysisTimeout(Exception):
+    """Raised by the SIGALRM handler of rule_budget() when matching runs out of time"""
+
+def _raise_timeout(signum, frame):
+    raise AnalysisTimeout()
+
+class RuleBudget:
+    """Matching time allowed to each rule of a RuleEngine on one file
+
+    A rule that uses up its budget is stopped for the rest of the file, and
+    recorded in stopped as {rule index: (offset, seconds spent)}.  With
+    alarm set, a match that runs past the budget is interrupted through
+    SIGALRM, which Python's regex engine checks for while it backtracks;
+    otherwise the budget is only checked between matches.
+    """
+
+    def __init__(self, seconds, alarm=False):
+        self.seconds = seconds
+        self.alarm = alarm
+        self.stopped = {}
+
+    def call(self, function, *args, seconds):
+        """Return function(*args), raising AnalysisTimeout if it runs for longer than seconds"""
+        if not self.alarm:
+            return function(*args)
+        signal.setitimer(signal.ITIMER_REAL, max(seconds, 1e-6))
+        try:
+            return function(*args)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+@contextmanager
+def rule_budget(seconds):
+    """Yield a RuleBudget of seconds per rule, interrupting matches with SIGALRM where signals allow it"""
+    # Signal handlers can only be set from the main thread, and not at all on Windows
+    alarm = hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+    previous = signal.signal(signal.SIGALRM, _raise_timeout) if alarm else None
+    try:
+        yield RuleBudget(seconds, alarm)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+class RuleEngine:
+    """Match every registered rule pattern against a file in a single pass
+
+    The rules are merged into one master alternation that finds the next
+    position at which any rule may match, so the file is walked once no
+    matter how many rules are registered: a rule with a literal prefix is
+    represented by the prefix, and any other by its whole pattern.  At each
+    hit only the rules that can start with the character found there are
+    re-matched, which keeps the results identical to running re.finditer()
+    once per pattern.  The alternatives are deliberately non-capturing: one
+    capture group per rule makes the regex engine save every group at
+    every position and scales with the rule count.
+
+    Patterns are matched against the file's UTF-8 bytes, which may be a
+    memory map, through bytes versions compiled from the rules' text
+    patterns: the file is never decoded as a whole.
+
+    Rules flagged in code_only never match inside comments or string
+    literals; when a CodeMap is given the scan jumps over those spans
+    instead of trying every position in them.
+
+    Before scanning, a prefilter looks for the literals each rule requires
+    (given in literals, or else its prefix) in a single pass, through a
+    trie of all of them, so its cost does not grow with the number of
+    rules.  Only rules whose literals occur are scanned for, through an
+    engine compiled for that subset, and a file that contains none of
+    them is only searched by the prefilter: the rules never scan it and
+    it is never lexed.
+
+    Under a RuleBudget, a rule that runs out of matching time on a file is
+    dropped from the master alternation and the scan goes on without it.
+    """
+
+    def __init__(self, patterns, code_only=None, literals=None, matchers=None, prefixes=None, spans=None):
+        self.patterns = [_bytes_pattern(p) for p in patterns]
+        count = len(self.patterns)
+        self.code_only = list(code_only) if code_only is not None else [False] * count
+        # Rules whose matches are finished by a function instead of their pattern (see Rule.matcher)
+        self.matchers = list(matchers) if matchers is not None else [None] * count
+        self.all_code_only = all(self.code_only)
+        # The text every match of a rule starts with, and how far past its start a match may look
+        self.prefixes = [_encode_literal(prefix) for prefix in prefixes] if prefixes is not None else [b''] * count
+        self.spans = list(spans) if spans is not None else [None] * count
+        # The master regex merges the prefixes into a trie (see _trie_alternation)
+        self.pieces = [(prefix, b'' if prefix else pattern.pattern)
+                       for prefix, pattern in zip(self.prefixes, self.patterns)]
+        self.master = re.compile(_trie_alternation(self.pieces)) if self.patterns else None
+        
+        # Rules keyed by the literal byte they must start with
+        self.by_first_char = {}
+        self.any_first_char = []
+        for index, prefix in enumerate(self.prefixes):
+            if prefix:
+                self.by_first_char.setdefault(prefix[0], []).append(index)
+            else:
+                self.any_first_char.append(index)
+        
+        # Each rule may only match if one of its literals occurs; None means it always runs
+        literals = list(literals) if literals is not None else [None] * count
+        self.literals = [tuple(map(_encode_literal, declared)) if declared else (prefix,) if prefix else None
+                         for declared, prefix in zip(literals, self.prefixes)]
+        self.unfiltered = frozenset(index for index, required in enumerate(self.literals) if required is None)
+        self.rules_by_literal = {}
+        for index, required in enumerate(self.literals):
+            for literal in required or ():
+                self.rules_by_literal.setdefault(literal, set()).add(index)
+        # All literals are searched for at once through a trie, which finds the longest literal at a
+        # position: a hit also stands for the literals that are prefixes of the one found
+        self.literal_search = re.compile(_trie_alternation([(literal, b'') for literal in self.rules_by_literal]))
+        self.rules_by_hit = {literal: frozenset().union(*(self.rules_by_literal.get(literal[:size], ())
+                                                         for size in range(1, len(literal) + 1)))
+                             for literal in self.rules_by_literal}
+        # Whether scan() looks for the literals first; the engines of subsets do not
+        self.prefilter = bool(self.rules_by_literal)
+        self.subsets = {}
+        
+        # How far past the end of a window a streamed scan must look to complete the matches
+        # starting in it: the longest span, the rest of the line for matchers, or STREAM_MAX_OVERLAP
+        self.overlap = 0
+        self.to_line_end = False
+        for span, matcher in zip(self.spans, self.matchers):
+            if matcher is not None:
+                self.to_line_end = True
+            else:
+                self.overlap = max(self.overlap, STREAM_MAX_OVERLAP if span is None else min(span, STREAM_MAX_OVERLAP))
+        self.literal_overlap = max(map(len, self.rules_by_literal), default=1) - 1
+
+    def candidates(self, byte):
+        """Return the indexes of the rules that may match at a position starting with byte"""
+        indexes = self.by_first_char.get(byte)
+        if not indexes:
+            return self.any_first_char
+        if not self.any_first_char:
+            return indexes
+        return sorted(indexes + self.any_first_char)
+
+    def active_rules(self, content, window=None):
+        """Return the indexes of the rules whose required literals occur in the bytes of content
+        
+        With a window size, content is searched a window at a time, and
+        each window is released once searched.
+        """
+        count = len(self.patterns)
+        if not self.prefilter:
+            return tuple(range(count))
+        active = set(self.unfiltered)
+        search = self.literal_search.search
+        rules_by_hit = self.rules_by_hit
+        length = len(content)
+        for start in range(0, length, window or max(length, 1)):
+            end = min(start + window + self.literal_overlap, length) if window else length
+            # One pass over the window for every literal; the search resumes a byte after each hit
+            # so that literals overlapping the one found are not skipped
+            hit = search(content, start, end)
+            while hit is not None and len(active) < count:
+                active |= rules_by_hit[hit.group()]
+                hit = search(content, hit.start() + 1, end)
+            if window:
+                _release_pages(content, start, end)
+            if len(active) == count:
+                break
+        return tuple(sorted(active))
+
+    def subset(self, active):
+        """Return the engine for a subset of the rules, compiled on first use"""
+        engine = self.subsets.get(active)
+        if engine is None:
+            engine = RuleEngine([self.patterns[index] for index in active],
+                                [self.code_only[index] for index in active],
+                                matchers=[self.matchers[index] for index in active],
+                                prefixes=[self.prefixes[index] for index in active],
+                                spans=[self.spans[index] for index in active])
+            # The literals were checked already
+            engine.prefilter = False
+            self.subsets[active] = engine
+        return engine
+
+    def scan(self, content, code_map=None, timings=None, window=None, budget=None):
+        """Yield (rule_index, match) pairs in the order matches start
+        
+        timings, if given, is a list with a slot per rule plus one: the time
+        spent matching each rule is added to its slot, and the time of the
+        prefilter, the master search and lexing (through code_map) to the
+        last slot.  window, if given, streams content: see _scan().  budget,
+        a RuleBudget, stops the rules that run out of time.
+        """
+        if self.master is None:
+            return
+        if budget is not None and timings is None:
+            timings = [0.0] * (len(self.patterns) + 1)
+        if self.prefilter:
+            started = time.perf_counter() if timings is not None else None
+            active = self.active_rules(content, window)
+            if timings is not None:
+                timings[-1] += time.perf_counter() - started
+            if len(active) < len(self.patterns):
+                if not active:
+                    return
+                subset_timings = [0.0] * (len(active) + 1) if timings is not None else None
+                subset_budget = RuleBudget(budget.seconds, budget.alarm) if budget is not None else None
+                for index, match in self.subset(active)._scan(content, code_map, subset_timings, window,
+                                                              subset_budget):
+                    yield active[index], match
+                if timings is not None:
+                    for index, seconds in zip(active, subset_timings):
+                        timings[index] += seconds
+                    timings[-1] += subset_timings[-1]
+                if budget is not None:
+                    budget.stopped.update((active[index], stop) for index, stop in subset_budget.stopped.items())
+                return
+        yield from self._scan(content, code_map, timings, window, budget)
+
+    def _scan_end(self, content, window_end):
+        """Return where the search for matches starting before window_end must stop"""
+        end = window_end + self.overlap
+        if self.to_line_end:
+            newline = content.find(b'\n', window_end - 1, window_end + STREAM_MAX_OVERLAP)
+            end = max(end, newline + 1 if newline != -1 else window_end + STREAM_MAX_OVERLAP)
+        return min(end, len(content))
+
+    def _scan(self, content, code_map=None, timings=None, window=None, budget=None):
+        """Scan for every rule of this engine, without the prefilter
+        
+        With a window size, content is scanned for matches starting in one
+        window at a time, looking only as far past it as the rules' matches
+        can reach (see __init__).  The pages of the windows already scanned
+        and their comment and string spans in code_map are then released,
+        so memory does not grow with the size of the file.  With a budget,
+        timings must be given.
+        """
+        clock = time.perf_counter if timings is not None else None
+        master = self.master
+        stopped = budget.stopped if budget is not None else {}
+        # End of the last match per rule, to mirror finditer's non-overlapping matches
+        last_end = [0] * len(self.patterns)
+        length = len(content)
+        window_end = end = 0 if window else length
+        pos = released = 0
+        while True:
+            if pos >= window_end and window:
+                window_start = pos - pos % window
+                if code_map is not None:
+                    code_map.forget(window_start)
+                _release_pages(content, released, window_start)
+                released = window_start
+                window_end = min(window_start + window, length)
+                end = self._scan_end(content, window_end)
+            if clock:
+                started = clock()
+            if budget is None:
+                hit = master.search(content, pos, end)
+            elif master is None:
+                return
+            else:
+                hit, master = self._search_within(budget, timings, master, content, pos, end)
+            if hit is None or hit.start() >= window_end:
+                if clock:
+                    timings[-1] += clock() - started
+                if window_end >= length:
+                    return
+                pos = window_end if hit is None else hit.start()
+                continue
+            pos = hit.start()
+            skip_to = code_map.skip(pos) if code_map is not None else None
+            if clock:
+                timings[-1] += clock() - started
+            if skip_to is not None and self.all_code_only:
+                pos = skip_to
+                continue
+            for index in self.candidates(content[pos]):
+                if pos < last_end[index] or (skip_to is not None and self.code_only[index]) or index in stopped:
+                    continue
+                if clock:
+                    started = clock()
+                if budget is None:
+                    match = self._match(index, content, pos, end, last_end)
+                else:
+                    try:
+                        match = budget.call(self._match, index, content, pos, end, last_end,
+                                            seconds=budget.seconds - timings[index])
+                    except AnalysisTimeout:
+                        match = None
+                if clock:
+                    timings[index] += clock() - started
+                if budget is not None and timings[index] >= budget.seconds:
+                    stopped[index] = (pos, timings[index])
+                    master = self._master_without(stopped)
+                if match is None:
+                    continue
+                last_end[index] = max(match.end(), pos + 1)
+                yield index, match
+            pos += 1
+    
+    def _match(self, index, content, pos, end, last_end):
+        """Return the match of rule index at pos, finished by its matcher if it has one"""
+        match = self.patterns[index].match(content, pos, end)
+        if match is not None and self.matchers[index] is not None:
+            matched, match_end = self.matchers[index](content, pos, end)
+            if not matched:
+                last_end[index] = match_end
+                return None
+            match = _SPAN.match(content, pos, match_end)
+        return match
+    
+    def _master_without(self, stopped):
+        """Return the master regex of the rules not stopped, or None if every rule is"""
+        pieces = [piece for index, piece in enumerate(self.pieces) if index not in stopped]
+        return re.compile(_trie_alternation(pieces)) if pieces else None
+    
+    def _search_within(self, budget, timings, master, content, pos, end):
+        """Search with master under budget, returning the hit and the master regex left
+        
+        When the search runs out of time, some rule in master is too slow
+        here, but the alternation cannot tell which.  Each rule still
+        running is then searched for on its own in the rest of its budget,
+        and those that run out are stopped and dropped from master.
+        """
+        try:
+            return budget.call(master.search, content, pos, end, seconds=budget.seconds), master
+        except AnalysisTimeout:
+            pass
+        for index, pattern in enumerate(self.patterns):
+            if index in budget.stopped:
+                continue
+            started = time.perf_counter()
+            try:
+                budget.call(pattern.search, content, pos, end, seconds=budget.seconds - timings[index])
+            except AnalysisTimeout:
+                pass
+            timings[index] += time.perf_counter() - started
+            if timings[index] >= budget.seconds:
+                budget.stopped[index] = (pos, timings[index])
+        master = self._master_without(budget.stopped)
+        # Every rule left finished on its own, so together they finish too
+        return (master.search(content, pos, end) if master is not None else None), master
+
+# Turns the extent found by a Rule.matcher into a match object
+_SPAN = re.compile(rb'.*', re.DOTALL)
+
+def _bytes_pattern(pattern):
+    """Compile the bytes version of a text pattern, to match it against UTF-8 file contents
+
+    Word characters include non-ASCII bytes (see _word_regex), while \\s
+    and \\d only match ASCII and . matches a single byte.
+    """
+    pattern = re.compile(pattern)
+    if isinstance(pattern.pattern, bytes):
+        return pattern
+    try:
+        return _word_regex(pattern.pattern.encode(), pattern.flags & ~re.UNICODE)
+    except re.error as e:
+        raise ValueError(f"Pattern {pattern.pattern!r} cannot be matched against bytes: {e}") from None
+
+def _encode_literal(literal):
+    """Return a rule's literal text as the UTF-8 bytes it is found as in files"""
+    return literal.encode() if isinstance(literal, str) else literal
+
+def _trie_alternation(pieces):
+    """Return a regex source matching whatever any (literal prefix, rest of the source) piece matches
+    
+    The prefixes are merged into a trie, so that the regex engine reads
+    each byte of the text once per trie level instead of comparing it
+    with every pattern in turn: a search then takes about as long with
+    hundreds of patterns as with ten.  Longer prefixes come before the
+    pieces ending at the same node, so that of several literals the
+    longest is matched.
+    """
+    children = {}
+    ends = []
+    for prefix, rest in pieces:
+        if prefix:
+            children.setdefault(prefix[:1], []).append((prefix[1:], rest))
+        else:
+            ends.append(b'(?:' + rest + b')' if rest else b'')
+    branches = [re.escape(byte) + _trie_alternation(group) for byte, group in children.items()]
+    branches.extend(dict.fromkeys(ends))
+    if len(branches) == 1:
+        return branches[0]
+    return b'(?:' + b'|'.join(branches) + b')'
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """A check compiled once at import time and shared by analysis and fixing
+
+    benchmarks/redos.py checks the built-in rules' declarations against their patterns.
+    """
+    id: str
+    check: str
+    issue_type: str
+    # Matched against the file's UTF-8 bytes
+    pattern: re.Pattern
+    # May reference {match}, the matched text, and {name}, the first group of the match
+    message: str
+    suggestion: str
+    # Applied to the flagged line by the fixer for the rule's issue type
+    fix_pattern: re.Pattern = None
+    fix_template: str = None
+    # Called as condition(match, context) with the file's FileContext; the match is reported if it returns True
+    condition: object = None
+    # Ignore matches starting inside comments or string literals
+    code_only: bool = True
+    # Strings every match contains one of, (prefix,) by default; the rule is not run on files without any
+    literals: tuple = None
+    # Finishes each match of pattern: called as matcher(content, start, end), it returns (True, match_end),
+    # or (False, offset) when no match can start before offset, in linear time and without looking past end
+    # or the end of the line
+    matcher: object = None
+    # The text every match starts with, matched case-sensitively: the engine only tries the rule where it occurs
+    prefix: str = None
+    # Bytes past its start a match may examine, including the byte after it that \b or $ look at; without it,
+    # a streamed file is scanned up to STREAM_MAX_OVERLAP bytes past each window, or to the end of the line for
+    # a rule with a matcher
+    span: int = None
+
+    def make_issue(self, match, file_path, line_index):
+        """Build the issue dict for a match of this rule, decoding only the matched text"""
+        line, column = line_index.position(match.start())
+        name = match.group(1) if self.pattern.groups else match.group(0)
+        fields = {
+            'match': _decode(match.group(0)),
+            'name': _decode(name) if name is not None else None,
+        }
+        return {
+            'file': file_path,
+            'line': line,
+            'column': column,
+            'type': self.issue_type,
+            'rule': self.id,
+            'message': self.message.format(**fields),
+            'suggestion': self.suggestion.format(**fields)
+        }
+
+def _class_may_need_sendable(match, context):
+    """Check if a class is used by async code without declaring Sendable
+    
+    Only the file being analyzed is consulted here: the class counts as
+    used in async code when a Task {} or async closure/function is declared
+    inside its body or refers to the class by name.  Conformances added by
+    extensions and async uses in other files are handled project-wide by
+    XcodeAssistant.apply_project_rules.
+    """
+    # Cheap checks first, as most classes are ruled out without the file's ScopeTree
+    if not context.may_run_async or _declares_sendable(match.start(), context.content):
+        return False
+    declaration = context.scopes.declaration_at(match.start())
+    if declaration is None or declaration.kind != 'class' or declaration.is_sendable:
+        return False
+    if declaration.name in context.scopes.async_type_names:
+        return True
+    return context.scopes.has_async_region(declaration)
+
+# A declaration header without comments, strings or other scope events, up to its opening brace
+_PLAIN_HEADER = re.compile(rb'[^/"#;{}]{0,1024}\{')
+
+def _declares_sendable(start, content):
+    """Check if the type declared at start lists Sendable, when its header can be read without a ScopeTree
+    
+    A header free of comments and strings reads the same masked, and
+    without other braces or semicolons it is the whole header the
+    ScopeTree would parse.  False means not Sendable or not known.
+    """
+    header = _PLAIN_HEADER.match(content, start)
+    if header is None:
+        return False
+    declaration = _TYPE_DECLARATION[not header.group(0).isascii()].match(content, start, header.end() - 1)
+    return declaration is not None and _lists_sendable(_conformances(declaration))
+
+def _line_end(content, start, end):
+    """Return the offset of the end of the line containing start, or end if it comes first"""
+    line_end = content.find(b'\n', start, end)
+    return end if line_end == -1 else line_end
+
+def _match_vstack_spacing(content, start, end):
+    """Finish a match of VStack(spacing: as VStack\\(spacing:.*\\) would, in time linear in the line
+    
+    The regex runs to the end of the line from every VStack(spacing: on
+    it, which is quadratic on a line of them without a closing parenthesis.
+    """
+    line_end = _line_end(content, start, end)
+    closing = content.rfind(b')', start + len(b'VStack(spacing:'), line_end)
+    if closing == -1:
+        return False, line_end
+    return True, closing + 1
+
+def _match_conditional_interpolation(content, start, end):
+    """Finish a match of Text(" as Text\\(".*\\\\\\(.*\\?.*:.*\\).*"\\) would, in time linear in the line
+    
+    The regex's stacked .* terms make it backtrack polynomially on long
+    lines that almost match.  Its parts are found here in order, each
+    at its first occurrence, which matches exactly when the regex does:
+    the match then runs to the last ") on the line.  When there is no
+    match, none can start later on the line either.
+    """
+    line_end = _line_end(content, start, end)
+    position = start + len(b'Text("')
+    for part in (b'\\(', b'?', b':', b')'):
+        found = content.find(part, position, line_end)
+        if found == -1:
+            return False, line_end
+        position = found + len(part)
+    closing = content.rfind(b'")', position, line_end)
+    if closing == -1:
+        return False, line_end
+    return True, closing + 2
+
+def _deprecated_api_rule(rule_id, api, replacement, fix_pattern=None, fix_template=None, pattern=None, span=None):
+    """Build a deprecated API rule flagging the text api, or a pattern starting with it that spans span bytes"""
+    return Rule(
+        id=rule_id,
+        check='deprecated_apis',
+        issue_type='deprecated_api',
+        pattern=re.compile(pattern or re.escape(api)),
+        message='Potential deprecated API usage: {match}',
+        suggestion=f'Consider using {replacement} instead',
+        fix_pattern=re.compile(fix_pattern) if fix_pattern else None,
+        fix_template=fix_template,
+        prefix=api,
+        span=span if pattern else len(api),
+    )
+
+# Built-in rules, in the order their issues are reported
+RULES = [
+    # buildExpression checks
+    Rule(
+        id='vstack_spacing',
+        check='build_expression',
+        issue_type='buildExpression',
+        pattern=re.compile(r'VStack\(spacing:'),
+        prefix='VStack(spacing:',
+        message='Potential buildExpression issue with VStack spacing parameter',
+        suggestion='Replace with VStack {{}} and explicit Spacer().frame(height: X) elements',
+        fix_pattern=re.compile(r'spacing:\s*(\d+)'),
+        matcher=_match_vstack_spacing,
+    ),
+    Rule(
+        id='text_conditional_interpolation',
+        check='build_expression',
+        issue_type='buildExpression',
+        pattern=re.compile(r'Text\("'),
+        prefix='Text("',
+        message='Potential buildExpression issue with conditional expression in Text interpolation',
+        suggestion='Extract the conditional expression to a separate variable before using in Text',
+        fix_pattern=re.compile(r'\\((.+?\?.+?:.+?)\\)'),
+        matcher=_match_conditional_interpolation,
+    ),
+    
+    # Deprecated API checks
+    _deprecated_api_rule('avasset_init', 'AVAsset(url:', 'AVURLAsset(url:',
+                         r'AVAsset\(url: (.+?)\)', r'AVURLAsset(url: \1)'),
+    _deprecated_api_rule('asset_duration', '.duration', 'asset.load(.duration)',
+                         r'(\w+)\.duration', r'try await \1.load(.duration)', pattern=r'\.duration\s', span=10),
+    _deprecated_api_rule('asset_tracks', '.tracks(withMediaType:', 'asset.loadTracks(withMediaType:',
+                         r'(\w+)\.tracks\(withMediaType: (.+?)\)', r'try await \1.loadTracks(withMediaType: \2)'),
+    _deprecated_api_rule('track_nominal_frame_rate', '.nominalFrameRate', 'videoTrack.load(.nominalFrameRate)',
+                         r'(\w+)\.nominalFrameRate', r'try await \1.load(.nominalFrameRate)'),
+    _deprecated_api_rule('track_natural_size', '.naturalSize', 'videoTrack.load(.naturalSize)',
+                         r'(\w+)\.naturalSize', r'try await \1.load(.naturalSize)'),
+    _deprecated_api_rule('copy_cgimage', 'copyCGImage(at:', 'generateCGImageAsynchronously(for:',
+                         r'(\w+)\.copyCGImage\(at: (.+?), actualTime: (.+?)\)',
+                         r'\1.generateCGImageAsynchronously(for: \2) { cgImage, actualTime, error in'),
+    _deprecated_api_rule('asset_url_initializer', 'init(url:)', 'AVURLAsset(url:)'),
+    
+    # Sendable conformance checks
+    Rule(
+        id='class_sendable',
+        check='sendable_conformance',
+        issue_type='sendable_conformance',
+        pattern=re.compile(r'class\s+(\w+)'),
+        prefix='class',
+        message='Class {name} might need Sendable conformance for use in async contexts',
+        suggestion='Add ": @unchecked Sendable" to class definition or make class thread-safe',
+        fix_pattern=re.compile(r'class\s+(\w+)'),
+        condition=_class_may_need_sendable,
+    ),
+]
+
+RULES_BY_ID = {rule.id: rule for rule in RULES}
+
+# Rules whose issues XcodeAssistant.apply_project_rules refines with the symbol index
+PROJECT_RULE_IDS = frozenset({'class_sendable'})
+
+_INDENT = re.compile(r'^\s*')
+
+def register_rule(rule):
+    """Add a custom rule to the registry used by new XcodeAssistant instances"""
+    if rule.id in RULES_BY_ID:
+        raise ValueError(f"Duplicate rule id: {rule.id}")
+    RULES.append(rule)
+    RULES_BY_ID[rule.id] = rule
+
+@lru_cache(maxsize=None)
+def engine_for(rules):
+    """Return the compiled RuleEngine for a tuple of rules"""
+    return RuleEngine([rule.pattern for rule in rules], [rule.code_only for rule in rules],
+                      [rule.literals for rule in rules], [rule.matcher for rule in rules],
+                      [rule.prefix or '' for rule in rules], [rule.span for rule in rules])
+
+# Below this many files analysis runs in-process even when --jobs allows more
+PARALLEL_MIN_FILES = 64
+
+# Number of files sent to a worker process at a time
+PARALLEL_BATCH_SIZE = 32
+
+def resolve_jobs(jobs):
+    """Return the number of worker processes to use; 0 or None means one per available core"""
+    if jobs:
+        return max(1, jobs)
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+def _batched(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# Per-process assistant used by worker processes
+_worker_assistant = None
+
+def _init_worker(project_path, rules, use_cache, rule_timeout=None):
+    """Set up the assistant reused for every batch handled by a worker process"""
+    global _worker_assistant
+    _worker_assistant = XcodeAssistant(project_path, rules, rule_timeout=rule_timeout)
+    _worker_assistant.use_cache = use_cache
+
+def _analyze_batch(items):
+    """Analyze a batch of (path, cache entry) items in a worker process"""
+    return [_worker_assistant.check_file(path, entry) for path, entry in items]
+
+def _supervised_worker(connection, *init_args):
+    """Analyze the (path, cache entry) items received on connection one at a time, sending back each result
+    
+    An empty message is sent once the worker is ready, so that its start
+    is not charged to the first file, and an empty message back stops the
+    worker.  Results are sent as (True, result), and exceptions as
+    (False, exception) to be raised by the supervisor.
+    """
+    _init_worker(*init_args)
+    connection.send(None)
+    while True:
+        item = connection.recv()
+        if item is None:
+            return
+        path, entry = item
+        try:
+            result = True, _worker_assistant.check_file(path, entry)
+        except Exception as e:
+            result = False, e
+        connection.send(result)
+
+class SupervisedWorker:
+    """A worker process that analyzes one file at a time and can be killed when it runs out of time"""
+
+    def __init__(self, init_args):
+        import multiprocessing
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_supervised_worker, args=(child, *init_args), daemon=True)
+        self.process.start()
+        child.close()
+        self.connection.recv()
+        # (sequence number, path, start time) of the file being analyzed
+        self.task = None
+
+    def submit(self, number, path, entry):
+        """Start analyzing a file"""
+        self.connection.send((path, entry))
+        self.task = (number, path, time.monotonic())
+
+    def result(self):
+        """Return the check_file result of the current file once the worker sent it"""
+        number, path, started = self.task
+        self.task = None
+        try:
+            succeeded, result = self.connection.recv()
+        except EOFError:
+            raise RuntimeError(f"Worker process exited with code {self.process.exitcode} "
+                               f"while analyzing {path}") from None
+        if not succeeded:
+            raise result
+        return result
+
+    def close(self):
+        """Stop the worker, killing it if it is busy"""
+        if self.task is not None:
+            self.process.kill()
+        else:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+        self.connection.close()
+        self.process.join()
+
+# Issue type recorded for a file or rule that ran out of its time budget
+TIMEOUT_ISSUE_TYPE = 'analysis_timeout'
+
+def timeout_issue(file_path, line, column, seconds, budget, rule_id=None):
+    """Build the issue recorded when a rule (rule_id), or else the whole analysis of a file, ran out of time
+    
+    The time taken is kept out of the message, so the issue is not new
+    in every run to --watch; seconds and budget are fields of their own.
+    """
+    if rule_id is None:
+        message = f"Analysis of this file did not finish within {budget:g} s and was abandoned"
+        suggestion = "Exclude the file if it is generated, or raise --timeout"
+    else:
+        message = f"Rule {rule_id} ran out of its {budget:g} s budget and was not run past this point"
+        suggestion = "Exclude the file if it is generated, or raise --rule-timeout"
+    issue = {
+        'file': file_path,
+        'line': line,
+        'column': column,
+        'type': TIMEOUT_ISSUE_TYPE,
+        'rule': TIMEOUT_ISSUE_TYPE,
+        'message': message,
+        'suggestion': suggestion,
+        'seconds': round(seconds, 3),
+        'budget': budget,
+    }
+    if rule_id is not None:
+        issue['stopped_rule'] = rule_id
+    return issue
+
+# Bump when analysis changes in a way the rule fingerprint cannot see
+ANALYSIS_VERSION = 6
+
+CACHE_DIR_NAME = '.xcode_assistant_cache'
+
+def make_cache_directory(directory):
+    """Create the cache directory with a .gitignore so its contents are never committed"""
+    directory.mkdir(exist_ok=True)
+    ignore = directory / '.gitignore'
+    if not ignore.exists():
+        ignore.write_text('*\n')
+
+# Issues listed by the last analysis, which --fix and --fix-all act on, in CACHE_DIR_NAME
+SESSION_FILE_NAME = 'session.json'
+# Bump when the layout of the session file changes
+SESSION_VERSION = 1
+
+def rules_fingerprint(rules):
+    """Return a digest identifying the rule set, used to invalidate cached results"""
+    digest = hashlib.sha256(f"analysis-{ANALYSIS_VERSION}".encode())
+    for rule in rules:
+        condition = getattr(rule.condition, '__qualname__', '')
+        matcher = getattr(rule.matcher, '__qualname__', '')
+        for value in (rule.id, rule.check, rule.issue_type, rule.pattern.pattern,
+                      str(rule.pattern.flags), rule.message, rule.suggestion, condition,
+                      str(rule.code_only), matcher, repr(rule.prefix), repr(rule.literals), repr(rule.span)):
+            digest.update(value.encode())
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+class AnalysisCache:
+    """Per-file issues persisted between runs under .xcode_assistant_cache/
+
+    Entries are keyed by the file path relative to the project and record
+    the file's mtime, size and SHA-256 so unchanged files are skipped
+    without being read.  The whole cache is discarded when the rule set
+    fingerprint changes.
+    """
+
+    FILE_NAME = 'analysis.json'
+
+    def __init__(self, project_path, fingerprint):
+        self.project_path = Path(project_path)
+        self.directory = self.project_path / CACHE_DIR_NAME
+        self.fingerprint = fingerprint
+        self.entries = {}
+        self.seen = set()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Read the cache from disk, ignoring it if missing, corrupt or stale"""
+        try:
+            with open(self.directory / self.FILE_NAME, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('fingerprint') == self.fingerprint:
+            self.entries = data.get('files', {})
+
+    def key(self, path):
+        """Return the cache key for a file path"""
+        return _relpath(path, self.project_path)
+
+    def entry(self, path):
+        """Return the stored stamp for path, or None"""
+        key = self.key(path)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return {name: entry[name] for name in ('mtime_ns', 'size', 'sha256')}
+
+    def issues(self, path):
+        """Return the cached issues for path"""
+        return [{'file': path, **issue} for issue in self.entries[self.key(path)]['issues']]
+
+    def touch(self, path, stamp):
+        """Record a new stamp for a file whose content did not change"""
+        self.entries[self.key(path)].update(stamp)
+        self.dirty = True
+
+    def symbols(self, path):
+        """Return the cached symbol summary for path"""
+        return self.entries[self.key(path)]['symbols']
+
+    def store(self, path, stamp, issues, symbols):
+        """Record the issues and symbol summary of a file"""
+        stored = [{name: value for name, value in issue.items() if name != 'file'} for issue in issues]
+        self.entries[self.key(path)] = dict(stamp, issues=stored, symbols=symbols)
+        self.dirty = True
+
+    def save(self, prune=False):
+        """Write the cache atomically; prune drops files not seen in this run"""
+        if prune:
+            for key in set(self.entries) - self.seen:
+                del self.entries[key]
+                self.dirty = True
+        self.seen = set()
+        if not self.dirty:
+            return
+        make_cache_directory(self.directory)
+        data = {'fingerprint': self.fingerprint, 'files': self.entries}
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False) as f:
+            f.write(json.dumps(data, separators=(',', ':')))
+        os.replace(f.name, self.directory / self.FILE_NAME)
+        self.dirty = False
+
+@lru_cache(maxsize=1 << 16)
+def _relpath(path, start):
+    """os.path.relpath, remembered: the key of a file is needed several times while it is analyzed"""
+    return os.path.relpath(path, start)
+
+# Directories that never contain project sources and are skipped during discovery
+DEFAULT_EXCLUDED_DIRS = frozenset({
+    '.git', '.hg', '.svn', '.build', '.swiftpm', 'DerivedData', 'Pods', 'Carthage',
+    'xcuserdata', 'node_modules', CACHE_DIR_NAME,
+})
+DEFAULT_EXCLUDED_DIR_SUFFIXES = ('.xcassets', '.xcodeproj', '.xcworkspace', '.framework',
+                                 '.xcframework', '.dSYM', '.app', '.bundle')
+
+IGNORE_FILE_NAMES = ('.gitignore', '.xcodeassistantignore')
+
+def glob_to_regex(pattern):
+    """Translate a gitignore-style glob (with ** support) into a regex source string"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            parts.append('/.*')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif char == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif char == '?':
+            parts.append('[^/]')
+            i += 1
+        elif char == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            parts.append(f'[{body}]')
+            i = end + 1
+        elif char == '\\' and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return ''.join(parts)
+
+def compile_glob(pattern):
+    """Compile a glob matching relative paths as .gitignore does
+    
+    A glob with a slash other than at the end is anchored to the directory
+    paths are relative to; any other matches a name at any depth.
+    """
+    pattern = pattern.rstrip('/')
+    if '/' in pattern:
+        source = glob_to_regex(pattern.lstrip('/'))
+    else:
+        source = '(?:.*/)?' + glob_to_regex(pattern)
+    return re.compile(source + r'\Z', re.DOTALL)
+
+class IgnoreFile:
+    """The patterns of one .gitignore-style file, relative to its directory"""
+
+    def __init__(self, base, lines):
+        self.base = base
+        self.patterns = []
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.endswith('\\ '):
+                line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negated = line.startswith('!')
+            if negated:
+                line = line[1:]
+            elif line.startswith('\\'):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            if not line.rstrip('/'):
+                continue
+            self.patterns.append((compile_glob(line), negated, dir_only))
+
+    @classmethod
+    def load(cls, base, path):
+        """Read an ignore file, returning None if it does not exist"""
+        try:
+            with open(path, 'r', errors='replace') as f:
+                return cls(base, f.readlines())
+        except OSError:
+            return None
+
+    def match(self, path, is_dir):
+        """Return True/False if the last matching pattern ignores/re-includes path, else None"""
+        relative = os.path.relpath(path, self.base).replace(os.sep, '/')
+        result = None
+        for pattern, negated, dir_only in self.patterns:
+            if dir_only and not is_dir:
+                continue
+            if pattern.match(relative):
+                result = not negated
+        return result
+
+def _is_ignored(ignore_files, path, is_dir):
+    """Apply the ignore files from the outermost to the innermost directory"""
+    ignored = False
+    for ignore_file in ignore_files:
+        result = ignore_file.match(path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+_PBX_TOKEN = re.compile(r'''
+    \s+ | /\*.*?\*/ | //[^\n]*           # whitespace and comments
+  | (?P<string>"(?:[^"\\]|\\.)*")        # quoted string
+  | (?P<punct>[{}();=,])
+  | (?P<word>[^\s{}();=,"]+)             # unquoted string
+''', re.VERBOSE | re.DOTALL)
+
+_PBX_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+
+def parse_pbxproj(text):
+    """Parse the old-style (OpenStep) property list used by project.pbxproj files"""
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _PBX_TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"Unexpected character in pbxproj at offset {pos}")
+        pos = match.end()
+        if match.group('string') is not None:
+            value = re.sub(r'\\(.)', lambda m: _PBX_ESCAPES.get(m.group(1), m.group(1)), match.group('string')[1:-1])
+            tokens.append(('value', value))
+        elif match.group('punct') is not None:
+            tokens.append(('punct', match.group('punct')))
+        elif match.group('word') is not None:
+            tokens.append(('value', match.group('word')))
+    
+    position = 0
+    
+    def peek():
+        """Return the next token, raising ValueError when a truncated file has none left"""
+        if position >= len(tokens):
+            raise ValueError("Unexpected end of pbxproj")
+        return tokens[position]
+    
+    def expect(punct):
+        nonlocal position
+        if peek() != ('punct', punct):
+            raise ValueError(f"Expected '{punct}' in pbxproj")
+        position += 1
+    
+    def parse_value():
+        nonlocal position
+        kind, value = peek()
+        position += 1
+        if kind == 'value':
+            return value
+        if value == '{':
+            result = {}
+            while peek() != ('punct', '}'):
+                key = parse_value()
+                expect('=')
+                result[key] = parse_value()
+                expect(';')
+            position += 1
+            return result
+        if value == '(':
+            result = []
+            while peek() != ('punct', ')'):
+                result.append(parse_value())
+                if peek() == ('punct', ','):
+                    position += 1
+            position += 1
+            return result
+        raise ValueError(f"Unexpected '{value}' in pbxproj")
+    
+    data = parse_value()
+    if not isinstance(data, dict):
+        raise ValueError("pbxproj does not hold a dictionary")
+    return data
+
+class XcodeProject:
+    """The Swift sources compiled into each target of an .xcodeproj
+
+    Both classic projects, where each source is a PBXFileReference added to
+    a target's Sources build phase, and Xcode 16 projects using
+    folder-synchronized groups (PBXFileSystemSynchronizedRootGroup) are
+    supported.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        if path.name != 'project.pbxproj':
+            path = path / 'project.pbxproj'
+        with open(path, 'r', encoding='utf-8') as f:
+            data = parse_pbxproj(f.read())
+        self.source_root = path.parent.parent
+        self.objects = data.get('objects', {})
+        self.root = self.objects.get(data.get('rootObject'), {})
+        if self.root.get('projectDirPath'):
+            self.source_root = self.source_root / self.root['projectDirPath']
+        
+        # Resolve the on-disk location of every file and group from the main group down
+        self.paths = {}
+        main_group = self.root.get('mainGroup')
+        if main_group:
+            self._resolve_paths(main_group, self.source_root)
+
+    @classmethod
+    def find(cls, directory):
+        """Return the path of the single .xcodeproj in directory"""
+        projects = sorted(Path(directory).glob('*.xcodeproj'))
+        if not projects:
+            raise RuntimeError(f"No .xcodeproj found in {directory}")
+        if len(projects) > 1:
+            names = ', '.join(project.name for project in projects)
+            raise RuntimeError(f"Several Xcode projects found in {directory} ({names}); pass one explicitly")
+        return projects[0]
+
+    def _resolve_paths(self, object_id, parent_path):
+        """Record the path of an object and its children"""
+        obj = self.objects.get(object_id, {})
+        source_tree = obj.get('sourceTree', '<group>')
+        path = obj.get('path')
+        if source_tree == '<group>':
+            location = parent_path / path if path else parent_path
+        elif source_tree == 'SOURCE_ROOT':
+            location = self.source_root / path if path else self.source_root
+        elif source_tree == '<absolute>' and path:
+            location = Path(path)
+        else:
+            # Build products and SDK files are not project sources
+            return
+        self.paths[object_id] = location
+        for child in obj.get('children', ()):
+            self._resolve_paths(child, location)
+
+    @property
+    def targets(self):
+        """Return the names of the project's targets, in project order"""
+        return [self.objects.get(t, {}).get('name') for t in self.root.get('targets', ())]
+
+    def source_files(self, target_names=None):
+        """Return the sorted Swift files compiled into the given targets (all when None)"""
+        known = self.targets
+        for name in target_names or ():
+            if name not in known:
+                raise RuntimeError(f"Unknown target {name!r}; available targets: {', '.join(known)}")
+        
+        files = set()
+        for target_id in self.root.get('targets', ()):
+            target = self.objects.get(target_id, {})
+            if target_names and target.get('name') not in target_names:
+                continue
+            files.update(self._build_phase_files(target))
+            files.update(self._synchronized_files(target_id, target))
+        return sorted(str(path) for path in files if path.suffix == '.swift' and path.is_file())
+
+    def _build_phase_files(self, target):
+        """Yield the files listed in a target's Sources build phases"""
+        for phase_id in target.get('buildPhases', ()):
+            phase = self.objects.get(phase_id, {})
+            if phase.get('isa') != 'PBXSourcesBuildPhase':
+                continue
+            for build_file_id in phase.get('files', ()):
+                file_ref = self.objects.get(build_file_id, {}).get('fileRef')
+                if file_ref in self.paths:
+                    yield self.paths[file_ref]
+
+    def _synchronized_files(self, target_id, target):
+        """Yield the files of a target's folder-synchronized groups, minus membership exceptions"""
+        for group_id in target.get('fileSystemSynchronizedGroups', ()):
+            folder = self.paths.get(group_id)
+            if folder is None:
+                continue
+            excluded = set()
+            for exception_id in self.objects.get(group_id, {}).get('exceptions', ()):
+                exception = self.objects.get(exception_id, {})
+                if exception.get('target') == target_id:
+                    excluded.update(exception.get('membershipExceptions', ()))
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = sorted(d for d in dirs if d not in DEFAULT_EXCLUDED_DIRS
+                                 and not d.endswith(DEFAULT_EXCLUDED_DIR_SUFFIXES))
+                for name in files:
+                    path = Path(root) / name
+                    if path.relative_to(folder).as_posix() not in excluded:
+                        yield path
+
+def _write_atomic(path, content):
+    """Replace a source file's content via a temporary file and rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', errors='surrogateescape', dir=directory, delete=False) as f:
+        f.write(content)
+    try:
+        shutil.copymode(path, f.name)
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+def _read_source(file_path, content=None):
+    """Return content if given, else the text of file_path
+    
+    Bytes that are not valid UTF-8 are kept as surrogate escapes, so
+    writing the text back with _write_atomic() leaves them unchanged.
+    """
+    if content is None:
+        with open(file_path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            content = f.read()
+    return content
+
+class Profiler:
+    """Timings of pipeline stages, files and rules collected for --profile
+
+    Stages are summed over the whole run, files and rules are ranked by
+    the time spent on them, and every span is kept as a Chrome trace event
+    so the run can be inspected in chrome://tracing or Perfetto.
+    """
+
+    STAGES = ('discovery', 'read', 'scan', 'rules', 'symbols', 'project rules', 'report')
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.files = {}
+        self.rules = {}
+        self.events = []
+
+    @contextmanager
+    def span(self, name, stage=None, **args):
+        """Time a block as a trace event, adding its duration to stage if given"""
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(name, started, time.perf_counter() - started, stage, args)
+
+    def record(self, name, started, seconds, stage=None, args=None):
+        """Record a finished span"""
+        if stage is not None:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        event = {'name': name, 'cat': stage or 'file', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                 'ts': round((started - self.origin) * 1e6, 1), 'dur': round(seconds * 1e6, 1)}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def timed(self, iterable, stage):
+        """Yield from iterable, charging the time spent producing each item to stage"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.record(stage, started, time.perf_counter() - started, stage)
+                return
+            self.record(stage, started, time.perf_counter() - started, stage)
+            yield item
+
+    def add_rule(self, rule_id, seconds, matches, issues):
+        """Add the time one file spent matching a rule and checking its conditions"""
+        totals = self.rules.setdefault(rule_id, [0.0, 0, 0])
+        totals[0] += seconds
+        totals[1] += matches
+        totals[2] += issues
+
+    def report(self, out, top=10):
+        """Write the stage totals and the slowest files and rules"""
+        wall = time.perf_counter() - self.origin
+        out.write(f"\nProfile: {wall:.3f} s wall time, {len(self.files)} files analyzed\n")
+        out.write("\nStages:\n")
+        for stage in self.STAGES:
+            if stage in self.stages:
+                seconds = self.stages[stage]
+                out.write(f"  {stage:<14} {seconds:9.3f} s {seconds / wall * 100 if wall else 0:6.1f}%\n")
+        
+        out.write(f"\nSlowest files (top {top}):\n")
+        for path, (seconds, lines) in sorted(self.files.items(), key=lambda item: -item[1][0])[:top]:
+            out.write(f"  {seconds * 1000:9.2f} ms  {path} ({lines} lines)\n")
+        
+        out.write(f"\nSlowest rules (top {top}):\n")
+        for rule_id, (seconds, matches, issues) in sorted(self.rules.items(), key=lambda item: -item[1][0])[:top]:
+            out.write(f"  {seconds * 1000:9.2f} ms  {rule_id} ({matches} matches, {issues} issues)\n")
+
+    def write_trace(self, path):
+        """Write the spans as a Chrome trace-event JSON file"""
+        with open(path, 'w') as f:
+            f.write(json.dumps({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, separators=(',', ':')))
+
+# Seconds without further change events before touched files are re-analyzed
+WATCH_DEBOUNCE = 0.05
+# Seconds between tree scans when inotify is not available
+WATCH_POLL_INTERVAL = 0.5
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+class InotifyWatcher:
+    """Change events for a set of directories from Linux inotify, called through ctypes
+
+    wait() returns the paths of the entries written, created, moved or
+    deleted in the watched directories, or None when the tree itself
+    changed (a directory was added or removed, or the kernel queue
+    overflowed) and the caller has to rescan.
+    """
+
+    name = 'inotify'
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+        self.directories = {}
+
+    def add(self, directory):
+        """Watch a directory; watching it again is harmless"""
+        wd = self._add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            import ctypes
+            errno = ctypes.get_errno()
+            # The directory may already be gone again; running out of watches is fatal
+            if errno in (2, 20):  # ENOENT, ENOTDIR
+                return
+            raise OSError(errno, f"inotify_add_watch failed: {os.strerror(errno)}", directory)
+        self.directories[wd] = directory
+
+    def wait(self, timeout=None):
+        """Block up to timeout seconds for events; an empty set means none arrived"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        
+        changed = set()
+        rescan = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW or mask & IN_ISDIR:
+                rescan = True
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+            elif wd in self.directories and name:
+                changed.add(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return None if rescan else changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Change detection by comparing file modification times between scans
+
+    Used where inotify is not available.  scan returns a mapping of every
+    watched path to a stamp; wait() reports the paths whose stamp changed
+    since the previous scan, including added and removed files.
+    """
+
+    name = 'polling'
+
+    def __init__(self, scan, interval=WATCH_POLL_INTERVAL):
+        self.scan = scan
+        self.interval = interval
+        self.snapshot = scan()
+
+    def add(self, directory):
+        """Directories are picked up by the next scan"""
+
+    def wait(self, timeout=None):
+        """Sleep up to one poll interval, then return the paths that changed"""
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self.scan()
+        changed = {path for path in self.snapshot.keys() | snapshot.keys()
+                   if self.snapshot.get(path) != snapshot.get(path)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+def _file_stamp(path):
+    """Return the (mtime_ns, size) of a file, or None if it is gone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def diff_issues(old, new):
+    """Return the (added, resolved) issues between two issue lists
+    
+    Issues are matched on file, rule and message first at the same
+    position and then in order, so an issue that only moved because lines
+    were inserted or removed above it is neither added nor resolved.
+    """
+    groups = {}
+    for side, issues in enumerate((old, new)):
+        for issue in issues:
+            groups.setdefault((issue['file'], issue.get('rule'), issue['message']), ([], []))[side].append(issue)
+    
+    added, resolved = [], []
+    for before, after in groups.values():
+        positions = {(issue['line'], issue['column']) for issue in before}
+        positions &= {(issue['line'], issue['column']) for issue in after}
+        before = [issue for issue in before if (issue['line'], issue['column']) not in positions]
+        after = [issue for issue in after if (issue['line'], issue['column']) not in positions]
+        # Unmatched issues pair up in order; only the surplus on either side changed
+        resolved.extend(before[len(after):])
+        added.extend(after[len(before):])
+    return added, resolved
+
+class WatchedIssues:
+    """The issues of the files a watch follows, updated file by file as they change
+
+    Each file's own issues are kept apart from its issues of
+    PROJECT_RULE_IDS, both as found and as the project-wide rules leave
+    them, and the issues those rules add are kept per class name.  A
+    change then only recomputes the changed files' issues and the
+    project-wide issues of the class names they mention, and only those
+    are compared, so a save costs about the same in a project of any size.
+    """
+
+    def __init__(self, assistant):
+        self.assistant = assistant
+        # Per path: issues of rules not in PROJECT_RULE_IDS, issues of those rules, and what is left of them
+        self.own = {}
+        self.deferred = {}
+        self.refined = {}
+        # Issues added by the project-wide rules, per class name
+        self.added = {}
+        self.paths = {}
+
+    def issues(self):
+        """Return every issue, in the order XcodeAssistant._with_project_rules lists them"""
+        issues = [issue for own in self.own.values() for issue in own]
+        issues.extend(issue for refined in self.refined.values() for issue in refined)
+        issues.extend(issue for name in sorted(self.added) for issue in self.added[name])
+        return issues
+
+    def update(self, results, removed=(), names=None):
+        """Take the issues of re-analyzed files and drop removed ones, returning (old, new) changed issues
+
+        results maps paths to their issues.  names are the class names
+        that the symbol summaries of those files mentioned before or
+        mention now; None means every name in the project.  The issues
+        returned are the ones replaced and their replacements, so that
+        diff_issues(old, new) gives what was added and resolved.
+        """
+        assistant = self.assistant
+        symbols = assistant.symbols
+        old, new = [], []
+        for path in removed:
+            self.paths.pop(assistant._key(path), None)
+            old.extend(self.own.pop(path, ()))
+            old.extend(self.refined.pop(path, ()))
+            self.deferred.pop(path, None)
+        for path, issues in results.items():
+            self.paths[assistant._key(path)] = path
+            old.extend(self.own.get(path, ()))
+            self.own[path] = [issue for issue in issues if issue.get('rule') not in PROJECT_RULE_IDS]
+            self.deferred[path] = [issue for issue in issues if issue.get('rule') in PROJECT_RULE_IDS]
+            new.extend(self.own[path])
+        if 'class_sendable' not in assistant.rules_by_id:
+            for path in results:
+                old.extend(self.refined.get(path, ()))
+                self.refined[path] = self.deferred[path]
+                new.extend(self.refined[path])
+            return old, new
+        
+        names = list(symbols.by_name) if names is None else names
+        # The conformances of these classes decide which issues of the files declaring them remain
+        refresh = dict.fromkeys(results)
+        for name in names:
+            for declaration in symbols.by_name.get(name, {}).get('declarations', ()):
+                path = self.paths.get(declaration[0])
+                if path is not None:
+                    refresh[path] = None
+        flagged = set()
+        for path in refresh:
+            old.extend(self.refined.get(path, ()))
+            self.refined[path] = assistant._refine_sendable_issues(self.deferred[path])
+            new.extend(self.refined[path])
+            flagged.update((assistant._key(issue['file']), issue['line']) for issue in self.refined[path]
+                           if issue.get('rule') == 'class_sendable')
+        for name in names:
+            old.extend(self.added.pop(name, ()))
+            added = assistant._cross_file_sendable_issues((name,), flagged)
+            if added:
+                self.added[name] = added
+                new.extend(added)
+        return old, new
 
 class XcodeAssistant:
-    def __init__(self, project_path):
+    def __init__(self, project_path, rules=None, jobs=1, use_cache=False, include=None, exclude=None, profiler=None,
+                 timeout=None, rule_timeout=None):
         self.project_path = Path(project_path)
+        self.include = [compile_glob(glob) for glob in include or ()]
+        self.exclude = [compile_glob(glob) for glob in exclude or ()]
         self.issues = []
+        # Profiling times every file in this process, so it cannot be spread over workers
+        self.profiler = profiler
+        self.jobs = 1 if profiler is not None else resolve_jobs(jobs)
+        # Seconds allowed per file, enforced by killing the worker process, and per rule per file
+        self.timeout = timeout if profiler is None else None
+        self.rule_timeout = rule_timeout
+        self.rules = tuple(RULES if rules is None else rules)
+        self.rules_by_id = {rule.id: rule for rule in self.rules}
+        # Compiled here rather than looked up per file, and before any worker process is forked
+        self.engine = engine_for(self.rules)
+        self.use_cache = use_cache
+        self.cache = AnalysisCache(self.project_path, rules_fingerprint(self.rules)) if use_cache else None
+        
+        # Project-wide knowledge, seeded from the summaries cached by earlier runs
+        self.symbols = SymbolIndex()
+        if self.cache is not None:
+            for key, entry in self.cache.entries.items():
+                if 'symbols' in entry:
+                    self.symbols.update(key, entry['symbols'], changed=False)
+        
+        # SHA-256 per file key of the content self.issues were found in, once saved or loaded
+        self.session = None
+        # SHA-256 per file key of the content each file's latest issues were found in, as analyzed
+        self.file_hashes = {}
         
+    def run_rules(self, content, file_path, line_index=None, check=None, context=None):
+        """Run the rules (optionally only those of one check) over content, given as text or UTF-8 bytes"""
+        if context is None:
+            context = FileContext(content, file_path, line_index)
+        content = context.content
+        line_index = context.line_index
+        
+        rules = self.rules if check is None else tuple(r for r in self.rules if r.check == check)
+        if self.profiler is not None:
+            return self._profile_rules(rules, content, file_path, context)
+        
+        # Issues are grouped per rule so the report order does not depend on the scan
+        buckets = [[] for _ in rules]
+        with rule_budget(self.rule_timeout) if self.rule_timeout else nullcontext() as budget:
+            for index, match in self._engine(rules).scan(content, context.code_map, window=context.window,
+                                                         budget=budget):
+                rule = rules[index]
+                if rule.condition is None or rule.condition(match, context):
+                    buckets[index].append(rule.make_issue(match, file_path, line_index))
+        if budget is not None:
+            self._add_rule_timeouts(buckets, rules, budget, file_path, line_index)
+        
+        return [issue for bucket in buckets for issue in bucket]
+    
+    def _engine(self, rules):
+        """Return the RuleEngine for rules, all of the assistant's or those of one check"""
+        return self.engine if rules is self.rules else engine_for(rules)
+    
+    def _add_rule_timeouts(self, buckets, rules, budget, file_path, line_index):
+        """Append an analysis_timeout issue for each rule stopped by budget after the rule's other issues"""
+        for index, (offset, seconds) in budget.stopped.items():
+            line, column = line_index.position(offset)
+            buckets[index].append(timeout_issue(file_path, line, column, seconds, budget.seconds, rules[index].id))
+    
+    def _profile_rules(self, rules, content, file_path, context):
+        """run_rules, charging the time of every rule's matching and condition to the profiler"""
+        profiler = self.profiler
+        started = time.perf_counter()
+        timings = [0.0] * (len(rules) + 1)
+        # Kept apart until the scan is done, so that only matching counts against a rule budget
+        condition_timings = [0.0] * len(rules)
+        matches = [0] * len(rules)
+        buckets = [[] for _ in rules]
+        with rule_budget(self.rule_timeout) if self.rule_timeout else nullcontext() as budget:
+            for index, match in self._engine(rules).scan(content, context.code_map, timings, context.window,
+                                                         budget):
+                rule = rules[index]
+                matches[index] += 1
+                condition_started = time.perf_counter()
+                if rule.condition is None or rule.condition(match, context):
+                    buckets[index].append(rule.make_issue(match, file_path, context.line_index))
+                condition_timings[index] += time.perf_counter() - condition_started
+        if budget is not None:
+            self._add_rule_timeouts(buckets, rules, budget, file_path, context.line_index)
+        for index, seconds in enumerate(condition_timings):
+            timings[index] += seconds
+        
+        for rule, seconds, count, bucket in zip(rules, timings, matches, buckets):
+            profiler.add_rule(rule.id, seconds, count, len(bucket))
+        rule_seconds = sum(timings[:-1])
+        profiler.stages['scan'] = profiler.stages.get('scan', 0.0) + timings[-1]
+        profiler.stages['rules'] = profiler.stages.get('rules', 0.0) + rule_seconds
+        profiler.record('run_rules', started, time.perf_counter() - started, args={
+            'scan_ms': round(timings[-1] * 1000, 3),
+            **{rule.id: round(seconds * 1000, 3) for rule, seconds in zip(rules, timings) if seconds},
+        })
+        return [issue for bucket in buckets for issue in bucket]
+    
     def find_swift_files(self):
         """Find all Swift files in the project"""
-        swift_files = []
-        for root, _, files in os.walk(self.project_path):
-            for file in files:
-                if file.endswith('.swift'):
-                    swift_files.append(os.path.join(root, file))
-        return swift_files
+        return list(self.iter_swift_files())
+    
+    def iter_swift_files(self, directories=None):
+        """Yield the project's Swift files lazily, in sorted order, skipping excluded paths
+        
+        Vendor and build directories are pruned without being entered, and
+        .gitignore/.xcodeassistantignore files are honored at every level.
+        Every directory visited is appended to the directories list if given.
+        """
+        root = str(self.project_path)
+        # Each stack entry is a directory and the ignore files that apply inside it
+        stack = [(root, [])]
+        while stack:
+            directory, ignore_files = stack.pop()
+            if directories is not None:
+                directories.append(directory)
+            ignore_files = ignore_files + [f for f in (IgnoreFile.load(directory, os.path.join(directory, name))
+                                                       for name in IGNORE_FILE_NAMES) if f]
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._is_excluded_dir(entry, ignore_files):
+                        continue
+                    subdirs.append(entry.path)
+                elif entry.name.endswith('.swift') and entry.is_file():
+                    if self._is_excluded_file(entry, ignore_files):
+                        continue
+                    yield entry.path
+            
+            # Visit subdirectories in order after the files of this directory, like os.walk
+            stack.extend((path, ignore_files) for path in reversed(subdirs))
+    
+    def is_discoverable(self, path):
+        """Check if iter_swift_files would yield path, without walking the tree"""
+        if not path.endswith('.swift') or not os.path.isfile(path):
+            return False
+        relative = self._relative(path)
+        if relative.startswith('../'):
+            return False
+        
+        directory = str(self.project_path)
+        ignore_files = []
+        parts = relative.split('/')
+        for name in parts[:-1]:
+            ignore_files.extend(f for f in (IgnoreFile.load(directory, os.path.join(directory, ignore_name))
+                                            for ignore_name in IGNORE_FILE_NAMES) if f)
+            directory = os.path.join(directory, name)
+            if name in DEFAULT_EXCLUDED_DIRS or name.endswith(DEFAULT_EXCLUDED_DIR_SUFFIXES):
+                return False
+            if any(glob.match(self._relative(directory)) for glob in self.exclude):
+                return False
+            if _is_ignored(ignore_files, directory, True):
+                return False
+        ignore_files.extend(f for f in (IgnoreFile.load(directory, os.path.join(directory, ignore_name))
+                                        for ignore_name in IGNORE_FILE_NAMES) if f)
+        return bool(self.filter_paths([path])) and not _is_ignored(ignore_files, path, False)
+    
+    def _key(self, path):
+        """Return the key identifying a file in the cache and symbol index"""
+        return _relpath(path, self.project_path)
     
-    def analyze_file(self, file_path):
+    def _relative(self, path):
+        """Return path relative to the project root with forward slashes"""
+        return _relpath(path, self.project_path).replace(os.sep, '/')
+    
+    def _is_excluded_dir(self, entry, ignore_files):
+        """Check if a directory should be pruned from discovery"""
+        if entry.name in DEFAULT_EXCLUDED_DIRS or entry.name.endswith(DEFAULT_EXCLUDED_DIR_SUFFIXES):
+            return True
+        if self.exclude:
+            relative = self._relative(entry.path)
+            if any(glob.match(relative) for glob in self.exclude):
+                return True
+        return _is_ignored(ignore_files, entry.path, True)
+    
+    def _is_excluded_file(self, entry, ignore_files):
+        """Check if a Swift file is filtered out by --include/--exclude or ignore files"""
+        if self.include or self.exclude:
+            relative = self._relative(entry.path)
+            if self.include and not any(glob.match(relative) for glob in self.include):
+                return True
+            if any(glob.match(relative) for glob in self.exclude):
+                return True
+        return _is_ignored(ignore_files, entry.path, False)
+    
+    def analyze_file(self, file_path, content=None):
         """Analyze a Swift file for common issues"""
-        with open(file_path, 'r') as f:
-            content = f.read()
+        return self._analyze(file_path, content)[0]
+    
+    def _analyze(self, file_path, content=None):
+        """Analyze a Swift file, returning its issues and its symbol summary
+        
+        content, text or UTF-8 bytes, is analyzed instead of the file on
+        disk when given.  The file is otherwise read as bytes, or mapped
+        into memory when large, and never decoded as a whole.
+        """
+        if self.profiler is not None:
+            return self._profile_analyze(file_path, content)
+        if content is None:
+            content = _read_source_bytes(file_path)
             
-        file_issues = []
+        # All checks share one tokenizer pass and one scan over the content
+        context = FileContext(content, file_path)
+        issues = self.run_rules(content, file_path, context=context)
+        return issues, self._summarize(context)
+    
+    def _summarize(self, context):
+        """Return the symbol summary of a file, which only the class_sendable rule needs"""
+        if 'class_sendable' not in self.rules_by_id:
+            return empty_symbols()
+        return summarize_symbols(context)
+    
+    def _profile_analyze(self, file_path, content=None):
+        """_analyze, timing each step of the file's analysis"""
+        profiler = self.profiler
+        started = time.perf_counter()
+        if content is None:
+            with profiler.span('read', 'read'):
+                content = _read_source_bytes(file_path)
+        context = FileContext(content, file_path)
+        issues = self.run_rules(content, file_path, context=context)
+        with profiler.span('symbols', 'symbols'):
+            symbols = self._summarize(context)
         
-        # Check for buildExpression issues
-        buildexp_issues = self.check_build_expression(content, file_path)
-        file_issues.extend(buildexp_issues)
+        seconds = time.perf_counter() - started
+        relative = self._relative(file_path)
+        profiler.files[relative] = (seconds, context.line_index.line_of(len(context.content)))
+        profiler.record(relative, started, seconds, args={'issues': len(issues)})
+        return issues, symbols
+    
+    def check_build_expression(self, content, file_path, line_index=None):
+        """Check for potential buildExpression issues in SwiftUI code"""
+        return self.run_rules(content, file_path, line_index, check='build_expression')
+    
+    def check_deprecated_apis(self, content, file_path, line_index=None):
+        """Check for common deprecated APIs in Swift"""
+        return self.run_rules(content, file_path, line_index, check='deprecated_apis')
+    
+    def check_sendable_conformance(self, content, file_path, line_index=None):
+        """Check for potential Sendable conformance issues"""
+        return self.run_rules(content, file_path, line_index, check='sendable_conformance')
+    
+    def find_changed_swift_files(self, ref=None):
+        """Find the Swift files changed since a git ref, or not yet committed when ref is None
         
-        # Check for deprecated API usage
-        deprecated_issues = self.check_deprecated_apis(content, file_path)
-        file_issues.extend(deprecated_issues)
+        Changes come from `git diff --name-only` against the ref plus
+        `git status --porcelain`, which adds staged and untracked files.
+        """
+        root = Path(self._git('rev-parse', '--show-toplevel').strip())
         
-        # Check for Sendable conformance issues
-        sendable_issues = self.check_sendable_conformance(content, file_path)
-        file_issues.extend(sendable_issues)
+        changed = set()
+        if ref:
+            changed.update(self._git('diff', '--name-only', '-z', ref, '--').split('\0'))
         
-        return file_issues
+        # Porcelain entries are "XY path"; renames and copies are followed by the original path
+        entries = iter(self._git('status', '--porcelain', '-z', '--untracked-files=all').split('\0'))
+        for entry in entries:
+            if len(entry) < 4:
+                continue
+            changed.add(entry[3:])
+            if entry[0] in 'RC':
+                next(entries, None)
+        
+        project = self.project_path.resolve()
+        swift_files = []
+        for name in sorted(changed):
+            path = root / name
+            if not name.endswith('.swift') or not path.is_file():
+                continue
+            try:
+                relative = path.resolve().relative_to(project)
+            except ValueError:
+                continue
+            swift_files.append(os.path.join(self.project_path, relative))
+        return self.filter_paths(swift_files)
     
-    def check_build_expression(self, content, file_path):
-        """Check for potential buildExpression issues in SwiftUI code"""
+    def find_xcodeproj_swift_files(self, xcodeproj=None, targets=None):
+        """Find the Swift files compiled into targets of an Xcode project instead of walking the tree"""
+        if not xcodeproj:
+            xcodeproj = XcodeProject.find(self.project_path)
+        project = XcodeProject(xcodeproj)
+        
+        root = self.project_path.resolve()
+        swift_files = []
+        for path in project.source_files(targets):
+            try:
+                swift_files.append(os.path.join(self.project_path, Path(path).resolve().relative_to(root)))
+            except ValueError:
+                swift_files.append(path)
+        return self.filter_paths(swift_files)
+    
+    def filter_paths(self, paths):
+        """Apply the --include/--exclude globs to an explicit list of files"""
+        if not self.include and not self.exclude:
+            return list(paths)
+        filtered = []
+        for path in paths:
+            relative = self._relative(path)
+            if self.include and not any(glob.match(relative) for glob in self.include):
+                continue
+            if any(glob.match(relative) for glob in self.exclude):
+                continue
+            filtered.append(path)
+        return filtered
+    
+    def _git(self, *args):
+        """Run a git command in the project directory and return its output"""
+        import subprocess
+        try:
+            result = subprocess.run(['git', '-C', str(self.project_path), *args],
+                                    capture_output=True, text=True, check=True)
+        except FileNotFoundError:
+            raise RuntimeError("git is not installed")
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"git {args[0]} failed: {e.stderr.strip()}")
+        return result.stdout
+    
+    def analyze_project(self, swift_files=None):
+        """Analyze the entire project, or only the given files, for issues"""
+        self.issues.extend(self._with_project_rules(self.iter_project_issues(swift_files)))
+        return self.issues
+    
+    def _with_project_rules(self, file_issues):
+        """Return the issues of each file of file_issues in order, then the refined ones of project-wide rules
+        
+        Issues of PROJECT_RULE_IDS come last because stream_report can only
+        write them once every file is analyzed; every report and the
+        indexes --fix takes list issues in this same order.
+        """
         issues = []
+        deferred = []
+        for issues_of_file in file_issues:
+            for issue in issues_of_file:
+                (deferred if issue.get('rule') in PROJECT_RULE_IDS else issues).append(issue)
+        with self._span('project rules'):
+            issues.extend(self.apply_project_rules(deferred))
+        return issues
+    
+    def _span(self, stage):
+        """Time a block as a profiler stage, or do nothing when not profiling"""
+        return self.profiler.span(stage, stage) if self.profiler is not None else nullcontext()
+    
+    def iter_project_issues(self, swift_files=None):
+        """Yield the issues of each file as soon as it has been analyzed
         
-        # Look for VStack with spacing parameter
-        vstack_pattern = r'VStack\(spacing:.*\)'
-        matches = re.finditer(vstack_pattern, content)
+        Unlike analyze_project the issues are not kept on the assistant,
+        and project-wide rules are not applied: call apply_project_rules()
+        once every file has been analyzed.
+        """
+        full_scan = swift_files is None
+        if full_scan:
+            swift_files = self.iter_swift_files()
+            if self.profiler is not None:
+                swift_files = self.profiler.timed(swift_files, 'discovery')
         
-        for match in matches:
-            issues.append({
-                'file': file_path,
-                'line': content[:match.start()].count('\n') + 1,
-                'type': 'buildExpression',
-                'message': 'Potential buildExpression issue with VStack spacing parameter',
-                'suggestion': 'Replace with VStack {} and explicit Spacer().frame(height: X) elements'
-            })
-            
-        # Look for conditional expressions in Text interpolation
-        text_interp_pattern = r'Text\(".*\\\(.*\?.*:.*\).*"\)'
-        matches = re.finditer(text_interp_pattern, content)
+        self.analyzed_keys = set()
+        for path, result in self._check_files(swift_files):
+            self.analyzed_keys.add(self._key(path))
+            yield self._resolve_result(path, result)
         
-        for match in matches:
-            issues.append({
-                'file': file_path,
-                'line': content[:match.start()].count('\n') + 1,
-                'type': 'buildExpression',
-                'message': 'Potential buildExpression issue with conditional expression in Text interpolation',
-                'suggestion': 'Extract the conditional expression to a separate variable before using in Text'
-            })
-            
-        return issues
+        if full_scan:
+            for key in set(self.symbols.files) - self.analyzed_keys:
+                self.symbols.remove(key)
+        if self.cache is not None:
+            self.cache.save(prune=full_scan)
+            self.symbols.save(self.cache.directory)
     
-    def check_deprecated_apis(self, content, file_path):
-        """Check for common deprecated APIs in Swift"""
-        issues = []
+    def apply_project_rules(self, issues, names=None):
+        """Refine per-file issues with the project-wide symbol index
+        
+        A class flagged for Sendable is dropped when an extension anywhere
+        in the project adds the conformance, and a class declared in one
+        file but used by async code in another file is flagged at its
+        declaration.  New issues are appended after the per-file ones; with
+        names, only classes of those names are looked at for them.
+        """
+        if 'class_sendable' not in self.rules_by_id:
+            return issues
+        refined = self._refine_sendable_issues(issues)
+        flagged = {(self._key(issue['file']), issue['line']) for issue in refined if issue.get('rule') == 'class_sendable'}
+        return refined + self._cross_file_sendable_issues(self.symbols.by_name if names is None else names, flagged)
+    
+    def _refine_sendable_issues(self, issues):
+        """Return issues without the class_sendable ones of classes an extension makes Sendable"""
+        # Classes declared at each line of the files with issues, to map issues back to symbols
+        classes_at = {}
+        refined = []
+        for issue in issues:
+            if issue.get('rule') == 'class_sendable':
+                key = self._key(issue['file'])
+                if key not in classes_at:
+                    classes_at[key] = {}
+                    for kind, name, line, column, conformances in self.symbols.files.get(key, empty_symbols())['declarations']:
+                        if kind == 'class':
+                            classes_at[key].setdefault(line, []).append(name)
+                names = classes_at[key].get(issue['line'], [])
+                if names and all(self.symbols.conforms_to(name, 'Sendable') for name in names):
+                    continue
+            refined.append(issue)
+        return refined
+    
+    def _cross_file_sendable_issues(self, names, flagged):
+        """Return class_sendable issues for the classes of names used by async code in other files
         
-        deprecated_apis = [
-            (r'AVAsset\(url:', 'AVURLAsset(url:'),
-            (r'\.duration\s', 'asset.load(.duration)'),
-            (r'\.tracks\(withMediaType:', 'asset.loadTracks(withMediaType:'),
-            (r'\.nominalFrameRate', 'videoTrack.load(.nominalFrameRate)'),
-            (r'\.naturalSize', 'videoTrack.load(.naturalSize)'),
-            (r'copyCGImage\(at:', 'generateCGImageAsynchronously(for:'),
-            (r'init\(url:\)', 'AVURLAsset(url:)'),
-        ]
-        
-        for pattern, replacement in deprecated_apis:
-            matches = re.finditer(pattern, content)
-            for match in matches:
+        flagged holds the (file key, line) of every declaration of those
+        classes that its own file's class_sendable issues already flag.
+        """
+        rule = self.rules_by_id['class_sendable']
+        by_name = self.symbols.by_name
+        issues = []
+        for name in sorted(names):
+            symbol = by_name.get(name)
+            if symbol is None or self.symbols.conforms_to(name, 'Sendable'):
+                continue
+            for key, kind, line, column, conformances in sorted(symbol['declarations']):
+                if kind != 'class' or (key, line) in flagged:
+                    continue
+                users = sorted(use_key for use_key, _ in symbol['async_uses'] if use_key != key)
+                # Only report what this run analyzed: the declaration or one of its users
+                if not users or not ({key, *users} & self.analyzed_keys):
+                    continue
+                fields = {'match': f"class {name}", 'name': name}
                 issues.append({
-                    'file': file_path,
-                    'line': content[:match.start()].count('\n') + 1,
-                    'type': 'deprecated_api',
-                    'message': f'Potential deprecated API usage: {match.group(0)}',
-                    'suggestion': f'Consider using {replacement} instead'
+                    'file': os.path.join(self.project_path, key),
+                    'line': line,
+                    'column': column,
+                    'type': rule.issue_type,
+                    'rule': rule.id,
+                    'message': rule.message.format(**fields) + f" (used by async code in {', '.join(users)})",
+                    'suggestion': rule.suggestion.format(**fields)
                 })
-                
         return issues
     
-    def check_sendable_conformance(self, content, file_path):
-        """Check for potential Sendable conformance issues"""
-        issues = []
+    def analyze_files(self, paths):
+        """Yield the issues of each file in paths, in order, using self.jobs processes"""
+        for path, result in self._check_files(paths):
+            yield self._resolve_result(path, result)
+    
+    def _check_files(self, paths):
+        """Yield (path, check_file result) for each file in paths, in order"""
+        items = ((path, self.cache.entry(path) if self.cache else None) for path in paths)
+        if self.timeout is not None:
+            yield from self._supervise_files(items)
+            return
         
-        # Look for classes used in async contexts
-        class_pattern = r'class\s+(\w+)'
-        class_matches = re.finditer(class_pattern, content)
+        # Small projects are not worth the cost of starting worker processes
+        head = list(islice(items, PARALLEL_MIN_FILES))
+        if self.jobs == 1 or len(head) < PARALLEL_MIN_FILES:
+            for path, entry in chain(head, items):
+                yield path, self.check_file(path, entry)
+            return
         
-        for class_match in class_matches:
-            class_name = class_match.group(1)
-            # Check if class is used in async/Task context but doesn't conform to Sendable
-            if 'Task' in content or 'async' in content:
-                if f': Sendable' not in content and '@unchecked Sendable' not in content:
-                    issues.append({
-                        'file': file_path,
-                        'line': content[:class_match.start()].count('\n') + 1,
-                        'type': 'sendable_conformance',
-                        'message': f'Class {class_name} might need Sendable conformance for use in async contexts',
-                        'suggestion': f'Add ": @unchecked Sendable" to class definition or make class thread-safe'
-                    })
-                    
+        # Only imported when needed, as it takes a noticeable part of the startup time
+        from concurrent.futures import ProcessPoolExecutor
+        batches = _batched(chain(head, items), PARALLEL_BATCH_SIZE)
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                 initargs=(str(self.project_path), self.rules, self.use_cache,
+                                           self.rule_timeout)) as executor:
+            # Keep a bounded number of batches in flight and collect them in submission order
+            pending = deque()
+            for batch in batches:
+                pending.append((batch, executor.submit(_analyze_batch, batch)))
+                if len(pending) >= self.jobs * 2:
+                    batch, future = pending.popleft()
+                    yield from zip((path for path, _ in batch), future.result())
+            while pending:
+                batch, future = pending.popleft()
+                yield from zip((path for path, _ in batch), future.result())
+    
+    def _supervise_files(self, items):
+        """_check_files for a time budget per file: each file is analyzed by a SupervisedWorker
+        
+        A worker that has spent self.timeout seconds on a file is killed
+        and replaced, and the file gets an analysis_timeout issue and no
+        symbols instead of its result, which is not cached.  Results are
+        yielded in order, with a bounded number of files in flight.
+        """
+        import multiprocessing.connection
+        init_args = (str(self.project_path), self.rules, self.use_cache, self.rule_timeout)
+        items = enumerate(items)
+        workers = []
+        results = {}
+        submitted = yielded = 0
+        exhausted = False
+        try:
+            while True:
+                idle = [worker for worker in workers if worker.task is None]
+                while not exhausted and submitted - yielded < self.jobs * PARALLEL_BATCH_SIZE:
+                    if not idle and len(workers) < self.jobs:
+                        workers.append(SupervisedWorker(init_args))
+                        idle.append(workers[-1])
+                    if not idle:
+                        break
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    number, (path, entry) = item
+                    idle.pop().submit(number, path, entry)
+                    submitted += 1
+                
+                while yielded in results:
+                    yield results.pop(yielded)
+                    yielded += 1
+                busy = [worker for worker in workers if worker.task is not None]
+                if not busy:
+                    if exhausted:
+                        return
+                    continue
+                
+                deadline = min(worker.task[2] for worker in busy) + self.timeout
+                ready = multiprocessing.connection.wait([worker.connection for worker in busy],
+                                                        max(0, deadline - time.monotonic()))
+                now = time.monotonic()
+                for worker in busy:
+                    number, path, started = worker.task
+                    if worker.connection in ready:
+                        results[number] = path, worker.result()
+                    elif now - started >= self.timeout:
+                        worker.close()
+                        workers.remove(worker)
+                        issue = timeout_issue(path, 1, 1, now - started, self.timeout)
+                        symbols = empty_symbols()
+                        results[number] = path, (None, [issue], None, symbols)
+        finally:
+            for worker in workers:
+                worker.close()
+    
+    def check_file(self, path, entry=None):
+        """Analyze path unless its cache entry shows it is unchanged
+        
+        Returns a (status, issues, stamp, symbols) tuple where status is None
+        when caching is off, 'hit' when the cached issues are still valid and
+        'miss' when the file was analyzed.
+        """
+        if not self.use_cache:
+            issues, symbols = self._analyze(path)
+            return None, issues, None, symbols
+        
+        stat = os.stat(path)
+        if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return 'hit', None, None, None
+        
+        data = _map_file(path)
+        stamp = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': _sha256(data)}
+        if entry is not None and entry['sha256'] == stamp['sha256']:
+            return 'hit', None, stamp, None
+        issues, symbols = self._analyze(path, _normalize_newlines(data))
+        # How far analysis gets within a budget depends on the machine, so such results are not
+        # cached; the stamp still carries the hash of what was analyzed
+        if any(issue['type'] == TIMEOUT_ISSUE_TYPE for issue in issues):
+            return None, issues, stamp, symbols
+        return 'miss', issues, stamp, symbols
+    
+    def _resolve_result(self, path, result):
+        """Turn a check_file result into the file's issues, updating the cache, symbol index and file hashes"""
+        status, issues, stamp, symbols = result
+        if stamp is not None:
+            self.file_hashes[self._key(path)] = stamp['sha256']
+        if status == 'hit':
+            if stamp is not None:
+                self.cache.touch(path, stamp)
+            else:
+                self.file_hashes[self._key(path)] = self.cache.entries[self.cache.key(path)]['sha256']
+            self.symbols.update(self.cache.key(path), self.cache.symbols(path), changed=False)
+            return self.cache.issues(path)
+        changed = True
+        if status == 'miss':
+            previous = self.cache.entries.get(self.cache.key(path))
+            changed = previous is None or previous['symbols'] != symbols
+            self.cache.store(path, stamp, issues, symbols)
+        self.symbols.update(self._key(path), symbols, changed)
         return issues
     
-    def analyze_project(self):
-        """Analyze the entire project for issues"""
-        swift_files = self.find_swift_files()
-        for file in swift_files:
-            file_issues = self.analyze_file(file)
-            self.issues.extend(file_issues)
+    def generate_report(self, format='json'):
+        """Generate a JSON (or NDJSON, one issue per line) report of all issues"""
+        with self._span('report'):
+            return format_report(self.issues, format)
+    
+    def stream_report(self, out, swift_files=None):
+        """Analyze the project, writing an NDJSON line per issue as each file completes
         
+        Returns the number of issues written, in the order of
+        analyze_project().  Memory use does not grow with the number of
+        issues.
+        """
+        count = 0
+        deferred = []
+        for file_issues in self.iter_project_issues(swift_files):
+            written = 0
+            for issue in file_issues:
+                # Issues of rules refined project-wide wait for the complete symbol index
+                if issue.get('rule') in PROJECT_RULE_IDS:
+                    deferred.append(issue)
+                    continue
+                out.write(ndjson_line(issue))
+                written += 1
+            count += written
+            if written:
+                out.flush()
+        
+        with self._span('project rules'):
+            deferred = self.apply_project_rules(deferred)
+        for issue in deferred:
+            out.write(ndjson_line(issue))
+            count += 1
+        return count
+    
+    def watch(self, out, swift_files=None, debounce=WATCH_DEBOUNCE, poll_interval=WATCH_POLL_INTERVAL):
+        """Analyze the project, then re-analyze files as they are saved until interrupted
+        
+        The issues of every file stay in memory.  After each burst of change
+        events only the touched files are analyzed again, and the issues that
+        appeared or were resolved are written to out prefixed with + or -.
+        Changes come from inotify on Linux and from polling elsewhere.  With
+        an explicit swift_files list only those files are watched.
+        """
+        def discover(directories=None):
+            if swift_files is None:
+                return list(self.iter_swift_files(directories))
+            paths = [path for path in swift_files if os.path.isfile(path)]
+            if directories is not None:
+                directories.extend(sorted({os.path.dirname(path) or '.' for path in paths}))
+            return paths
+        
+        directories = []
+        paths = discover(directories)
+        try:
+            watcher = InotifyWatcher()
+            try:
+                for directory in directories:
+                    watcher.add(directory)
+            except OSError:
+                watcher.close()
+                raise
+        except OSError:
+            watcher = PollingWatcher(lambda: {path: _file_stamp(path) for path in discover()}, poll_interval)
+        
+        results = dict(zip(paths, self.analyze_files(paths)))
+        stamps = {path: _file_stamp(path) for path in paths}
+        self.analyzed_keys = {self._key(path) for path in paths}
+        watched = WatchedIssues(self)
+        watched.update(results)
+        self.issues = self._write_issue_diff(out, [], watched.issues())
+        print(f"Watching {len(paths)} Swift files ({watcher.name}), press Ctrl-C to stop", file=sys.stderr)
+        
+        try:
+            while True:
+                changed = watcher.wait()
+                if changed is not None and not changed:
+                    continue
+                # Editors and git write files in bursts; wait for them to settle
+                while True:
+                    more = watcher.wait(debounce)
+                    if more is not None and not more:
+                        break
+                    changed = None if changed is None or more is None else changed | more
+                
+                started = time.perf_counter()
+                if changed is None:
+                    # Directories came or went: rediscover and compare stamps
+                    directories = []
+                    found = set(discover(directories))
+                    for directory in directories:
+                        watcher.add(directory)
+                    removed = watched.own.keys() - found
+                    updated = sorted(path for path in found if stamps.get(path) != _file_stamp(path))
+                else:
+                    removed = {path for path in changed if path in watched.own and not os.path.isfile(path)}
+                    updated = sorted(path for path in changed - removed
+                                     if path in watched.own or (swift_files is None and self.is_discoverable(path)))
+                
+                changes = self._update_watched(watched, updated, removed, stamps)
+                if changes is None:
+                    continue
+                self._write_issue_diff(out, *changes)
+                self.issues = watched.issues()
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"Re-analyzed {len(updated)} files, {len(removed)} removed, in {elapsed:.0f} ms; "
+                      f"{len(self.issues)} potential issues", file=sys.stderr)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            if self.cache is not None:
+                self.cache.save()
+                self.symbols.save(self.cache.directory)
         return self.issues
     
-    def generate_report(self):
-        """Generate a JSON report of all issues"""
-        return json.dumps(self.issues, indent=2)
+    def _update_watched(self, watched, updated, removed, stamps):
+        """Re-analyze the updated paths of a watch and forget the removed ones
+        
+        Returns the (old, new) issues of WatchedIssues.update, or None
+        when no file could be read and none was removed.
+        """
+        # The classes whose project-wide issues the change may affect, as the files were
+        names = set()
+        for path in [*updated, *removed]:
+            names |= summary_names(self.symbols.files.get(self._key(path)))
+        results = {}
+        for path in updated:
+            try:
+                entry = self.cache.entry(path) if self.cache else None
+                results[path] = self._resolve_result(path, self.check_file(path, entry))
+            except OSError:
+                # Deleted again before it could be read
+                removed.add(path)
+                continue
+            stamps[path] = _file_stamp(path)
+            self.analyzed_keys.add(self._key(path))
+            names |= summary_names(self.symbols.files.get(self._key(path)))
+        for path in removed:
+            stamps.pop(path, None)
+            self.symbols.remove(self._key(path))
+            self.analyzed_keys.discard(self._key(path))
+        if not results and not removed:
+            return None
+        return watched.update(results, removed, names)
+    
+    def _write_issue_diff(self, out, old, new):
+        """Write the issues added and resolved between old and new, returning new"""
+        added, resolved = diff_issues(old, new)
+        for prefix, issues in (('-', resolved), ('+', added)):
+            for issue in issues:
+                out.write(f"{prefix} {issue['type']} in {issue['file']} line {issue['line']}, "
+                          f"column {issue['column']}: {issue['message']}\n")
+        if added or resolved:
+            out.flush()
+        return new
+    
+    def save_session(self):
+        """Write the issue list and the hash of every file with issues to the session file
+        
+        --fix and --fix-all then act on exactly the issues that were listed,
+        by their index, without analyzing the project again.  The hashes are
+        those of the content the issues were found in, kept from the
+        analysis rather than read again.  Nothing is written when the cache
+        is off.
+        """
+        if not self.use_cache:
+            return
+        self.session = {}
+        for issue in self.issues:
+            key = self._key(issue['file'])
+            if key not in self.session:
+                self.session[key] = self.file_hashes.get(key)
+        self._write_session()
+    
+    def _write_session(self):
+        """Write self.issues and self.session to the session file atomically"""
+        directory = self.project_path / CACHE_DIR_NAME
+        make_cache_directory(directory)
+        data = {
+            'version': SESSION_VERSION,
+            'fingerprint': rules_fingerprint(self.rules),
+            'files': self.session,
+            'issues': [dict(issue, file=self._key(issue['file'])) for issue in self.issues],
+        }
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+            f.write(json.dumps(data, separators=(',', ':')))
+        os.replace(f.name, directory / SESSION_FILE_NAME)
+    
+    def load_session(self):
+        """Replace the issue list with the one in the session file, returning False if there is none
+        
+        The session is ignored when the cache is off or the rules changed.
+        Files are not read here: fixing an issue first checks that its
+        file still has the hash it had when the session was written.
+        """
+        if not self.use_cache:
+            return False
+        try:
+            with open(self.project_path / CACHE_DIR_NAME / SESSION_FILE_NAME, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != SESSION_VERSION or data.get('fingerprint') != rules_fingerprint(self.rules):
+            return False
+        self.issues = [{**issue, 'file': os.path.join(self.project_path, issue['file'])} for issue in data['issues']]
+        self.session = data['files']
+        return True
+    
+    def _file_hash(self, path):
+        """Return the SHA-256 of a file's bytes, or None if it cannot be read"""
+        try:
+            return _sha256(_map_file(path))
+        except OSError:
+            return None
+    
+    def _changed_since_session(self, path):
+        """Check if a file no longer has the content the session's issues were found in"""
+        if self.session is None:
+            return False
+        expected = self.session.get(self._key(path))
+        return expected is None or self._file_hash(path) != expected
     
     def suggest_fixes(self, issue_index=None):
-        """Generate suggested fixes for issues"""
+        """Generate suggested fixes for issues
+        
+        An issue whose file changed since the issues were listed gets a
+        message instead of a fix, as its line may no longer be the same.
+        """
         if issue_index is not None:
             if 0 <= issue_index < len(self.issues):
-                return self.generate_fix(self.issues[issue_index])
+                issue = self.issues[issue_index]
+                if self._changed_since_session(issue['file']):
+                    return f"{issue['file']} changed since it was analyzed, analyze the project again to fix it"
+                return self.generate_fix(issue)
             else:
                 return "Invalid issue index"
         
+        # Each file is hashed once however many issues it has
+        changed = {}
         fixes = []
         for issue in self.issues:
-            fixes.append(self.generate_fix(issue))
+            path = issue['file']
+            if path not in changed:
+                changed[path] = self._changed_since_session(path)
+            if changed[path]:
+                fixes.append(f"{path} changed since it was analyzed, analyze the project again to fix it")
+            else:
+                fixes.append(self.generate_fix(issue))
         
         return fixes
     
-    def generate_fix(self, issue):
-        """Generate a specific fix for an issue"""
+    def generate_fix(self, issue, content=None):
+        """Generate a specific fix for an issue
+        
+        The fix is computed against content when given (such as an unsaved
+        editor buffer) instead of the file on disk.
+        """
         if issue['type'] == 'buildExpression':
-            return self.fix_build_expression(issue)
+            return self.fix_build_expression(issue, content)
         elif issue['type'] == 'deprecated_api':
-            return self.fix_deprecated_api(issue)
+            return self.fix_deprecated_api(issue, content)
         elif issue['type'] == 'sendable_conformance':
-            return self.fix_sendable_conformance(issue)
+            return self.fix_sendable_conformance(issue, content)
         else:
             return f"No automatic fix available for issue type: {issue['type']}"
     
-    def fix_build_expression(self, issue):
+    def fix_build_expression(self, issue, content=None):
         """Generate a fix for buildExpression issues"""
         file_path = issue['file']
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
+        lines = io.StringIO(_read_source(file_path, content)).readlines()
         
         line_num = issue['line'] - 1
         line = lines[line_num]
         
         if 'VStack(spacing:' in line:
             # Extract the spacing value
-            spacing_match = re.search(r'spacing:\s*(\d+)', line)
+            spacing_match = RULES_BY_ID['vstack_spacing'].fix_pattern.search(line)
             spacing = spacing_match.group(1) if spacing_match else '20'
             
             # Replace with VStack and explicit spacer
-            indent = re.match(r'^\s*', line).group(0)
+            indent = _INDENT.match(line).group(0)
             new_line = f"{indent}VStack {{\n"
             new_line += f"{indent}    Spacer().frame(height: {spacing})\n"
             
@@ -195,10 +3413,10 @@ class XcodeAssistant:
         
         elif 'Text(' in line and '\\(' in line and '?' in line:
             # Extract the conditional expression
-            conditional_match = re.search(r'\\((.+?\?.+?:.+?)\\)', line)
+            conditional_match = RULES_BY_ID['text_conditional_interpolation'].fix_pattern.search(line)
             if conditional_match:
                 conditional_expr = conditional_match.group(1)
-                indent = re.match(r'^\s*', line).group(0)
+                indent = _INDENT.match(line).group(0)
                 
                 # Create a variable for the conditional expression
                 var_name = 'computed_value'
@@ -223,29 +3441,24 @@ class XcodeAssistant:
             'message': "Manual fix required for this buildExpression issue"
         }
     
-    def fix_deprecated_api(self, issue):
+    def fix_deprecated_api(self, issue, content=None):
         """Generate a fix for deprecated API issues"""
         file_path = issue['file']
-        with open(file_path, 'r') as f:
-            content = f.read()
-            lines = content.splitlines()
+        lines = _read_source(file_path, content).splitlines()
         
         line_num = issue['line'] - 1
         line = lines[line_num]
         
-        # Map of patterns to their modern replacements
-        api_replacements = {
-            r'AVAsset\(url: (.+?)\)': r'AVURLAsset(url: \1)',
-            r'(\w+)\.duration': r'try await \1.load(.duration)',
-            r'(\w+)\.tracks\(withMediaType: (.+?)\)': r'try await \1.loadTracks(withMediaType: \2)',
-            r'(\w+)\.nominalFrameRate': r'try await \1.load(.nominalFrameRate)',
-            r'(\w+)\.naturalSize': r'try await \1.load(.naturalSize)',
-            r'(\w+)\.copyCGImage\(at: (.+?), actualTime: (.+?)\)': r'\1.generateCGImageAsynchronously(for: \2) { cgImage, actualTime, error in',
-        }
+        # Try the replacement of the rule that reported the issue first
+        rules = [rule for rule in self.rules if rule.check == 'deprecated_apis' and rule.fix_pattern]
+        own_rule = self.rules_by_id.get(issue.get('rule'))
+        if own_rule in rules:
+            rules.remove(own_rule)
+            rules.insert(0, own_rule)
         
-        for pattern, replacement in api_replacements.items():
-            if re.search(pattern, line):
-                new_line = re.sub(pattern, replacement, line)
+        for rule in rules:
+            if rule.fix_pattern.search(line):
+                new_line = rule.fix_pattern.sub(rule.fix_template, line)
                 
                 return {
                     'file': file_path,
@@ -262,16 +3475,15 @@ class XcodeAssistant:
             'message': "Manual fix required for this deprecated API"
         }
     
-    def fix_sendable_conformance(self, issue):
+    def fix_sendable_conformance(self, issue, content=None):
         """Generate a fix for Sendable conformance issues"""
         file_path = issue['file']
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
+        lines = io.StringIO(_read_source(file_path, content)).readlines()
         
         line_num = issue['line'] - 1
         line = lines[line_num]
         
-        class_match = re.search(r'class\s+(\w+)', line)
+        class_match = RULES_BY_ID['class_sendable'].fix_pattern.search(line)
         if class_match:
             class_name = class_match.group(1)
             
@@ -298,76 +3510,652 @@ class XcodeAssistant:
     
     def apply_fix(self, fix):
         """Apply a suggested fix to the file"""
-        file_path = fix['file']
-        line_num = fix['line'] - 1
+        return self.apply_fixes([fix])[0]
+    
+    def apply_fixes(self, fixes):
+        """Apply suggested fixes, rewriting each affected file once
         
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
+        Fixes are grouped by file and every edit is located by its offset in
+        the file as analyzed, so multi-line replacements cannot shift later
+        fixes onto the wrong lines.  A fix whose line overlaps one accepted
+        earlier, or whose line no longer matches the analyzed text, is
+        skipped, and so are the fixes to a file that changed since the
+        session (see save_session) was written.  A file that was fixed is
+        marked as changed in the session.  Returns one result message per
+        fix, in order.
+        """
+        results = [None] * len(fixes)
+        by_file = {}
+        for i, fix in enumerate(fixes):
+            if 'replacement' in fix:
+                by_file.setdefault(fix['file'], []).append(i)
+            else:
+                results[i] = f"No automatic fix available for {fix['file']} line {fix['line']}"
+        
+        stale = False
+        for file_path, indexes in by_file.items():
+            if self._changed_since_session(file_path):
+                for i in indexes:
+                    results[i] = f"Skipped fix for {file_path} line {fixes[i]['line']}: file changed since analysis"
+                continue
+            file_results = self._apply_file_fixes(file_path, [fixes[i] for i in indexes])
+            for i, result in zip(indexes, file_results):
+                results[i] = result
+            if self.session is not None and any(result.startswith('Applied') for result in file_results):
+                # The lines of the file's other issues may have moved
+                self.session[self._key(file_path)] = None
+                stale = True
+        if stale and self.use_cache:
+            self._write_session()
+        return results
+    
+    def _apply_file_fixes(self, file_path, fixes):
+        """Apply fixes to one file with a single atomic write"""
+        content = _read_source(file_path)
+        line_starts = LineIndex(content).line_starts
         
-        if 'replacement' in fix:
-            lines[line_num] = fix['replacement'] + '\n'
+        results = []
+        edits = []
+        taken = []
+        for fix in fixes:
+            line_num = fix['line'] - 1
+            if not 0 <= line_num < len(line_starts):
+                results.append(f"Skipped fix for {file_path} line {fix['line']}: line no longer exists")
+                continue
+            start = line_starts[line_num]
+            end = line_starts[line_num + 1] if line_num + 1 < len(line_starts) else len(content)
             
-            with open(file_path, 'w') as f:
-                f.writelines(lines)
+            if content[start:end].strip() != fix.get('original', content[start:end].strip()):
+                results.append(f"Skipped fix for {file_path} line {fix['line']}: line changed since analysis")
+                continue
             
-            return f"Applied fix to {file_path} line {fix['line']}"
-        else:
-            return f"No automatic fix available for {file_path} line {fix['line']}"
+            # Edits are kept sorted by start offset to find overlaps
+            slot = bisect_right(taken, (start, end))
+            if (slot > 0 and taken[slot - 1][1] > start) or (slot < len(taken) and taken[slot][0] < end):
+                results.append(f"Skipped fix for {file_path} line {fix['line']}: overlaps another fix")
+                continue
+            taken.insert(slot, (start, end))
+            edits.insert(slot, (start, end, fix['replacement'] + '\n'))
+            results.append(f"Applied fix to {file_path} line {fix['line']}")
+        
+        if edits:
+            # Splice the edits in against the original offsets
+            pieces = []
+            position = 0
+            for start, end, text in edits:
+                pieces.append(content[position:start])
+                pieces.append(text)
+                position = end
+            pieces.append(content[position:])
+            _write_atomic(file_path, ''.join(pieces))
+        return results
+
+def _accepts_connections(socket_path):
+    """Check if a process listens on a Unix socket, such as another daemon"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+class AnalysisServer(socketserver.UnixStreamServer):
+    """Answer analysis requests for one project from a long-lived XcodeAssistant
+
+    The assistant's compiled rules, analysis cache and issue list stay
+    warm between requests, so a request only re-analyzes files that
+    changed since the last one.  The project's directories are watched
+    (see InotifyWatcher, or PollingWatcher's stamps where inotify is not
+    available), and while no Swift or ignore file changes the last
+    analysis is returned as is and the session file is not rewritten.
+    Each connection carries one JSON request line and gets one JSON
+    response line back; requests are handled one at a time.
+    """
+
+    def __init__(self, socket_path, assistant):
+        self.assistant = assistant
+        self.running = True
+        self.watcher = None
+        # The issues of the last analysis, and the last ones saved with the session file's stamp then
+        self.analyzed = None
+        self.saved = (None, None)
+        # The stamps of the directories the polling scan walked, and the files it stamps
+        self._walked = None
+        if os.path.exists(socket_path):
+            if _accepts_connections(socket_path):
+                raise RuntimeError(f"a daemon is already listening on {socket_path}")
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(socket_path)
+        # Only the current user may connect
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _AnalysisRequestHandler)
+        finally:
+            os.umask(umask)
+
+    def serve(self):
+        """Handle requests until a client asks the daemon to stop"""
+        while self.running:
+            self.handle_request()
+
+    def close(self):
+        """Stop listening, remove the socket and flush the analysis cache"""
+        self.server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.assistant.cache is not None:
+            self.assistant.cache.save()
+
+    def _watch(self):
+        """Start watching the project, before it is analyzed so that no change can be missed"""
+        if self.watcher is not None:
+            self.watcher.close()
+        assistant = self.assistant
+        try:
+            watcher = InotifyWatcher()
+            try:
+                directories = []
+                for _ in assistant.iter_swift_files(directories):
+                    pass
+                for directory in directories:
+                    watcher.add(directory)
+            except OSError:
+                watcher.close()
+                raise
+        except OSError:
+            # Walk again: an ignore file may have changed what is found without a directory changing
+            self._walked = None
+            watcher = PollingWatcher(self._scan, 0)
+        self.watcher = watcher
+
+    def _scan(self):
+        """Stamp the project's Swift files and the ignore files of its directories, for PollingWatcher
+        
+        Adding, removing or renaming an entry changes the modification time
+        of its directory, so while no directory changed the tree is not
+        walked again and only the files found last time are stamped.
+        """
+        walked = self._walked
+        if walked is None or any(_file_stamp(directory) != stamp for directory, stamp in walked[0].items()):
+            directories = []
+            paths = list(self.assistant.iter_swift_files(directories))
+            paths.extend(os.path.join(directory, name) for directory in directories for name in IGNORE_FILE_NAMES)
+            walked = self._walked = ({directory: _file_stamp(directory) for directory in directories}, paths)
+        return {path: _file_stamp(path) for path in walked[1]}
+
+    def _changed(self):
+        """Check if a Swift or ignore file changed since the watch started"""
+        changed = self.watcher.wait(0)
+        return changed is None or any(path.endswith('.swift') or os.path.basename(path) in IGNORE_FILE_NAMES
+                                      for path in changed)
+
+    def analyze(self):
+        """Analyze the project, or return the last analysis when nothing it depends on changed"""
+        assistant = self.assistant
+        if self.analyzed is None or self._changed():
+            self._watch()
+            assistant.issues = []
+            self.analyzed = assistant.analyze_project()
+        assistant.issues = self.analyzed
+        return self.analyzed
+
+    def save_session(self):
+        """Write the session file, unless it already holds the current issues"""
+        assistant = self.assistant
+        path = assistant.project_path / CACHE_DIR_NAME / SESSION_FILE_NAME
+        issues, stamp = self.saved
+        if issues is assistant.issues and stamp is not None and stamp == _file_stamp(path):
+            return
+        assistant.save_session()
+        self.saved = (assistant.issues, _file_stamp(path))
+
+    def dispatch(self, request):
+        """Run one request against the assistant and return the response"""
+        assistant = self.assistant
+        command = request.get('command')
+        if command == 'ping':
+            return {'pid': os.getpid()}
+        if command == 'analyze':
+            return {'issues': self.analyze()}
+        if command == 'save_session':
+            self.save_session()
+            return {}
+        if command == 'load_session':
+            return {'issues': assistant.issues if assistant.load_session() else None}
+        if command == 'suggest':
+            return {'fixes': assistant.suggest_fixes(request.get('index'))}
+        if command == 'apply':
+            return {'results': assistant.apply_fixes(request['fixes'])}
+        if command == 'stop':
+            self.running = False
+            return {}
+        return {'error': f"unknown command: {command}"}
+
+class _AnalysisRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # A connection closed without a request, such as another daemon checking the socket
+            return
+        try:
+            response = self.server.dispatch(json.loads(line))
+        except Exception as e:
+            # Report the failure to the client instead of killing the daemon
+            response = {'error': f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+# Seconds without further edits before a changed buffer is analyzed again
+LSP_DEBOUNCE = 0.05
+
+def _utf16_length(text):
+    """Return the length of text in UTF-16 code units, the unit of LSP positions"""
+    return len(text) if text.isascii() else len(text.encode('utf-16-le')) // 2
+
+def _from_utf16(text, units):
+    """Return the index into text of a UTF-16 code unit offset"""
+    if text.isascii():
+        return min(units, len(text))
+    count = 0
+    for index, char in enumerate(text):
+        if count >= units:
+            return index
+        count += 2 if ord(char) > 0xFFFF else 1
+    return len(text)
+
+def _uri_to_path(uri):
+    """Convert a file:// URI into a local path"""
+    import urllib.parse
+    parsed = urllib.parse.urlparse(uri)
+    return urllib.parse.unquote(parsed.path) if parsed.scheme == 'file' else uri
+
+class TextDocument:
+    """An editor buffer kept in sync through LSP didOpen/didChange"""
+
+    def __init__(self, uri, text, version=None):
+        self.uri = uri
+        self.path = _uri_to_path(uri)
+        self.text = text
+        self.version = version
+        self.issues = []
+        self.analyzed_text = None
+
+    def offset_at(self, position, line_starts):
+        """Return the string index of an LSP {line, character} position"""
+        line = position['line']
+        if line >= len(line_starts):
+            return len(self.text)
+        start = line_starts[line]
+        end = line_starts[line + 1] if line + 1 < len(line_starts) else len(self.text)
+        return start + _from_utf16(self.text[start:end], position['character'])
+
+    def position_at(self, line, column):
+        """Return the LSP position of a 1-based line and column"""
+        text = self.line_text(line)
+        return {'line': line - 1, 'character': _utf16_length(text[:column - 1])}
+
+    def line_text(self, line):
+        """Return a 1-based line of the buffer without its line break"""
+        lines = self.text.split('\n', line)
+        return lines[line - 1] if line <= len(lines) else ''
+
+    def apply_change(self, change):
+        """Apply one contentChanges entry: a ranged edit or the whole new text"""
+        if 'range' not in change:
+            self.text = change['text']
+            return
+        line_starts = LineIndex(self.text).line_starts
+        start = self.offset_at(change['range']['start'], line_starts)
+        end = self.offset_at(change['range']['end'], line_starts)
+        self.text = self.text[:start] + change['text'] + self.text[end:]
+
+class LanguageServer:
+    """Language Server Protocol over stdio: issues as diagnostics, fixes as code actions
+
+    Buffers are synchronized incrementally and analyzed from memory, never
+    from disk.  After each edit only the edited buffer is analyzed again,
+    once the editor has been quiet for LSP_DEBOUNCE seconds, so a burst of
+    keystrokes costs one analysis.  Quick fixes are the generate_fix
+    results for the diagnostics in the requested range.
+    """
+
+    def __init__(self, input_fd, output, project_path=None, use_cache=True):
+        self.input_fd = input_fd
+        self.output = output
+        self.buffer = b''
+        self.project_path = project_path
+        self.use_cache = use_cache
+        self.assistant = None
+        self.documents = {}
+        self.dirty = set()
+        self.shutdown_requested = False
+
+    def serve(self):
+        """Handle messages until the client sends exit; return the process exit code"""
+        while True:
+            message = self.read_message(LSP_DEBOUNCE if self.dirty else None)
+            if message is None:
+                # Quiet period after edits: analyze what changed
+                for uri in sorted(self.dirty):
+                    self.publish_diagnostics(uri)
+                self.dirty.clear()
+                continue
+            if message is EOFError:
+                return 1
+            if message.get('method') == 'exit':
+                return 0 if self.shutdown_requested else 1
+            self.handle(message)
+
+    def read_message(self, timeout=None):
+        """Read one message; None when timeout passed first, EOFError at end of input"""
+        while True:
+            header_end = self.buffer.find(b'\r\n\r\n')
+            if header_end >= 0:
+                headers = dict(line.split(b':', 1) for line in self.buffer[:header_end].split(b'\r\n') if b':' in line)
+                length = int(headers.get(b'Content-Length', b'0').strip())
+                body_start = header_end + 4
+                if len(self.buffer) >= body_start + length:
+                    body = self.buffer[body_start:body_start + length]
+                    self.buffer = self.buffer[body_start + length:]
+                    return json.loads(body)
+            if timeout is not None and not select.select([self.input_fd], [], [], timeout)[0]:
+                return None
+            data = os.read(self.input_fd, 64 * 1024)
+            if not data:
+                return EOFError
+            self.buffer += data
+
+    def send(self, message):
+        body = json.dumps({'jsonrpc': '2.0', **message}).encode()
+        self.output.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        self.output.flush()
+
+    def handle(self, message):
+        """Dispatch a request or notification to its handler"""
+        method = message.get('method')
+        handler = self.HANDLERS.get(method)
+        if 'id' not in message:
+            if handler is not None:
+                handler(self, message.get('params') or {})
+            return
+        if handler is None:
+            self.send({'id': message['id'], 'error': {'code': -32601, 'message': f"Method not found: {method}"}})
+            return
+        try:
+            result = handler(self, message.get('params') or {})
+        except Exception as e:
+            self.send({'id': message['id'], 'error': {'code': -32603, 'message': f"{type(e).__name__}: {e}"}})
+            return
+        self.send({'id': message['id'], 'result': result})
+
+    def initialize(self, params):
+        if self.project_path is None:
+            folders = params.get('workspaceFolders') or []
+            if params.get('rootUri'):
+                self.project_path = _uri_to_path(params['rootUri'])
+            elif folders:
+                self.project_path = _uri_to_path(folders[0]['uri'])
+            else:
+                self.project_path = params.get('rootPath') or os.getcwd()
+        self.assistant = XcodeAssistant(self.project_path, use_cache=self.use_cache)
+        return {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': 2},
+                'codeActionProvider': {'codeActionKinds': ['quickfix']},
+            },
+            'serverInfo': {'name': 'xcode-assistant'},
+        }
+
+    def shutdown(self, params):
+        self.shutdown_requested = True
+        if self.assistant is not None and self.assistant.cache is not None:
+            self.assistant.cache.save()
+        return None
+
+    def did_open(self, params):
+        item = params['textDocument']
+        self.documents[item['uri']] = TextDocument(item['uri'], item['text'], item.get('version'))
+        # A freshly opened file is analyzed right away
+        self.publish_diagnostics(item['uri'])
+
+    def did_change(self, params):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return
+        for change in params['contentChanges']:
+            document.apply_change(change)
+        document.version = params['textDocument'].get('version')
+        self.dirty.add(document.uri)
+
+    def did_close(self, params):
+        uri = params['textDocument']['uri']
+        self.documents.pop(uri, None)
+        self.dirty.discard(uri)
+        self.send({'method': 'textDocument/publishDiagnostics', 'params': {'uri': uri, 'diagnostics': []}})
+
+    def analyze(self, document):
+        """Analyze a buffer unless its text is unchanged since the last analysis"""
+        if document.analyzed_text == document.text:
+            return document.issues
+        assistant = self.assistant
+        issues, symbols = assistant._analyze(document.path, document.text)
+        
+        # Project-wide rules see the buffer in place of the file on disk; the symbol index is
+        # updated in place, and only classes declared here can get issues here from other files
+        key = assistant._key(document.path)
+        assistant.symbols.update(key, symbols)
+        assistant.analyzed_keys = {key}
+        names = {declaration[1] for declaration in symbols['declarations']}
+        document.issues = [issue for issue in assistant.apply_project_rules(issues, names)
+                           if issue['file'] == document.path]
+        document.analyzed_text = document.text
+        return document.issues
+
+    def diagnostic(self, document, issue):
+        """Convert an issue into an LSP diagnostic"""
+        line_text = document.line_text(issue['line'])
+        return {
+            'range': {
+                'start': document.position_at(issue['line'], issue['column']),
+                'end': {'line': issue['line'] - 1, 'character': _utf16_length(line_text.rstrip())},
+            },
+            'severity': 2,
+            'source': 'xcode-assistant',
+            'code': issue.get('rule'),
+            'message': f"{issue['message'].strip()}\n{issue['suggestion']}",
+        }
+
+    def publish_diagnostics(self, uri):
+        document = self.documents.get(uri)
+        if document is None:
+            return
+        issues = self.analyze(document)
+        self.send({'method': 'textDocument/publishDiagnostics', 'params': {
+            'uri': uri,
+            'version': document.version,
+            'diagnostics': [self.diagnostic(document, issue) for issue in issues],
+        }})
+
+    def code_action(self, params):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return []
+        first = params['range']['start']['line'] + 1
+        last = params['range']['end']['line'] + 1
+        
+        actions = []
+        for issue in self.analyze(document):
+            if not first <= issue['line'] <= last:
+                continue
+            fix = self.assistant.generate_fix(issue, document.text)
+            if not isinstance(fix, dict) or 'replacement' not in fix:
+                continue
+            # Like apply_fixes, the fix replaces the whole line it was generated for
+            line_count = document.text.count('\n') + 1
+            if issue['line'] < line_count:
+                end = {'line': issue['line'], 'character': 0}
+                new_text = fix['replacement'] + ('\r\n' if document.line_text(issue['line']).endswith('\r') else '\n')
+            else:
+                end = {'line': issue['line'] - 1, 'character': _utf16_length(document.line_text(issue['line']))}
+                new_text = fix['replacement']
+            actions.append({
+                'title': fix['message'],
+                'kind': 'quickfix',
+                'diagnostics': [self.diagnostic(document, issue)],
+                'edit': {'changes': {document.uri: [{
+                    'range': {'start': {'line': issue['line'] - 1, 'character': 0}, 'end': end},
+                    'newText': new_text,
+                }]}},
+            })
+        return actions
+
+    HANDLERS = {
+        'initialize': initialize,
+        'shutdown': shutdown,
+        'textDocument/didOpen': did_open,
+        'textDocument/didChange': did_change,
+        'textDocument/didClose': did_close,
+        'textDocument/codeAction': code_action,
+    }
+
+def _add_analysis_arguments(parser):
+    """Add the options configuring how the assistant analyzes the project"""
+    parser.add_argument('--jobs', '-j', type=int, default=0, metavar='N',
+                        help='Number of worker processes for analysis (default: one per core)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Do not read or write the analysis cache and session in {CACHE_DIR_NAME}/')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help='Only analyze files whose project-relative path matches GLOB (repeatable); '
+                             'as in .gitignore, a GLOB without a slash matches at any depth')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help='Skip files and directories whose project-relative path matches GLOB (repeatable)')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='Abandon a file whose analysis takes longer and report it as an analysis_timeout issue')
+    parser.add_argument('--rule-timeout', type=float, metavar='SECONDS',
+                        help='Stop a rule that spends longer matching in one file and report it as an '
+                             'analysis_timeout issue')
+
+def serve_main(argv):
+    """Run the analysis daemon for a project until it is stopped"""
+    parser = argparse.ArgumentParser(prog='xcode_assistant.py serve',
+                                     description='Keep an analysis process warm and answer clients on a Unix socket')
+    parser.add_argument('project_path', help='Path to the Xcode project directory')
+    parser.add_argument('--socket', metavar='PATH', help='Socket to listen on (default: one per project in the temp directory)')
+    _add_analysis_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    assistant = XcodeAssistant(args.project_path, jobs=args.jobs, use_cache=not args.no_cache,
+                               include=args.include, exclude=args.exclude,
+                               timeout=args.timeout, rule_timeout=args.rule_timeout)
+    socket_path = args.socket or default_socket_path(args.project_path)
+    try:
+        server = AnalysisServer(socket_path, assistant)
+    except (RuntimeError, OSError) as e:
+        parser.error(str(e))
+    
+    print(f"Serving {args.project_path} on {socket_path}, press Ctrl-C to stop", file=sys.stderr)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+def lsp_main(argv):
+    """Run the language server on stdin/stdout until the editor exits it"""
+    parser = argparse.ArgumentParser(prog='xcode_assistant.py lsp',
+                                     description='Serve diagnostics and quick fixes over the Language Server Protocol on stdio')
+    parser.add_argument('project_path', nargs='?', help='Project directory (default: the workspace root sent by the editor)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Do not read or write the analysis cache in {CACHE_DIR_NAME}/')
+    args = parser.parse_args(argv)
+    
+    server = LanguageServer(sys.stdin.fileno(), sys.stdout.buffer, args.project_path, use_cache=not args.no_cache)
+    sys.exit(server.serve())
+
+def client_subcommand(argv):
+    """Send an action to the daemon with xcode_assistant_client.py, analyzing in-process without one"""
+    from xcode_assistant_client import client_main
+    client_main(argv, 'xcode_assistant.py client', XcodeAssistant)
+
+# Subcommands dispatched on the first argument, before the option parser below
+SUBCOMMANDS = {
+    'serve': serve_main,
+    'client': client_subcommand,
+    'lsp': lsp_main,
+}
 
 def main():
-    parser = argparse.ArgumentParser(description='Xcode Assistant - Find and fix common Swift issues')
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+    
+    parser = argparse.ArgumentParser(description='Xcode Assistant - Find and fix common Swift issues',
+                                     epilog='Subcommands: "serve PROJECT" runs a warm analysis daemon, '
+                                            '"client PROJECT [options]" sends an action to it, '
+                                            '"lsp [PROJECT]" runs a language server on stdio.')
     parser.add_argument('project_path', help='Path to the Xcode project directory')
-    parser.add_argument('--analyze', action='store_true', help='Analyze the project for issues')
-    parser.add_argument('--fix', type=int, help='Fix a specific issue by index')
-    parser.add_argument('--fix-all', action='store_true', help='Attempt to fix all issues')
-    parser.add_argument('--report', action='store_true', help='Generate a JSON report of issues')
+    add_action_arguments(parser)
+    _add_analysis_arguments(parser)
+    parser.add_argument('--changed-since', nargs='?', const='', metavar='REF',
+                        help='Only analyze Swift files changed since a git ref (default: uncommitted changes)')
+    parser.add_argument('--from-xcodeproj', nargs='?', const='', metavar='XCODEPROJ',
+                        help='Only analyze Swift files compiled into the targets of an Xcode project '
+                             '(default: the .xcodeproj in the project directory)')
+    parser.add_argument('--target', action='append', metavar='NAME',
+                        help='With --from-xcodeproj, only analyze files of this target (repeatable)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and print new and resolved issues whenever Swift files change')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time each stage, file and rule and print the slowest to stderr '
+                             '(analyzes in one process without the cache)')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help='Number of slowest files and rules to list with --profile (default: 10)')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='With --profile, also write a Chrome trace-event JSON file')
     
     args = parser.parse_args()
     
-    assistant = XcodeAssistant(args.project_path)
+    if args.trace:
+        args.profile = True
+    # Cached files would not be analyzed, so their timings would mean nothing
+    profiler = Profiler() if args.profile else None
+    assistant = XcodeAssistant(args.project_path, jobs=args.jobs, use_cache=not args.no_cache and not args.profile,
+                               include=args.include, exclude=args.exclude, profiler=profiler,
+                               timeout=args.timeout, rule_timeout=args.rule_timeout)
     
-    if args.analyze or args.report or args.fix is not None or args.fix_all:
-        issues = assistant.analyze_project()
-        print(f"Found {len(issues)} potential issues")
-        
-        if args.report:
-            report = assistant.generate_report()
-            print(report)
-            
-        if args.fix is not None:
-            fix = assistant.suggest_fixes(args.fix)
-            if isinstance(fix, dict):
-                print(f"Suggested fix for issue {args.fix}:")
-                print(json.dumps(fix, indent=2))
-                
-                confirm = input("Apply this fix? (y/n): ")
-                if confirm.lower() == 'y':
-                    result = assistant.apply_fix(fix)
-                    print(result)
-            else:
-                print(fix)
-                
-        if args.fix_all:
-            fixes = assistant.suggest_fixes()
-            for i, fix in enumerate(fixes):
-                print(f"\nIssue {i}:")
-                print(json.dumps(fix, indent=2))
-                
-                confirm = input(f"Apply fix for issue {i}? (y/n/q to quit): ")
-                if confirm.lower() == 'y':
-                    result = assistant.apply_fix(fix)
-                    print(result)
-                elif confirm.lower() == 'q':
-                    break
+    if args.target and args.from_xcodeproj is None:
+        parser.error("--target requires --from-xcodeproj")
+    if args.watch and (args.report or args.fix is not None or args.fix_all):
+        parser.error("--watch cannot be combined with --report, --fix or --fix-all")
+    
+    swift_files = None
+    try:
+        with assistant._span('discovery'):
+            if args.from_xcodeproj is not None:
+                swift_files = assistant.find_xcodeproj_swift_files(args.from_xcodeproj or None, args.target)
+            if args.changed_since is not None:
+                changed_files = assistant.find_changed_swift_files(args.changed_since or None)
+                if swift_files is not None:
+                    compiled = set(swift_files)
+                    changed_files = [path for path in changed_files if path in compiled]
+                swift_files = changed_files
+    except (RuntimeError, ValueError, OSError) as e:
+        parser.error(str(e))
+    
+    if args.watch:
+        assistant.watch(sys.stdout, swift_files)
     else:
-        # Default behavior: analyze and show issues
-        issues = assistant.analyze_project()
-        print(f"Found {len(issues)} potential issues:")
-        
-        for i, issue in enumerate(issues):
-            print(f"\nIssue {i}: {issue['type']} in {issue['file']} line {issue['line']}")
-            print(f"  {issue['message']}")
-            print(f"  Suggestion: {issue['suggestion']}")
+        run_actions(assistant, args, swift_files)
+    
+    if profiler is not None:
+        profiler.report(sys.stderr, args.profile_top)
+        if args.trace:
+            profiler.write_trace(args.trace)
+            print(f"Trace written to {args.trace}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Xcode Assistant actions - What xcode_assistant.py and its daemon client share
+
+The command-line actions, the report formats and where a project's
+daemon listens.  Only the standard library is imported here, so the
+client can use them without loading the analyzer.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+def default_socket_path(project_path):
+    """Return the socket the daemon for a project listens on by default
+
+    The socket lives in the temp directory rather than in the project
+    because Unix socket paths are limited to about 100 bytes.
+    """
+    digest = hashlib.sha256(os.path.realpath(project_path).encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"xcode_assistant-{os.getuid()}-{digest}.sock")
+
+def ndjson_line(issue):
+    """Serialize an issue as one compact JSON line"""
+    return json.dumps(issue, separators=(',', ':')) + '\n'
+
+def format_report(issues, format='json'):
+    """Format issues as a JSON document, or as NDJSON with one issue per line"""
+    if format == 'ndjson':
+        return ''.join(ndjson_line(issue) for issue in issues)
+    return json.dumps(issues, indent=2)
+
+def add_action_arguments(parser):
+    """Add the options selecting what to do with the issues found"""
+    parser.add_argument('--analyze', action='store_true', help='Analyze the project for issues')
+    parser.add_argument('--fix', type=int, help='Fix a specific issue by index')
+    parser.add_argument('--fix-all', action='store_true', help='Attempt to fix all issues')
+    parser.add_argument('--report', action='store_true', help='Generate a JSON report of issues')
+    parser.add_argument('--format', choices=('json', 'ndjson'), default='json',
+                        help='Report format; ndjson streams one issue per line as files are analyzed')
+
+def run_actions(assistant, args, swift_files=None):
+    """Carry out --analyze/--report/--fix/--fix-all with an assistant or a daemon client"""
+    if args.report and args.format == 'ndjson' and args.fix is None and not args.fix_all:
+        # Stream the report; stdout carries only issues so it can be piped
+        count = assistant.stream_report(sys.stdout, swift_files)
+        print(f"Found {count} potential issues", file=sys.stderr)
+
+    elif args.analyze or args.report or args.fix is not None or args.fix_all:
+        # Fixing on its own acts on the issues listed last, so their indexes cannot drift
+        if not (args.analyze or args.report) and swift_files is None and assistant.load_session():
+            issues = assistant.issues
+            print(f"Found {len(issues)} potential issues in the last analysis")
+        else:
+            issues = assistant.analyze_project(swift_files)
+            assistant.save_session()
+            print(f"Found {len(issues)} potential issues")
+
+        if args.report:
+            report = assistant.generate_report(args.format)
+            print(report, end='' if args.format == 'ndjson' else '\n')
+
+        if args.fix is not None:
+            fix = assistant.suggest_fixes(args.fix)
+            if isinstance(fix, dict):
+                print(f"Suggested fix for issue {args.fix}:")
+                print(json.dumps(fix, indent=2))
+
+                confirm = input("Apply this fix? (y/n): ")
+                if confirm.lower() == 'y':
+                    result = assistant.apply_fix(fix)
+                    print(result)
+            else:
+                print(fix)
+
+        if args.fix_all:
+            fixes = assistant.suggest_fixes()
+            accepted = []
+            for i, fix in enumerate(fixes):
+                print(f"\nIssue {i}:")
+                print(json.dumps(fix, indent=2))
+                if not isinstance(fix, dict):
+                    continue
+
+                confirm = input(f"Apply fix for issue {i}? (y/n/q to quit): ")
+                if confirm.lower() == 'y':
+                    accepted.append(fix)
+                elif confirm.lower() == 'q':
+                    break
+
+            # Apply everything at once so earlier fixes cannot shift later ones
+            for result in assistant.apply_fixes(accepted):
+                print(result)
+    else:
+        # Default behavior: analyze and show issues
+        issues = assistant.analyze_project(swift_files)
+        assistant.save_session()
+        print(f"Found {len(issues)} potential issues:")
+
+        for i, issue in enumerate(issues):
+            print(f"\nIssue {i}: {issue['type']} in {issue['file']} line {issue['line']}, column {issue['column']}")
+            print(f"  {issue['message']}")
+            print(f"  Suggestion: {issue['suggestion']}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Xcode Assistant client - Send actions to a running "xcode_assistant.py serve" daemon
+
+Only the standard library and xcode_assistant_actions.py are imported
+here, so a request costs little more than starting Python.  The analyzer itself is only imported when no
+daemon is running and the action has to run in-process.
+"""
+
+import sys
+import json
+import socket
+import argparse
+from xcode_assistant_actions import add_action_arguments, default_socket_path, format_report, ndjson_line, run_actions
+
+class DaemonClient:
+    """Stand-in for XcodeAssistant in run_actions that forwards the work to a daemon
+
+    Fixes are suggested and applied against the issue list of the
+    daemon's last analysis, which is the list this client shows.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.issues = []
+
+    def request(self, command, **params):
+        """Send one request and return the response, raising RuntimeError on errors"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps({'command': command, **params}).encode() + b'\n')
+            with sock.makefile('rb') as f:
+                line = f.readline()
+        if not line:
+            raise RuntimeError("the daemon closed the connection")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    def is_running(self):
+        """Check if a daemon answers on the socket"""
+        try:
+            self.request('ping')
+        except (OSError, RuntimeError, ValueError):
+            return False
+        return True
+
+    def stop(self):
+        self.request('stop')
+
+    def analyze_project(self, swift_files=None):
+        self.issues = self.request('analyze')['issues']
+        return self.issues
+
+    def stream_report(self, out, swift_files=None):
+        for issue in self.analyze_project():
+            out.write(ndjson_line(issue))
+        return len(self.issues)
+
+    def generate_report(self, format='json'):
+        return format_report(self.issues, format)
+
+    def save_session(self):
+        self.request('save_session')
+
+    def load_session(self):
+        issues = self.request('load_session')['issues']
+        if issues is None:
+            return False
+        self.issues = issues
+        return True
+
+    def suggest_fixes(self, issue_index=None):
+        return self.request('suggest', index=issue_index)['fixes']
+
+    def apply_fix(self, fix):
+        return self.apply_fixes([fix])[0]
+
+    def apply_fixes(self, fixes):
+        return self.request('apply', fixes=fixes)['results']
+
+def client_main(argv, prog='xcode_assistant_client.py', assistant_class=None):
+    """Forward an action to the project's daemon, or run it in-process if none is listening
+    
+    assistant_class is the XcodeAssistant to fall back on; it is imported
+    from xcode_assistant.py when not given.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Run an action through a running "serve" daemon')
+    parser.add_argument('project_path', help='Path to the Xcode project directory')
+    parser.add_argument('--socket', metavar='PATH', help='Socket of the daemon (default: the one for the project)')
+    parser.add_argument('--stop', action='store_true', help='Stop the daemon')
+    add_action_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    client = DaemonClient(args.socket or default_socket_path(args.project_path))
+    if not client.is_running():
+        if args.stop:
+            print("No daemon is running", file=sys.stderr)
+            return
+        print("No daemon is running, analyzing in-process", file=sys.stderr)
+        if assistant_class is None:
+            from xcode_assistant import XcodeAssistant as assistant_class
+        run_actions(assistant_class(args.project_path, jobs=0, use_cache=True), args)
+        return
+    
+    try:
+        if args.stop:
+            client.stop()
+        else:
+            run_actions(client, args)
+    except RuntimeError as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+
+if __name__ == "__main__":
+    client_main(sys.argv[1:])
@@ -5,10 +5,18 @@
 
 PROJECT_PATH="/workspace/MDBX"
 SCRIPT_PATH="/workspace/xcode_assistant.py"
+# The client only needs the standard library, so commands start quickly
+CLIENT_PATH="$(dirname "$SCRIPT_PATH")/xcode_assistant_client.py"
 
 # Make the Python script executable
 chmod +x "$SCRIPT_PATH"
 
+# Run an action through the analysis daemon ("serve"); without one running
+# the client analyzes in-process
+client() {
+  python3 "$CLIENT_PATH" "$PROJECT_PATH" "$@"
+}
+
 # Function to display help
 show_help() {
   echo "Xcode Helper - Automate finding and fixing Swift issues"
@@ -22,6 +30,8 @@ show_help() {
   echo "  fix-all     - Attempt to fix all issues automatically"
   echo "  report      - Generate a detailed JSON report of issues"
   echo "  commit      - Commit fixes to git with an appropriate message"
+  echo "  serve       - Start the analysis daemon in the background for fast commands"
+  echo "  stop        - Stop the analysis daemon"
   echo "  help        - Show this help message"
   echo ""
 }
@@ -36,29 +46,31 @@ fi
 case "$1" in
   analyze)
     echo "Analyzing Swift code for issues..."
-    python3 "$SCRIPT_PATH" "$PROJECT_PATH" --analyze
+    client --analyze
     ;;
     
   fix)
     echo "Finding issues and suggesting fixes..."
-    python3 "$SCRIPT_PATH" "$PROJECT_PATH"
+    client
     
     echo ""
     read -p "Enter the issue number to fix (or 'q' to quit): " issue_num
     
+    # --fix reuses the issue list saved by the listing above instead of analyzing again,
+    # so the number refers to the issue shown
     if [ "$issue_num" != "q" ]; then
-      python3 "$SCRIPT_PATH" "$PROJECT_PATH" --fix "$issue_num"
+      client --fix "$issue_num"
     fi
     ;;
     
   fix-all)
     echo "Attempting to fix all issues..."
-    python3 "$SCRIPT_PATH" "$PROJECT_PATH" --fix-all
+    client --fix-all
     ;;
     
   report)
     echo "Generating detailed report..."
-    python3 "$SCRIPT_PATH" "$PROJECT_PATH" --report
+    client --report
     ;;
     
   commit)
@@ -70,6 +82,16 @@ case "$1" in
     echo "Changes committed and pushed to main branch"
     ;;
     
+  serve)
+    echo "Starting the analysis daemon..."
+    nohup python3 "$SCRIPT_PATH" serve "$PROJECT_PATH" > /dev/null 2>&1 &
+    ;;
+    
+  stop)
+    echo "Stopping the analysis daemon..."
+    client --stop
+    ;;
+    
   help|*)
     show_help
     ;;